@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Agrégation par clés (group-by / count) en une passe sur un flux d'objets
+
+Un Aggregator compte les objets selon plusieurs clés à la fois (chemin pointé,
+fonction ou tuple de clés pour un regroupement composé), avec des sommes
+optionnelles par groupe. Le flux n'est parcouru qu'une fois et n'est jamais
+conservé en mémoire : plusieurs rapports sont tirés d'un seul chargement.
+"""
+
+from bisect import bisect_right
+
+MISSING = 'N/A'
+
+
+def path_getter(path, missing=MISSING):
+    """Lecteur d'un chemin pointé (ex: 'provider.name') ; missing si absent ou vide"""
+    parts = path.split('.')
+
+    def get(record):
+        value = record
+        for part in parts:
+            if not isinstance(value, dict):
+                return missing
+            value = value.get(part)
+        return missing if value is None or value == '' else value
+
+    return get
+
+
+def _getter(spec):
+    if callable(spec):
+        return spec
+    if isinstance(spec, tuple):
+        getters = [_getter(part) for part in spec]
+        return lambda record: tuple(get(record) for get in getters)
+    return path_getter(spec)
+
+
+def buckets(path, thresholds, labels):
+    """Clé par tranches : labels[i] pour thresholds[i-1] <= valeur < thresholds[i]
+
+    labels compte un élément de plus que thresholds ; les valeurs absentes
+    donnent MISSING.
+    """
+    get = path_getter(path)
+
+    def bucket(record):
+        value = get(record)
+        if value == MISSING:
+            return MISSING
+        return labels[bisect_right(thresholds, value)]
+
+    # Ordre naturel des tranches pour l'affichage
+    bucket.order = {label: i for i, label in enumerate(labels)}
+    return bucket
+
+
+class Aggregator:
+    """Compteurs (et sommes) par valeur de chaque clé demandée"""
+
+    def __init__(self, keys, sums=None):
+        self.specs = dict(keys)
+        self.keys = {name: _getter(spec) for name, spec in keys.items()}
+        self.sums = {name: path_getter(path) for name, path in (sums or {}).items()}
+        self.counts = {name: {} for name in keys}
+        self.totals = {name: {} for name in keys}
+        self.total = 0
+
+    def add(self, record):
+        self.total += 1
+        values = {}
+        for name, get in self.sums.items():
+            value = get(record)
+            values[name] = value if isinstance(value, (int, float)) else 0
+
+        for name, get in self.keys.items():
+            group = get(record)
+            counts = self.counts[name]
+            counts[group] = counts.get(group, 0) + 1
+            if values:
+                totals = self.totals[name].setdefault(group, dict.fromkeys(values, 0))
+                for sum_name, value in values.items():
+                    totals[sum_name] += value
+
+    def consume(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def count(self, name, group):
+        return self.counts[name].get(group, 0)
+
+    def sum(self, name, group, sum_name):
+        return self.totals[name].get(group, {}).get(sum_name, 0)
+
+    def top(self, name, limit=None):
+        """Groupes d'une clé par nombre décroissant, ou dans l'ordre des tranches"""
+        order = getattr(self.specs[name], 'order', None)
+        if order is not None:
+            items = sorted(self.counts[name].items(), key=lambda item: order.get(item[0], len(order)))
+        else:
+            items = sorted(self.counts[name].items(), key=lambda item: (-item[1], str(item[0])))
+        return items[:limit] if limit else items
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Graphe de câblage en mémoire : traçage de chemins et composantes connexes
+
+Chaque terminaison (interface, port avant/arrière, terminaison de circuit...)
+reçoit un indice entier ; les liens sont stockés dans des tableaux indexés
+par ces entiers : câble de la terminaison, port arrière d'un port avant et
+sa position, terminaison opposée d'un circuit. Un traçage ne coûte alors que
+quelques accès tableau par saut, sans aucune requête.
+"""
+
+from array import array
+
+INTERFACE = 'dcim.interface'
+FRONT_PORT = 'dcim.frontport'
+REAR_PORT = 'dcim.rearport'
+CIRCUIT_TERMINATION = 'circuits.circuittermination'
+# Types d'interfaces qui ne reçoivent jamais de câble : virtuelles, agrégats et sans fil
+UNCABLED_INTERFACE_TYPES = {
+    'virtual', 'bridge', 'lag',
+    'ieee802.11a', 'ieee802.11g', 'ieee802.11n', 'ieee802.11ac', 'ieee802.11ad', 'ieee802.11ax',
+    'ieee802.11ay', 'ieee802.11be', 'ieee802.15.1', 'other-wireless',
+}
+
+# États de fin d'un chemin
+COMPLETE = 'complete'     # Atteint une extrémité (interface, port console...)
+DANGLING = 'dangling'     # S'arrête sur un port de brassage ou un circuit non câblé
+LOOP = 'loop'             # Repasse par une terminaison déjà visitée
+SPLIT = 'split'           # Port arrière multi-positions sans position connue, ou câble multi-terminaisons
+
+
+def _label(object_type, obj):
+    """Nom lisible d'une terminaison à partir de l'objet imbriqué du câble"""
+    if not obj:
+        return object_type
+    if obj.get('circuit'):
+        return f"{obj['circuit'].get('cid', obj['circuit'].get('id'))}:{obj.get('term_side', '?')}"
+    if obj.get('device') and obj.get('name'):
+        return f"{obj['device']['name']}:{obj['name']}"
+    return obj.get('name') or obj.get('display') or f"{object_type}#{obj.get('id')}"
+
+
+class CableGraph:
+    """Graphe des terminations câblées, adressé par indices entiers"""
+
+    def __init__(self):
+        self.index = {}             # (object_type, id) -> indice
+        self.types = []             # indice -> object_type
+        self.ids = []               # indice -> ID Netbox de l'objet
+        self.labels = []
+        self.devices = []           # indice -> équipement {'id', 'name'} (None pour un circuit)
+        self.cable = array('q')     # indice -> rang du câble (-1 si non câblé)
+        self.side = array('b')      # indice -> 0 (A) ou 1 (B)
+        self.rear = array('q')      # port avant -> port arrière (-1 sinon)
+        self.position = array('q')  # port avant -> position sur le port arrière
+        self.peer = array('q')      # terminaison de circuit -> terminaison opposée
+        self.positions = {}         # port arrière -> nombre de positions
+        self.fronts = {}            # (port arrière, position) -> port avant
+        self.cable_ids = []         # rang -> ID Netbox du câble
+        self.cable_ends = []        # rang -> (terminaisons A, terminaisons B)
+
+    def __len__(self):
+        return len(self.types)
+
+    def node(self, object_type, object_id, label=None, device=None):
+        """Indice d'une terminaison, créée au besoin"""
+        key = (object_type, object_id)
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = len(self.types)
+            self.types.append(object_type)
+            self.ids.append(object_id)
+            self.labels.append(label or f"{object_type}#{object_id}")
+            self.devices.append(device)
+            for column in (self.cable, self.rear, self.position, self.peer):
+                column.append(-1)
+            self.side.append(0)
+        else:
+            if label and self.labels[index].startswith(object_type):
+                self.labels[index] = label
+            if device and not self.devices[index]:
+                self.devices[index] = device
+        return index
+
+    def add_cable(self, cable):
+        rank = len(self.cable_ids)
+        ends = ([], [])
+        for side, field in enumerate(('a_terminations', 'b_terminations')):
+            for term in cable.get(field) or []:
+                obj = term.get('object') or {}
+                index = self.node(term['object_type'], term['object_id'], _label(term['object_type'], obj),
+                                  obj.get('device'))
+                self.cable[index] = rank
+                self.side[index] = side
+                ends[side].append(index)
+        self.cable_ids.append(cable['id'])
+        self.cable_ends.append((tuple(ends[0]), tuple(ends[1])))
+
+    def add_front_port(self, port):
+        if not port.get('rear_port'):
+            return
+        front = self.node(FRONT_PORT, port['id'], _label(FRONT_PORT, port), port.get('device'))
+        rear = self.node(REAR_PORT, port['rear_port']['id'])
+        position = port.get('rear_port_position') or 1
+        self.rear[front] = rear
+        self.position[front] = position
+        self.fronts[(rear, position)] = front
+
+    def add_rear_port(self, port):
+        rear = self.node(REAR_PORT, port['id'], _label(REAR_PORT, port), port.get('device'))
+        self.positions[rear] = port.get('positions') or 1
+
+    def add_interface(self, interface):
+        """Ajoute une interface physique, même non câblée (nœud isolé)"""
+        if (interface.get('type') or {}).get('value') in UNCABLED_INTERFACE_TYPES:
+            return
+        self.node(INTERFACE, interface['id'], _label(INTERFACE, interface), interface.get('device'))
+
+    def add_circuit_terminations(self, terminations):
+        """Relie les extrémités A et Z de chaque circuit"""
+        sides = {}
+        for term in terminations:
+            if not term.get('circuit'):
+                continue
+            index = self.node(CIRCUIT_TERMINATION, term['id'], _label(CIRCUIT_TERMINATION, term))
+            sides.setdefault(term['circuit']['id'], []).append(index)
+        for ends in sides.values():
+            if len(ends) == 2:
+                self.peer[ends[0]], self.peer[ends[1]] = ends[1], ends[0]
+
+    def _pass_through(self, index, stack):
+        """Terminaison de sortie après traversée d'un port ou d'un circuit (-1 si fin)"""
+        object_type = self.types[index]
+        if object_type == FRONT_PORT:
+            if self.rear[index] < 0:
+                return -1, DANGLING
+            stack.append(self.position[index])
+            return self.rear[index], None
+        if object_type == REAR_PORT:
+            if stack:
+                front = self.fronts.get((index, stack.pop()), -1)
+            elif self.positions.get(index, 1) == 1:
+                front = self.fronts.get((index, 1), -1)
+            else:
+                return -1, SPLIT
+            return front, None if front >= 0 else DANGLING
+        if object_type == CIRCUIT_TERMINATION:
+            return self.peer[index], None if self.peer[index] >= 0 else DANGLING
+        return -1, COMPLETE
+
+    def trace(self, start):
+        """Suit le chemin depuis une terminaison ; retourne (sauts, état)
+
+        Chaque saut est (terminaison proche, ID du câble, terminaison distante).
+        Les positions traversées sont empilées à l'entrée d'un port avant et
+        dépilées à la sortie du port arrière correspondant.
+        """
+        hops, stack, visited = [], [], {start}
+        current = start
+        while True:
+            rank = self.cable[current]
+            if rank < 0:
+                return hops, DANGLING
+            far_side = self.cable_ends[rank][1 - self.side[current]]
+            if len(far_side) != 1:
+                hops.append((current, self.cable_ids[rank], far_side[0] if far_side else -1))
+                return hops, SPLIT if far_side else DANGLING
+            far = far_side[0]
+            hops.append((current, self.cable_ids[rank], far))
+            if far in visited:
+                return hops, LOOP
+            visited.add(far)
+
+            current, state = self._pass_through(far, stack)
+            if current < 0:
+                return hops, state
+            if current in visited:
+                return hops, LOOP
+            visited.add(current)
+
+    def endpoints(self):
+        """Terminaisons de départ d'un traçage : câblées et qui ne sont pas des points de passage"""
+        passive = (FRONT_PORT, REAR_PORT, CIRCUIT_TERMINATION)
+        return [i for i in range(len(self)) if self.cable[i] >= 0 and self.types[i] not in passive]
+
+    def uncabled(self):
+        """Interfaces chargées sans câble (voir fetch_sources(interfaces=True))"""
+        return [i for i in range(len(self)) if self.cable[i] < 0 and self.types[i] == INTERFACE]
+
+    def components(self):
+        """Composantes connexes par union-find ; retourne (racine par nœud, câbles fermant une boucle)"""
+        parent = array('q', range(len(self)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(a, b):
+            root_a, root_b = find(a), find(b)
+            if root_a == root_b:
+                return False
+            parent[root_a] = root_b
+            return True
+
+        # Liens internes d'abord : ils forment des étoiles et ne bouclent jamais seuls
+        for index in range(len(self)):
+            if self.rear[index] >= 0:
+                union(index, self.rear[index])
+            if self.peer[index] > index:
+                union(index, self.peer[index])
+
+        cycles = []
+        for rank, (a_ends, b_ends) in enumerate(self.cable_ends):
+            ends = a_ends + b_ends
+            # Un câble multi-terminaisons est relié en étoile depuis sa première terminaison
+            if any([not union(ends[0], other) for other in ends[1:]]):
+                cycles.append(self.cable_ids[rank])
+
+        return array('q', (find(i) for i in range(len(self)))), cycles
+
+    def describe(self, hops):
+        """Chemin lisible : A ─[#câble]─ B ⇢ C ─[#câble]─ D"""
+        if not hops:
+            return ''
+        parts = [self.labels[hops[0][0]]]
+        for i, (near, cable_id, far) in enumerate(hops):
+            if i:
+                parts.append(f"⇢ {self.labels[near]}")
+            parts.append(f"─[#{cable_id}]─ {self.labels[far] if far >= 0 else '∅'}")
+        return ' '.join(parts)
+
+
+def fetch_sources(client, site_filter=None, interfaces=False):
+    """Charge en parallèle les données du graphe (arguments de build_graph)
+
+    interfaces=True charge aussi toutes les interfaces, pour repérer celles
+    qui ne sont pas câblées (les interfaces câblées viennent déjà des câbles).
+    """
+    params = {'site': site_filter} if site_filter else {}
+    sources = {
+        'cables': ('/dcim/cables/', params),
+        'front_ports': ('/dcim/front-ports/', params),
+        'rear_ports': ('/dcim/rear-ports/', params),
+        # Toutes les terminaisons : l'extrémité opposée d'un circuit peut être sur un autre site
+        'circuit_terminations': ('/circuits/circuit-terminations/', {}),
+    }
+    if interfaces:
+        sources['interfaces'] = ('/dcim/interfaces/', {'fields': 'id,name,device,cable,type', **params})
+    loaded = {}
+    for name, result in client.run_concurrently(lambda n: list(client.iter_all(*sources[n])), list(sources)):
+        loaded[name] = result
+    return loaded
+
+
+def build_graph(cables, front_ports=(), rear_ports=(), circuit_terminations=(), interfaces=()):
+    """Construit le graphe à partir des chargements bruts (une passe par endpoint)"""
+    graph = CableGraph()
+    for interface in interfaces:
+        graph.add_interface(interface)
+    for port in rear_ports:
+        graph.add_rear_port(port)
+    for port in front_ports:
+        graph.add_front_port(port)
+    graph.add_circuit_terminations(circuit_terminations)
+    for cable in cables:
+        graph.add_cable(cable)
+    return graph
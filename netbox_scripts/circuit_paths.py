@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cache persistant des chemins de bout en bout des circuits
+
+Chaque terminaison de circuit est tracée dans le graphe de câblage jusqu'à
+l'équipement et l'interface qu'elle dessert. Le résultat est enregistré avec
+un index inverse ID d'équipement -> circuits, ce qui rend les deux recherches
+instantanées ; le nom n'est conservé que pour l'affichage, un renommage ne
+rend donc pas l'index caduc. Le cache porte le dernier ID du journal des modifications
+Netbox : il n'est reconstruit que si une terminaison, un câble ou un port a
+changé depuis, ou si une des interfaces auxquelles aboutissent les circuits a
+été modifiée (ex: renommée) ; les autres interfaces ne sont pas surveillées.
+"""
+
+import json
+from datetime import datetime
+
+import cable_graph
+
+# Version du format de fichier : un cache d'un format antérieur est reconstruit
+CACHE_VERSION = 3
+
+# Types d'objets dont une modification peut changer un chemin de circuit ; une
+# interface ne compte que si elle est l'extrémité d'un chemin en cache (le
+# câblage d'une interface est journalisé sur dcim.cable)
+WATCHED_TYPES = (
+    'circuits.circuittermination',
+    'dcim.cable',
+    'dcim.frontport',
+    'dcim.rearport',
+)
+WATCHED_ENDPOINT_TYPE = 'dcim.interface'
+
+
+def resolve_paths(graph, terminations):
+    """Trace chaque terminaison de circuit ; retourne {circuit_id: {'cid', 'sides'}}"""
+    circuits = {}
+    for term in terminations:
+        if not term.get('circuit'):
+            continue
+        entry = circuits.setdefault(str(term['circuit']['id']), {'cid': term['circuit'].get('cid'), 'sides': {}})
+        side = {'state': 'unconnected', 'device': None, 'device_id': None, 'endpoint': None,
+                'endpoint_type': None, 'endpoint_id': None, 'cables': 0, 'path': ''}
+
+        node = graph.index.get((cable_graph.CIRCUIT_TERMINATION, term['id']))
+        if node is not None and graph.cable[node] >= 0:
+            hops, state = graph.trace(node)
+            far = hops[-1][2]
+            side.update(state=state, cables=len(hops), path=graph.describe(hops))
+            if far >= 0:
+                side.update(endpoint=graph.labels[far], endpoint_type=graph.types[far], endpoint_id=graph.ids[far])
+            if far >= 0 and graph.devices[far]:
+                side.update(device=graph.devices[far].get('name'), device_id=graph.devices[far]['id'])
+        entry['sides'][term['term_side']] = side
+    return circuits
+
+
+class PathCache:
+    """Fichier JSON des chemins de circuits et de l'index ID d'équipement -> circuits"""
+
+    def __init__(self, path, netbox_url):
+        self.path = path
+        self.netbox_url = netbox_url
+        self.data = None
+
+    def load(self):
+        """Charge le cache s'il existe et correspond à cette instance Netbox"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return False
+        if data.get('netbox_url') != self.netbox_url or data.get('version') != CACHE_VERSION:
+            return False
+        self.data = data
+        return True
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+
+    @property
+    def watermark(self):
+        return self.data.get('watermark', 0) if self.data else 0
+
+    @property
+    def built_at(self):
+        return self.data.get('built_at') if self.data else None
+
+    def build(self, circuits, watermark):
+        """Remplace le contenu du cache et reconstruit l'index inverse"""
+        devices = {}
+        for circuit_id, entry in circuits.items():
+            for side, endpoint in entry['sides'].items():
+                if endpoint['device_id']:
+                    devices.setdefault(str(endpoint['device_id']), []).append([circuit_id, side])
+        self.data = {
+            'version': CACHE_VERSION,
+            'netbox_url': self.netbox_url,
+            'watermark': watermark,
+            'built_at': datetime.now().isoformat(timespec='seconds'),
+            'circuits': circuits,
+            'devices': devices,
+        }
+
+    def endpoint_ids(self, object_type):
+        """IDs des objets d'un type auxquels aboutit au moins un chemin en cache"""
+        return sorted({side['endpoint_id'] for entry in self.data['circuits'].values()
+                       for side in entry['sides'].values()
+                       if side['endpoint_type'] == object_type and side['endpoint_id'] is not None})
+
+    def circuit(self, circuit_id):
+        return self.data['circuits'].get(str(circuit_id))
+
+    def device_circuits(self, device_id):
+        """[(ID du circuit, entrée du circuit, côté)] raccordés à un équipement"""
+        return [(int(circuit_id), self.data['circuits'][circuit_id], side)
+                for circuit_id, side in self.data['devices'].get(str(device_id), [])]
@@ -7,8 +7,163 @@ import argparse
 import sys
 from tabulate import tabulate
 from netbox_client import create_client
+from config import get_cache_path
+import aggregation
+import cable_graph
+import circuit_paths
 
-def list_circuits(client, filters=None):
+# Tranches de débit engagé (kbps)
+COMMIT_RATE_BUCKETS = aggregation.buckets(
+    'commit_rate',
+    [10000, 100000, 1000000, 10000000],
+    ['< 10 Mbps', '10-100 Mbps', '100 Mbps-1 Gbps', '1-10 Gbps', '≥ 10 Gbps']
+)
+
+def count_circuits(client, keys, sums=None, params=None):
+    """Agrège tous les circuits en un seul chargement paginé (champs réduits)"""
+    fields = {'id', 'status', 'provider', 'type', 'tenant', 'commit_rate'}
+    query = {'fields': ','.join(sorted(fields)), **(params or {})}
+    return aggregation.Aggregator(keys, sums).consume(client.iter_all('/circuits/circuits/', query))
+
+def termination_label(term):
+    """Extrémité d'un circuit : site, réseau fournisseur ou objet de terminaison (Netbox 4.2+)"""
+    for field in ('site', 'provider_network', 'termination'):
+        if term.get(field):
+            return term[field].get('name') or term[field].get('display') or 'N/A'
+    return 'N/A'
+
+def fetch_terminations(client, circuit_ids, chunk_size=100):
+    """Terminaisons de plusieurs circuits en requêtes groupées, jointes par ID de circuit
+
+    Les IDs sont envoyés par lots (circuit_id répété) chargés en parallèle ;
+    retourne {circuit_id: {'A': terminaison, 'Z': terminaison}}.
+    """
+    circuit_ids = list(circuit_ids)
+    chunks = [circuit_ids[i:i + chunk_size] for i in range(0, len(circuit_ids), chunk_size)]
+    
+    def fetch(chunk):
+        return list(client.iter_all('/circuits/circuit-terminations/', {'circuit_id': chunk}))
+    
+    joined = {}
+    for _, terminations in client.run_concurrently(fetch, chunks):
+        for term in terminations:
+            joined.setdefault(term['circuit']['id'], {})[term['term_side']] = term
+    return joined
+
+def format_endpoints(terminations):
+    """'Site A ↔ Site Z' à partir des terminaisons jointes d'un circuit"""
+    labels = [termination_label(terminations[side]) for side in ('A', 'Z') if side in terminations]
+    return ' ↔ '.join(labels) if labels else 'N/A'
+
+def _latest_change_id(client):
+    """ID de la dernière entrée du journal des modifications (0 si vide)"""
+    changes = client.get('/extras/object-changes/', {'limit': 1, 'ordering': '-id'})
+    if changes and changes.get('results'):
+        return changes['results'][0]['id']
+    return 0
+
+def _changes_since(client, cache, chunk_size=100):
+    """Nombre de modifications des objets surveillés depuis le filigrane du cache (requêtes en parallèle)
+
+    Une requête par type surveillé, plus une par lot d'interfaces extrémités
+    de circuits : modifier une autre interface ne périme pas le cache.
+    """
+    queries = [{'changed_object_type': object_type} for object_type in circuit_paths.WATCHED_TYPES]
+    endpoints = cache.endpoint_ids(circuit_paths.WATCHED_ENDPOINT_TYPE)
+    queries.extend({'changed_object_type': circuit_paths.WATCHED_ENDPOINT_TYPE,
+                    'changed_object_id': endpoints[i:i + chunk_size]}
+                   for i in range(0, len(endpoints), chunk_size))
+    
+    def count(query):
+        changes = client.get('/extras/object-changes/', {**query, 'id__gt': cache.watermark, 'limit': 1})
+        # Réponse invalide : considérer le cache comme périmé
+        return changes['count'] if changes else 1
+    
+    return sum(result for _, result in client.run_concurrently(count, queries))
+
+def load_path_cache(client, rebuild=False):
+    """Cache des chemins de circuits, reconstruit seulement si le câblage a changé"""
+    cache = circuit_paths.PathCache(get_cache_path(client.config, 'circuit_paths.json'), client.base_url)
+    
+    if not rebuild and cache.load():
+        changes = _changes_since(client, cache)
+        if not changes:
+            return cache
+        print(f"🔄 {changes} modification(s) de câblage depuis le {cache.built_at}, reconstruction du cache...")
+    
+    # Filigrane relevé avant le chargement : une modification concurrente forcera la prochaine reconstruction
+    watermark = _latest_change_id(client)
+    print("📋 Récupération des câbles, ports de brassage et terminaisons de circuits...")
+    sources = cable_graph.fetch_sources(client)
+    graph = cable_graph.build_graph(**sources)
+    cache.build(circuit_paths.resolve_paths(graph, sources['circuit_terminations']), watermark)
+    cache.save()
+    print(f"💾 Cache des chemins enregistré: {cache.path}")
+    return cache
+
+def _endpoint_row(side, endpoint):
+    states = {
+        cable_graph.COMPLETE: '✅',
+        cable_graph.DANGLING: '⚠️  Incomplet',
+        cable_graph.SPLIT: '⚠️  Ambigu',
+        cable_graph.LOOP: '❌ Boucle',
+        'unconnected': '🔳 Non câblé',
+    }
+    return [side, endpoint['device'] or 'N/A', endpoint['endpoint'] or 'N/A', endpoint['cables'],
+            states.get(endpoint['state'], endpoint['state'])]
+
+def circuit_devices(client, circuit_cid, rebuild=False):
+    """Équipements et interfaces desservis par un circuit (depuis le cache des chemins)"""
+    circuits = client.get('/circuits/circuits/', {'cid': circuit_cid})
+    if not circuits or not circuits.get('results'):
+        print(f"❌ Circuit '{circuit_cid}' non trouvé")
+        return
+    
+    circuit = circuits['results'][0]
+    cache = load_path_cache(client, rebuild)
+    entry = cache.circuit(circuit['id'])
+    if not entry or not entry['sides']:
+        print(f"❌ Aucune terminaison pour le circuit '{circuit_cid}'")
+        return
+    
+    rows = [_endpoint_row(side, entry['sides'][side]) for side in sorted(entry['sides'])]
+    print(f"\n🔌 Raccordements du circuit {circuit['cid']}:")
+    print(tabulate(rows, headers=['Côté', 'Équipement', 'Extrémité', 'Câbles', 'État'], tablefmt='grid'))
+    
+    for side in sorted(entry['sides']):
+        if entry['sides'][side]['path']:
+            print(f"  {side}: {entry['sides'][side]['path']}")
+
+def device_circuits(client, device_name, rebuild=False):
+    """Circuits aboutissant sur un équipement (index inverse du cache des chemins)"""
+    devices = client.get('/dcim/devices/', {'name': device_name})
+    if not devices or not devices.get('results'):
+        print(f"❌ Équipement '{device_name}' non trouvé")
+        return
+    
+    # L'index est tenu par ID : un nom porté par plusieurs équipements les couvre tous
+    cache = load_path_cache(client, rebuild)
+    landed = [item for device in devices['results'] for item in cache.device_circuits(device['id'])]
+    
+    if not landed:
+        print(f"❌ Aucun circuit raccordé à '{device_name}'")
+        return
+    
+    rows = []
+    for _, entry, side in sorted(landed, key=lambda item: (item[1]['cid'] or '', item[2])):
+        endpoint = entry['sides'][side]
+        remote = entry['sides'].get('Z' if side == 'A' else 'A')
+        rows.append([
+            entry['cid'],
+            side,
+            endpoint['endpoint'],
+            remote['endpoint'] if remote and remote['endpoint'] else 'N/A',
+        ])
+    
+    print(f"\n🖥️  Circuits raccordés à {device_name} ({len(rows)}):")
+    print(tabulate(rows, headers=['CID', 'Côté', 'Extrémité locale', 'Extrémité distante'], tablefmt='grid'))
+
+def list_circuits(client, filters=None, endpoints=False):
     """Liste tous les circuits"""
     print("📋 Récupération des circuits...")
     
@@ -32,6 +187,12 @@ def list_circuits(client, filters=None):
     headers = ['ID', 'CID', 'Provider', 'Type', 'Status', 'Commit Rate', 'Description']
     rows = []
     
+    # Extrémités : terminaisons chargées par lots puis jointes localement
+    terminations = {}
+    if endpoints:
+        headers.insert(5, 'Extrémités')
+        terminations = fetch_terminations(client, [circuit['id'] for circuit in circuits])
+    
     for circuit in circuits:
         commit_rate = ""
         if circuit.get('commit_rate'):
@@ -46,6 +207,8 @@ def list_circuits(client, filters=None):
             commit_rate if commit_rate else 'N/A',
             circuit.get('description', 'N/A')[:50] + ('...' if len(circuit.get('description', '')) > 50 else '')
         ]
+        if endpoints:
+            row.insert(5, format_endpoints(terminations.get(circuit['id'], {})))
         rows.append(row)
     
     print(f"\n🔌 Circuits ({len(circuits)} trouvé(s)):")
@@ -61,13 +224,14 @@ def list_providers(client):
         print("❌ Aucun fournisseur trouvé")
         return
     
+    # Un seul parcours des circuits pour compter ceux de chaque fournisseur
+    stats = count_circuits(client, {'provider': 'provider.id'})
+    
     headers = ['ID', 'Nom', 'ASN', 'Account', 'Portal URL', 'NOC Contact', 'Circuits']
     rows = []
     
     for provider in providers:
-        # Compter les circuits pour ce fournisseur
-        circuits = client.get('/circuits/circuits/', {'provider_id': provider['id']})
-        circuit_count = circuits['count'] if circuits else 0
+        circuit_count = stats.count('provider', provider['id'])
         
         row = [
             provider['id'],
@@ -93,13 +257,13 @@ def list_circuit_types(client):
         print("❌ Aucun type de circuit trouvé")
         return
     
+    stats = count_circuits(client, {'type': 'type.id'})
+    
     headers = ['ID', 'Nom', 'Slug', 'Description', 'Circuits']
     rows = []
     
     for circuit_type in circuit_types:
-        # Compter les circuits de ce type
-        circuits = client.get('/circuits/circuits/', {'type_id': circuit_type['id']})
-        circuit_count = circuits['count'] if circuits else 0
+        circuit_count = stats.count('type', circuit_type['id'])
         
         row = [
             circuit_type['id'],
@@ -113,8 +277,12 @@ def list_circuit_types(client):
     print(f"\n📋 Types de circuits ({len(circuit_types)} trouvé(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
-def circuit_details(client, circuit_cid):
-    """Affiche les détails d'un circuit spécifique"""
+def circuit_details(client, circuit_cid, paths=False):
+    """Affiche les détails d'un circuit spécifique
+
+    Les raccordements ne sont affichés qu'avec paths : ils viennent du cache des
+    chemins, dont la construction charge tout le câblage de l'inventaire.
+    """
     print(f"🔍 Recherche du circuit: {circuit_cid}")
     
     # Recherche par CID
@@ -164,6 +332,16 @@ def circuit_details(client, circuit_cid):
             term_rows.append(row)
         
         print(tabulate(term_rows, headers=term_headers, tablefmt='grid'))
+        
+        # Ce à quoi chaque terminaison est raccordée de notre côté
+        if not paths:
+            print("💡 Relancer avec --paths pour les équipements raccordés (cache des chemins de circuits)")
+            return
+        entry = load_path_cache(client).circuit(circuit['id'])
+        if entry and entry['sides']:
+            print(f"\n🔗 Raccordements:")
+            rows = [_endpoint_row(side, entry['sides'][side]) for side in sorted(entry['sides'])]
+            print(tabulate(rows, headers=['Côté', 'Équipement', 'Extrémité', 'Câbles', 'État'], tablefmt='grid'))
     else:
         print("❌ Aucune terminaison trouvée")
 
@@ -193,22 +371,15 @@ def provider_circuits(client, provider_name):
     headers = ['CID', 'Type', 'Status', 'Sites', 'Commit Rate', 'Install Date']
     rows = []
     
+    # Terminaisons de tous les circuits en quelques requêtes groupées
+    terminations = fetch_terminations(client, [circuit['id'] for circuit in circuits])
+    
     for circuit in circuits:
-        # Récupérer les sites des terminaisons
-        terminations = client.get('/circuits/circuit-terminations/', {'circuit_id': circuit['id']})
-        sites = []
-        if terminations and terminations.get('results'):
-            for term in terminations['results']:
-                if term.get('site'):
-                    sites.append(term['site']['name'])
-        
-        sites_str = ' ↔ '.join(sites) if sites else 'N/A'
-        
         row = [
             circuit['cid'],
             circuit['type']['name'] if circuit.get('type') else 'N/A',
             circuit['status']['label'] if circuit.get('status') else 'N/A',
-            sites_str,
+            format_endpoints(terminations.get(circuit['id'], {})),
             f"{circuit.get('commit_rate', 'N/A')} kbps" if circuit.get('commit_rate') else 'N/A',
             circuit.get('install_date', 'N/A')
         ]
@@ -217,60 +388,53 @@ def provider_circuits(client, provider_name):
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
 def circuit_statistics(client):
-    """Statistiques des circuits"""
+    """Statistiques des circuits (un seul parcours de tous les circuits)"""
     print("📊 Statistiques des circuits")
     print("=" * 40)
     
-    # Statistiques générales
-    all_circuits = client.get('/circuits/circuits/')
-    total_circuits = all_circuits['count'] if all_circuits else 0
+    stats = count_circuits(client, {
+        'status': 'status.label',
+        'provider': 'provider.name',
+        'type': 'type.name',
+        'tenant': 'tenant.name',
+        'commit_rate': COMMIT_RATE_BUCKETS,
+    }, sums={'commit_rate': 'commit_rate'})
     
     # Par status
     print("\n📈 Répartition par status:")
-    status_stats = {}
-    if all_circuits and all_circuits.get('results'):
-        for circuit in all_circuits['results']:
-            status = circuit.get('status', {}).get('label', 'Unknown')
-            status_stats[status] = status_stats.get(status, 0) + 1
-    
-    status_rows = [[status, count] for status, count in status_stats.items()]
+    status_rows = [[status, count] for status, count in stats.top('status')]
     if status_rows:
         print(tabulate(status_rows, headers=['Status', 'Nombre'], tablefmt='grid'))
     
     # Par fournisseur
     print(f"\n🏢 Répartition par fournisseur:")
-    providers = client.get_all('/circuits/providers/')
-    provider_rows = []
-    
-    for provider in providers:
-        circuits = client.get('/circuits/circuits/', {'provider_id': provider['id']})
-        count = circuits['count'] if circuits else 0
-        if count > 0:
-            provider_rows.append([provider['name'], count])
+    provider_rows = [[provider, count, f"{stats.sum('provider', provider, 'commit_rate'):,} kbps"]
+                     for provider, count in stats.top('provider')]
     
     if provider_rows:
-        # Trier par nombre de circuits décroissant
-        provider_rows.sort(key=lambda x: x[1], reverse=True)
-        print(tabulate(provider_rows[:10], headers=['Fournisseur', 'Circuits'], tablefmt='grid'))
+        print(tabulate(provider_rows[:10], headers=['Fournisseur', 'Circuits', 'Débit engagé'], tablefmt='grid'))
         if len(provider_rows) > 10:
             print(f"... et {len(provider_rows) - 10} autres fournisseurs")
     
     # Par type
     print(f"\n📋 Répartition par type:")
-    circuit_types = client.get_all('/circuits/circuit-types/')
-    type_rows = []
-    
-    for circuit_type in circuit_types:
-        circuits = client.get('/circuits/circuits/', {'type_id': circuit_type['id']})
-        count = circuits['count'] if circuits else 0
-        if count > 0:
-            type_rows.append([circuit_type['name'], count])
-    
+    type_rows = [[circuit_type, count] for circuit_type, count in stats.top('type')]
     if type_rows:
-        type_rows.sort(key=lambda x: x[1], reverse=True)
         print(tabulate(type_rows, headers=['Type', 'Circuits'], tablefmt='grid'))
     
-    print(f"\n📊 Total général: {total_circuits} circuits")
+    # Par tenant
+    print(f"\n👥 Répartition par tenant:")
+    tenant_rows = [[tenant, count] for tenant, count in stats.top('tenant', 10)]
+    if tenant_rows:
+        print(tabulate(tenant_rows, headers=['Tenant', 'Circuits'], tablefmt='grid'))
+    
+    # Par tranche de débit engagé
+    print(f"\n📶 Répartition par débit engagé:")
+    rate_rows = [[bucket, count] for bucket, count in stats.top('commit_rate')]
+    if rate_rows:
+        print(tabulate(rate_rows, headers=['Débit engagé', 'Circuits'], tablefmt='grid'))
+    
+    print(f"\n📊 Total général: {stats.total} circuits")
 
 def main():
     parser = argparse.ArgumentParser(description='Scripts CLI pour les circuits Netbox')
@@ -282,6 +446,7 @@ def main():
     list_parser.add_argument('--type', help='Filtrer par type')
     list_parser.add_argument('--status', help='Filtrer par status')
     list_parser.add_argument('--site', help='Filtrer par site')
+    list_parser.add_argument('--endpoints', action='store_true', help='Afficher les extrémités A ↔ Z')
     
     # Commande providers
     providers_parser = subparsers.add_parser('providers', help='Liste tous les fournisseurs')
@@ -292,11 +457,23 @@ def main():
     # Commande details
     details_parser = subparsers.add_parser('details', help='Détails d\'un circuit')
     details_parser.add_argument('cid', help='CID du circuit')
+    details_parser.add_argument('--paths', action='store_true',
+                                help='Afficher les raccordements (construit le cache des chemins au besoin)')
     
     # Commande provider-circuits
     provider_circuits_parser = subparsers.add_parser('provider-circuits', help='Circuits d\'un fournisseur')
     provider_circuits_parser.add_argument('provider', help='Nom du fournisseur')
     
+    # Commande circuit-devices
+    circuit_devices_parser = subparsers.add_parser('circuit-devices', help='Équipements desservis par un circuit')
+    circuit_devices_parser.add_argument('cid', help='CID du circuit')
+    circuit_devices_parser.add_argument('--rebuild', action='store_true', help='Reconstruire le cache des chemins')
+    
+    # Commande device-circuits
+    device_circuits_parser = subparsers.add_parser('device-circuits', help='Circuits aboutissant sur un équipement')
+    device_circuits_parser.add_argument('device', help='Nom de l\'équipement')
+    device_circuits_parser.add_argument('--rebuild', action='store_true', help='Reconstruire le cache des chemins')
+    
     # Commande stats
     stats_parser = subparsers.add_parser('stats', help='Statistiques des circuits')
     
@@ -323,7 +500,7 @@ def main():
                 'site': args.site
             }
             filters = {k: v for k, v in filters.items() if v is not None}
-            list_circuits(client, filters if filters else None)
+            list_circuits(client, filters if filters else None, args.endpoints)
         
         elif args.command == 'providers':
             list_providers(client)
@@ -332,11 +509,17 @@ def main():
             list_circuit_types(client)
         
         elif args.command == 'details':
-            circuit_details(client, args.cid)
+            circuit_details(client, args.cid, args.paths)
         
         elif args.command == 'provider-circuits':
             provider_circuits(client, args.provider)
         
+        elif args.command == 'circuit-devices':
+            circuit_devices(client, args.cid, args.rebuild)
+        
+        elif args.command == 'device-circuits':
+            device_circuits(client, args.device, args.rebuild)
+        
         elif args.command == 'stats':
             circuit_statistics(client)
     
@@ -16,7 +16,15 @@ DEFAULT_CONFIG = {
     "verify_ssl": True,
     "items_per_page": 50,
     "max_items": 1000,
-    "date_format": "%Y-%m-%d %H:%M:%S"
+    "date_format": "%Y-%m-%d %H:%M:%S",
+    "max_workers": 4,
+    "max_retries": 3,
+    "rate_limit": 0,
+    "bulk_max_items": 500,
+    "bulk_max_bytes": 1000000,
+    "cache_dir": "cache",
+    "validation_rules": [],
+    "validation_modules": []
 }
 
 CONFIG_FILE = Path(__file__).parent / "netbox_config.json"
@@ -53,6 +61,14 @@ def get_config():
     """Retourne la configuration actuelle"""
     return load_config()
 
+def get_cache_path(config, name):
+    """Chemin d'un fichier de cache (cache_dir relatif au dossier des scripts)"""
+    cache_dir = Path(config.get('cache_dir') or 'cache')
+    if not cache_dir.is_absolute():
+        cache_dir = Path(__file__).parent / cache_dir
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / name
+
 def update_config(**kwargs):
     """Met à jour la configuration avec les valeurs fournies"""
     config = load_config()
@@ -4,9 +4,18 @@ Scripts CLI pour la gestion DCIM (Data Center Infrastructure Management) dans Ne
 """
 
 import argparse
+import csv
+import json
 import sys
+import time
 from tabulate import tabulate
 from netbox_client import create_client
+import rack_capacity
+import cable_graph
+import power_budget
+import location_tree
+import nbsnap
+import numpy as np
 
 def list_sites(client, filters=None):
     """Liste tous les sites"""
@@ -81,36 +90,22 @@ def list_racks(client, filters=None):
     print(f"\n🗄️  Racks ({len(racks)} trouvé(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
-def rack_elevation(client, rack_name_or_id):
-    """Affiche l'élévation d'un rack"""
-    print(f"🔍 Récupération de l'élévation du rack: {rack_name_or_id}")
-    
-    # Trouver le rack
-    if rack_name_or_id.isdigit():
-        rack = client.get(f'/dcim/racks/{rack_name_or_id}/')
-    else:
-        racks = client.get('/dcim/racks/', {'name': rack_name_or_id})
-        if racks and racks.get('results'):
-            rack = racks['results'][0]
-        else:
-            rack = None
-    
-    if not rack:
-        print(f"❌ Rack '{rack_name_or_id}' non trouvé")
-        return
-    
-    # Récupérer l'élévation
-    elevation = client.get(f'/dcim/racks/{rack["id"]}/elevation/')
-    
-    if not elevation:
-        print("❌ Impossible de récupérer l'élévation")
-        return
-    
-    print(f"\n🗄️  Élévation du rack: {rack['name']} ({rack['u_height']}U)")
-    print(f"📍 Site: {rack['site']['name']}")
+def _find_rack(client, rack_name_or_id):
+    """Retrouve un rack par nom ou ID"""
+    if str(rack_name_or_id).isdigit():
+        return client.get(f'/dcim/racks/{rack_name_or_id}/')
+    racks = client.get('/dcim/racks/', {'name': rack_name_or_id})
+    if racks and racks.get('results'):
+        return racks['results'][0]
+    return None
+
+def _render_elevation(rack, elevation):
+    """Construit le rendu texte de l'élévation d'un rack (liste de lignes)"""
+    lines = [f"🗄️  Élévation du rack: {rack['name']} ({rack['u_height']}U)",
+             f"📍 Site: {rack['site']['name']}"]
     if rack.get('location'):
-        print(f"📍 Localisation: {rack['location']['name']}")
-    print("=" * 60)
+        lines.append(f"📍 Localisation: {rack['location']['name']}")
+    lines.append("=" * 60)
     
     # Organiser les données par unité
     rack_units = {}
@@ -141,7 +136,188 @@ def rack_elevation(client, rack_name_or_id):
         
         rows.append([f"U{unit:2d}", front_device, rear_device])
     
+    lines.extend(tabulate(rows, headers=headers, tablefmt='grid').splitlines())
+    return lines
+
+def _side_by_side(blocks, gap=4):
+    """Juxtapose plusieurs rendus texte en colonnes"""
+    widths = [max((len(line) for line in block), default=0) for block in blocks]
+    height = max(len(block) for block in blocks)
+    lines = []
+    for i in range(height):
+        parts = [(block[i] if i < len(block) else '').ljust(width) for block, width in zip(blocks, widths)]
+        lines.append((' ' * gap).join(parts).rstrip())
+    return lines
+
+def rack_elevation(client, rack_name_or_id):
+    """Affiche l'élévation d'un rack"""
+    print(f"🔍 Récupération de l'élévation du rack: {rack_name_or_id}")
+    
+    rack = _find_rack(client, rack_name_or_id)
+    if not rack:
+        print(f"❌ Rack '{rack_name_or_id}' non trouvé")
+        return
+    
+    # Récupérer l'élévation
+    elevation = client.get(f'/dcim/racks/{rack["id"]}/elevation/')
+    
+    if not elevation:
+        print("❌ Impossible de récupérer l'élévation")
+        return
+    
+    print()
+    print('\n'.join(_render_elevation(rack, elevation)))
+
+# Requêtes d'élévation simultanées au plus, sauf --workers explicite
+ELEVATION_WORKERS = 32
+
+def multi_rack_elevation(client, rack_refs=None, site=None, side_by_side=0, output_file=None, workers=None):
+    """Élévations de plusieurs racks récupérées en parallèle, rendues au fil de l'eau"""
+    targets = [('ref', ref) for ref in (rack_refs or [])]
+    if site:
+        print(f"📋 Récupération des racks du site: {site}")
+        targets.extend(('rack', rack) for rack in client.iter_all('/dcim/racks/', {'site': site}))
+    
+    if not targets:
+        print("❌ Aucun rack trouvé")
+        return
+    
+    def fetch(target):
+        kind, value = target
+        rack = _find_rack(client, value) if kind == 'ref' else value
+        if not rack:
+            return None, f"❌ Rack '{value}' non trouvé"
+        elevation = client.get(f'/dcim/racks/{rack["id"]}/elevation/')
+        if not elevation:
+            return None, f"❌ Impossible de récupérer l'élévation de {rack['name']}"
+        return _render_elevation(rack, elevation), None
+    
+    out = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
+    print(f"🔍 Récupération de {len(targets)} élévation(s) en parallèle...")
+    started = time.monotonic()
+    
+    try:
+        indexes = {id(target): i for i, target in enumerate(targets)}
+        pending, next_group = {}, 0
+        # Une requête par rack, toutes en vol : la rangée prend le temps du rack le plus lent
+        # (le pool de connexions du client s'ajuste à ce nombre de threads)
+        workers = workers or min(len(targets), ELEVATION_WORKERS)
+        results = client.run_concurrently(fetch, targets, max_workers=workers)
+        
+        for target, (lines, error) in results:
+            if error:
+                # L'erreur prend la place de l'élévation ; rappelée à l'écran si elle part dans un fichier
+                if output_file:
+                    print(error)
+                lines = [error]
+            
+            if not side_by_side:
+                # Rendu immédiat, dans l'ordre d'arrivée
+                out.write('\n'.join(lines) + '\n\n')
+                out.flush()
+                continue
+            
+            # Côte à côte : une rangée est écrite dès que tous ses racks sont arrivés
+            pending[indexes[id(target)]] = lines
+            while True:
+                group = range(next_group, min(next_group + side_by_side, len(targets)))
+                if not group or any(i not in pending for i in group):
+                    break
+                out.write('\n'.join(_side_by_side([pending.pop(i) for i in group])) + '\n\n')
+                out.flush()
+                next_group += side_by_side
+    finally:
+        if output_file:
+            out.close()
+    
+    elapsed = time.monotonic() - started
+    print(f"⏱️  {len(targets)} rack(s) en {elapsed:.2f}s" + (f" → {output_file}" if output_file else ""))
+
+def _snapshot_racks(snap, site_filter=None, location_filter=None):
+    """Racks d'un instantané binaire et occupation calculée sur ses colonnes"""
+    selected = np.ones(snap.rows('racks'), dtype=bool)
+    if site_filter:
+        selected &= snap.match('racks', 'site', site_filter) | snap.match('racks', 'site_name', site_filter)
+    if location_filter:
+        selected &= snap.match('racks', 'location', location_filter)
+    
+    racks = []
+    for row in snap.records('racks', ['id', 'name', 'site_name', 'u_height', 'starting_unit'], np.nonzero(selected)[0]):
+        racks.append({
+            'id': row['id'],
+            'name': row['name'],
+            'site': {'name': row['site_name']} if row['site_name'] else None,
+            'u_height': max(row['u_height'], 0),
+            'starting_unit': row['starting_unit'] if row['starting_unit'] > 0 else None,
+        })
+    
+    # Faces occupées : les deux, sauf pour un équipement demi-profondeur monté d'un côté
+    # (instantanés antérieurs à la colonne full_depth : tous pleine profondeur)
+    half = np.zeros(snap.rows('devices'), dtype=bool)
+    if 'full_depth' in snap.tables['devices']['columns']:
+        half = snap.column('devices', 'full_depth') == 0
+    face = snap.column('devices', 'face')
+    occupancy = rack_capacity.occupancy_from_columns(
+        racks, snap.column('devices', 'rack_id'), snap.column('devices', 'position'), snap.column('devices', 'u_height'),
+        ~(half & (face == snap.code('rear'))), ~(half & (face == snap.code('front'))))
+    return racks, occupancy
+
+def rack_capacity_report(client, site_filter=None, location_filter=None, snapshot_file=None):
+    """Rapport de capacité des racks calculé localement (nombre de requêtes constant)"""
+    if snapshot_file:
+        print(f"📋 Lecture de l'instantané binaire {snapshot_file}...")
+        racks, occupancy = _snapshot_racks(nbsnap.Snapshot(snapshot_file), site_filter, location_filter)
+        if not racks:
+            print("❌ Aucun rack trouvé")
+            return
+    else:
+        print("📋 Récupération des racks, équipements et types d'équipements...")
+        
+        params = {}
+        if site_filter:
+            params['site'] = site_filter
+        if location_filter:
+            params['location'] = location_filter
+        
+        racks = list(client.iter_all('/dcim/racks/', params))
+        if not racks:
+            print("❌ Aucun rack trouvé")
+            return
+        
+        devices = client.iter_all('/dcim/devices/', params)
+        device_types = client.iter_all('/dcim/device-types/')
+        occupancy = rack_capacity.compute_occupancy(racks, devices, device_types)
+    
+    headers = ['Site', 'Rack', 'Unités', 'Équipements', 'U occupés', 'U libres', 'Plus grand bloc', 'Fragmentation']
+    rows = []
+    totals = {'units': 0, 'used': 0, 'free': 0}
+    
+    for rack in sorted(racks, key=lambda r: (r['site']['name'] if r.get('site') else '', r['name'])):
+        rack_occupancy = occupancy[rack['id']]
+        used, free = rack_occupancy.used_units(), rack_occupancy.free_units()
+        totals['units'] += rack_occupancy.u_height
+        totals['used'] += used
+        totals['free'] += free
+        
+        name = rack['name'] + (' ⚠️' if rack_occupancy.overlaps else '')
+        rows.append([
+            rack['site']['name'] if rack.get('site') else 'N/A',
+            name,
+            f"{rack_occupancy.u_height}U",
+            rack_occupancy.devices,
+            f"{used:g}U",
+            f"{free:g}U",
+            f"{rack_occupancy.largest_free_block():g}U",
+            f"{rack_occupancy.fragmentation() * 100:.0f}%"
+        ])
+    
+    print(f"\n🗄️  Capacité des racks ({len(racks)} rack(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
+    
+    usage = totals['used'] / totals['units'] * 100 if totals['units'] else 0
+    print(f"\n📊 Total: {totals['units']}U, {totals['used']:g}U occupés, {totals['free']:g}U libres ({usage:.1f}% utilisé)")
+    if any(o.overlaps for o in occupancy.values()):
+        print("⚠️  Racks marqués: équipements se chevauchant sur les mêmes unités")
 
 def list_locations(client, site_filter=None):
     """Liste les localisations"""
@@ -174,6 +350,38 @@ def list_locations(client, site_filter=None):
     print(f"\n📍 Localisations ({len(locations)} trouvée(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def location_hierarchy(client, site_filter=None, max_depth=None, as_json=False):
+    """Arbre des localisations avec racks, équipements et capacité cumulés"""
+    log = sys.stderr if as_json else sys.stdout
+    print("📋 Récupération des sites, localisations, racks et équipements...", file=log)
+    
+    params = {'site': site_filter} if site_filter else {}
+    site_params = {'slug': site_filter} if site_filter else {}
+    sources = {
+        'sites': ('/dcim/sites/', {'fields': 'id,name', **site_params}),
+        'locations': ('/dcim/locations/', {'fields': 'id,name,site,parent', **params}),
+        'racks': ('/dcim/racks/', {'fields': 'id,site,location,u_height', **params}),
+        'devices': ('/dcim/devices/', {'fields': 'id,site,location', **params}),
+    }
+    loaded = {}
+    for name, result in client.run_concurrently(lambda n: list(client.iter_all(*sources[n])), list(sources)):
+        loaded[name] = result
+    
+    roots = location_tree.build_tree(loaded['sites'], loaded['locations'], loaded['racks'], loaded['devices'])
+    if not roots:
+        print("❌ Aucun site trouvé", file=log)
+        return
+    
+    if as_json:
+        json.dump([root.to_dict() for root in roots], sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return
+    
+    for root in roots:
+        print()
+        for line in location_tree.iter_lines(root, max_depth):
+            print(line)
+
 def list_cables(client, filters=None):
     """Liste les câbles"""
     print("📋 Récupération des câbles...")
@@ -235,6 +443,107 @@ def list_cables(client, filters=None):
     print(f"\n🔌 Câbles ({len(cables)} trouvé(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def load_cable_graph(client, site_filter=None, interfaces=False):
+    """Charge câbles, ports de brassage et terminaisons de circuits (et interfaces) en parallèle"""
+    if interfaces:
+        print("📋 Récupération des câbles, interfaces, ports de brassage et terminaisons de circuits...")
+    else:
+        print("📋 Récupération des câbles, ports de brassage et terminaisons de circuits...")
+    loaded = cable_graph.fetch_sources(client, site_filter, interfaces)
+    return cable_graph.build_graph(**loaded)
+
+def trace_interface(client, device_name, interface_name, site_filter=None):
+    """Trace le chemin d'une interface localement, à travers les panneaux de brassage"""
+    interfaces = client.get('/dcim/interfaces/', {'device': device_name, 'name': interface_name})
+    if not interfaces or not interfaces.get('results'):
+        print(f"❌ Interface '{device_name}:{interface_name}' non trouvée")
+        return
+    interface = interfaces['results'][0]
+    
+    graph = load_cable_graph(client, site_filter)
+    start = graph.index.get(('dcim.interface', interface['id']))
+    if start is None or graph.cable[start] < 0:
+        print(f"ℹ️  {device_name}:{interface_name} n'est pas câblée")
+        return
+    
+    hops, state = graph.trace(start)
+    
+    headers = ['Saut', 'Extrémité proche', 'Câble', 'Extrémité distante']
+    rows = [[i + 1, graph.labels[near], f"#{cable_id}", graph.labels[far] if far >= 0 else 'N/A']
+            for i, (near, cable_id, far) in enumerate(hops)]
+    
+    print(f"\n🔌 Chemin de {device_name}:{interface_name} ({len(hops)} câble(s)):")
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
+    
+    messages = {
+        cable_graph.COMPLETE: "✅ Chemin complet",
+        cable_graph.DANGLING: "⚠️  Chemin incomplet: extrémité non câblée",
+        cable_graph.LOOP: "❌ Boucle détectée",
+        cable_graph.SPLIT: "⚠️  Chemin ambigu: plusieurs extrémités possibles",
+    }
+    print(messages[state])
+
+def cable_graph_report(client, site_filter=None, show_paths=False, limit=50):
+    """Trace toutes les interfaces câblées, liste les non câblées et analyse les composantes connexes"""
+    started = time.monotonic()
+    graph = load_cable_graph(client, site_filter, interfaces=True)
+    loaded = time.monotonic()
+    
+    endpoints = graph.endpoints()
+    uncabled = graph.uncabled()
+    states = {}
+    anomalies, paths = [], []
+    for start in endpoints:
+        hops, state = graph.trace(start)
+        states[state] = states.get(state, 0) + 1
+        if state != cable_graph.COMPLETE:
+            anomalies.append([graph.labels[start], state, graph.describe(hops)])
+        elif show_paths:
+            paths.append([graph.labels[start], graph.labels[hops[-1][2]], len(hops)])
+    
+    roots, cycles = graph.components()
+    sizes = {}
+    for root in roots:
+        sizes[root] = sizes.get(root, 0) + 1
+    traced = time.monotonic()
+    
+    stats_table = [
+        ['🔗 Terminaisons', len(graph)],
+        ['🔌 Câbles', len(graph.cable_ids)],
+        ['🔳 Interfaces non câblées', len(uncabled)],
+        ['🧩 Composantes connexes', len(sizes)],
+        ['📏 Plus grande composante', max(sizes.values(), default=0)],
+        ['🛤️  Chemins tracés', len(endpoints)],
+        ['✅ Complets', states.get(cable_graph.COMPLETE, 0)],
+        ['⚠️  Incomplets', states.get(cable_graph.DANGLING, 0)],
+        ['⚠️  Ambigus', states.get(cable_graph.SPLIT, 0)],
+        ['❌ Boucles', states.get(cable_graph.LOOP, 0)],
+        ['🔁 Câbles fermant un cycle', len(cycles)],
+    ]
+    print(f"\n📊 Graphe de câblage{' du site ' + site_filter if site_filter else ''}:")
+    print(tabulate(stats_table, headers=['Élément', 'Valeur'], tablefmt='grid'))
+    
+    if show_paths and paths:
+        print(f"\n🛤️  Chemins complets ({len(paths)}):")
+        print(tabulate(paths[:limit], headers=['Départ', 'Arrivée', 'Câbles'], tablefmt='grid'))
+    
+    if anomalies:
+        print(f"\n⚠️  Chemins en anomalie ({len(anomalies)}):")
+        print(tabulate(anomalies[:limit], headers=['Départ', 'État', 'Chemin'], tablefmt='grid'))
+        if len(anomalies) > limit:
+            print(f"... et {len(anomalies) - limit} autre(s)")
+    
+    if uncabled:
+        print(f"\n🔳 Interfaces physiques non câblées ({len(uncabled)}):")
+        print(tabulate([[graph.labels[i]] for i in uncabled[:limit]], headers=['Interface'], tablefmt='grid'))
+        if len(uncabled) > limit:
+            print(f"... et {len(uncabled) - limit} autre(s)")
+    
+    if cycles:
+        print(f"\n🔁 Câbles fermant un cycle: {', '.join(f'#{c}' for c in cycles[:limit])}")
+    
+    print(f"\n⏱️  Chargement {loaded - started:.2f}s, analyse {traced - loaded:.2f}s")
+
 def list_power_feeds(client, site_filter=None):
     """Liste les alimentations électriques"""
     print("📋 Récupération des alimentations électriques...")
@@ -268,6 +577,81 @@ def list_power_feeds(client, site_filter=None):
     print(f"\n⚡ Alimentations électriques ({len(power_feeds)} trouvée(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def power_budget_report(client, site_filter=None, only_flagged=False):
+    """Bilan électrique par alimentation, tableau et rack (chargement unique)"""
+    params = {'site': site_filter} if site_filter else {}
+    sources = {
+        'panels': '/dcim/power-panels/',
+        'feeds': '/dcim/power-feeds/',
+        'ports': '/dcim/power-ports/',
+        'outlets': '/dcim/power-outlets/',
+    }
+    
+    print("📋 Récupération des tableaux, alimentations, ports et prises électriques...")
+    loaded = {}
+    for name, result in client.run_concurrently(lambda n: list(client.iter_all(sources[n], params)), list(sources)):
+        loaded[name] = result
+    
+    if not loaded['feeds']:
+        print("❌ Aucune alimentation trouvée")
+        return
+    
+    by_feed, by_panel, by_rack = power_budget.compute_budget(loaded['feeds'], loaded['ports'], loaded['outlets'])
+    
+    def flag(load):
+        if load.overcommitted:
+            return '❌ Surchargée'
+        if load.at_risk:
+            return '⚠️  Max > capacité'
+        return '✅'
+    
+    def load_columns(load):
+        return [f"{load.capacity:,.0f}W", f"{load.allocated:,}W", f"{load.maximum:,}W",
+                f"{load.utilization():.1f}%", flag(load)]
+    
+    load_headers = ['Capacité', 'Allouée', 'Maximale', 'Utilisation', 'État']
+    
+    rows = []
+    for feed in sorted(loaded['feeds'], key=lambda f: (f['power_panel']['name'] if f.get('power_panel') else '', f['name'])):
+        load = by_feed[feed['id']]
+        if only_flagged and not (load.overcommitted or load.at_risk):
+            continue
+        rows.append([
+            feed['power_panel']['name'] if feed.get('power_panel') else 'N/A',
+            feed['name'],
+            feed['rack']['name'] if feed.get('rack') else 'N/A',
+            feed['phase']['label'] if feed.get('phase') else 'N/A',
+            load.ports,
+        ] + load_columns(load))
+    
+    print(f"\n⚡ Bilan par alimentation ({len(rows)}/{len(loaded['feeds'])}):")
+    print(tabulate(rows, headers=['Tableau', 'Alimentation', 'Rack', 'Phase', 'Ports'] + load_headers, tablefmt='grid'))
+    
+    panel_names = {panel['id']: panel['name'] for panel in loaded['panels']}
+    rows = [[panel_names.get(panel_id, f"#{panel_id}")] + load_columns(load)
+            for panel_id, load in sorted(by_panel.items(), key=lambda item: panel_names.get(item[0], ''))]
+    if rows:
+        print(f"\n🔋 Bilan par tableau ({len(rows)}):")
+        print(tabulate(rows, headers=['Tableau'] + load_headers, tablefmt='grid'))
+    
+    rack_names = {feed['rack']['id']: feed['rack']['name'] for feed in loaded['feeds'] if feed.get('rack')}
+    rows = [[rack_names[rack_id]] + load_columns(load)
+            for rack_id, load in sorted(by_rack.items(), key=lambda item: rack_names[item[0]])
+            if not only_flagged or load.overcommitted or load.at_risk]
+    if rows:
+        print(f"\n🗄️  Bilan par rack ({len(rows)}):")
+        print(tabulate(rows, headers=['Rack'] + load_headers, tablefmt='grid'))
+    
+    overcommitted = sum(1 for load in by_feed.values() if load.overcommitted)
+    total = power_budget.PowerLoad()
+    for load in by_feed.values():
+        total.capacity += load.capacity
+        total.add(load.allocated, load.maximum, load.ports)
+    print(f"\n📊 Total: {total.capacity:,.0f}W disponibles, {total.allocated:,}W alloués ({total.utilization():.1f}%), "
+          f"{total.maximum:,}W en pointe")
+    if overcommitted:
+        print(f"❌ {overcommitted} alimentation(s) surchargée(s)")
+
 def site_summary(client, site_name):
     """Résumé complet d'un site"""
     print(f"📊 Résumé du site: {site_name}")
@@ -329,6 +713,85 @@ def site_summary(client, site_name):
     ]
     print(tabulate(stats_table, headers=['Type', 'Nombre'], tablefmt='grid'))
 
+def _prefix_site_id(prefix):
+    """Site d'un préfixe : champ site, ou portée de type site (Netbox 4.2+)"""
+    if prefix.get('site'):
+        return prefix['site']['id']
+    if prefix.get('scope_type') == 'dcim.site' and prefix.get('scope'):
+        return prefix['scope']['id']
+    return None
+
+def all_sites_summary(client, output_format='table'):
+    """Matrice de résumé de tous les sites : un chargement par type d'objet"""
+    log = sys.stdout if output_format == 'table' else sys.stderr
+    print("📋 Récupération des sites, équipements, racks, localisations, câbles et préfixes...", file=log)
+    
+    # Champs réduits : seuls l'ID et le rattachement au site sont utiles ici
+    sources = {
+        'sites': ('/dcim/sites/', {'fields': 'id,name'}),
+        'devices': ('/dcim/devices/', {'fields': 'id,site'}),
+        'racks': ('/dcim/racks/', {'fields': 'id,site'}),
+        'locations': ('/dcim/locations/', {'fields': 'id,site'}),
+        'cables': ('/dcim/cables/', {'fields': 'id,a_terminations,b_terminations'}),
+        'prefixes': ('/ipam/prefixes/', {'fields': 'id,site,scope_type,scope'}),
+    }
+    loaded = {}
+    for name, result in client.run_concurrently(lambda n: list(client.iter_all(*sources[n])), list(sources)):
+        loaded[name] = result
+    
+    columns = ['devices', 'racks', 'locations', 'cables', 'prefixes']
+    counts = {site['id']: dict.fromkeys(columns, 0) for site in loaded['sites']}
+    
+    def count(site_id, column):
+        if site_id in counts:
+            counts[site_id][column] += 1
+    
+    device_sites = {}
+    for device in loaded['devices']:
+        site_id = device['site']['id'] if device.get('site') else None
+        device_sites[device['id']] = site_id
+        count(site_id, 'devices')
+    
+    for column in ('racks', 'locations'):
+        for obj in loaded[column]:
+            count(obj['site']['id'] if obj.get('site') else None, column)
+    
+    # Un câble compte pour chaque site de ses extrémités (via l'équipement terminé)
+    for cable in loaded['cables']:
+        sites = set()
+        for term in (cable.get('a_terminations') or []) + (cable.get('b_terminations') or []):
+            device = (term.get('object') or {}).get('device')
+            if device:
+                sites.add(device_sites.get(device['id']))
+        for site_id in sites:
+            count(site_id, 'cables')
+    
+    for prefix in loaded['prefixes']:
+        count(_prefix_site_id(prefix), 'prefixes')
+    
+    names = {site['id']: site['name'] for site in loaded['sites']}
+    matrix = [{'site': names[site_id], **values}
+              for site_id, values in sorted(counts.items(), key=lambda item: names[item[0]])]
+    totals = {column: sum(row[column] for row in matrix) for column in columns}
+    # Un câble inter-sites apparaît sur chaque site mais n'est compté qu'une fois au total
+    totals['cables'] = len(loaded['cables'])
+    
+    if output_format == 'json':
+        json.dump({'sites': matrix, 'totals': totals}, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif output_format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=['site'] + columns)
+        writer.writeheader()
+        writer.writerows(matrix)
+        writer.writerow({'site': 'TOTAL', **totals})
+    else:
+        headers = ['Site', '🖥️  Équipements', '🗄️  Racks', '📍 Localisations', '🔌 Câbles', '🌐 Préfixes IP']
+        rows = [[row['site']] + [row[column] for column in columns] for row in matrix]
+        rows.append(['TOTAL'] + [totals[column] for column in columns])
+        print(f"\n📊 Résumé de {len(matrix)} site(s):")
+        print(tabulate(rows, headers=headers, tablefmt='grid'))
+        print("ℹ️  Les câbles inter-sites sont comptés sur chacun des sites concernés")
+
 def main():
     parser = argparse.ArgumentParser(description='Scripts CLI pour DCIM Netbox')
     subparsers = parser.add_subparsers(dest='command', help='Commandes disponibles')
@@ -346,11 +809,25 @@ def main():
     
     # Commande elevation
     elevation_parser = subparsers.add_parser('elevation', help='Élévation d\'un rack')
-    elevation_parser.add_argument('rack', help='Nom ou ID du rack')
+    elevation_parser.add_argument('rack', nargs='*', help='Nom(s) ou ID(s) du rack')
+    elevation_parser.add_argument('--rack', dest='racks', action='append', default=[], help='Rack supplémentaire (répétable)')
+    elevation_parser.add_argument('--site', help='Tous les racks d\'un site')
+    elevation_parser.add_argument('--side-by-side', type=int, default=0, metavar='N', help='Juxtaposer N racks par rangée')
+    elevation_parser.add_argument('--output', help='Écrire les élévations dans un fichier')
+    elevation_parser.add_argument('--workers', type=int, help='Nombre de requêtes simultanées (défaut: une par rack, 32 au plus)')
+    
+    # Commande capacity
+    capacity_parser = subparsers.add_parser('capacity', help='Capacité libre des racks')
+    capacity_parser.add_argument('--site', help='Filtrer par site')
+    capacity_parser.add_argument('--location', help='Filtrer par localisation')
+    capacity_parser.add_argument('--snapshot', help='Instantané binaire (.nbsnap) à analyser au lieu de Netbox')
     
     # Commande locations
     locations_parser = subparsers.add_parser('locations', help='Liste les localisations')
     locations_parser.add_argument('--site', help='Filtrer par site')
+    locations_parser.add_argument('--tree', action='store_true', help='Arbre des localisations avec compteurs cumulés')
+    locations_parser.add_argument('--depth', type=int, help='Profondeur maximale de l\'arbre')
+    locations_parser.add_argument('--json', action='store_true', help='Export JSON imbriqué de l\'arbre')
     
     # Commande cables
     cables_parser = subparsers.add_parser('cables', help='Liste les câbles')
@@ -358,13 +835,32 @@ def main():
     cables_parser.add_argument('--status', help='Filtrer par status')
     cables_parser.add_argument('--type', help='Filtrer par type')
     
+    # Commande trace
+    trace_parser = subparsers.add_parser('trace', help='Trace le chemin câblé d\'une interface')
+    trace_parser.add_argument('device', help='Nom de l\'équipement')
+    trace_parser.add_argument('interface', help='Nom de l\'interface')
+    trace_parser.add_argument('--site', help='Limiter le chargement à un site')
+    
+    # Commande cable-graph
+    graph_parser = subparsers.add_parser('cable-graph', help='Trace tous les chemins, liste les interfaces non câblées et analyse le câblage')
+    graph_parser.add_argument('--site', help='Filtrer par site')
+    graph_parser.add_argument('--paths', action='store_true', help='Afficher aussi les chemins complets')
+    graph_parser.add_argument('--limit', type=int, default=50, help='Nombre maximum de lignes par tableau')
+    
     # Commande power
     power_parser = subparsers.add_parser('power', help='Liste les alimentations électriques')
     power_parser.add_argument('--site', help='Filtrer par site')
     
+    # Commande power-budget
+    budget_parser = subparsers.add_parser('power-budget', help='Bilan électrique par alimentation, tableau et rack')
+    budget_parser.add_argument('--site', help='Filtrer par site')
+    budget_parser.add_argument('--flagged', action='store_true', help='N\'afficher que les alimentations et racks en dépassement')
+    
     # Commande summary
     summary_parser = subparsers.add_parser('summary', help='Résumé d\'un site')
-    summary_parser.add_argument('site', help='Nom du site')
+    summary_parser.add_argument('site', nargs='?', help='Nom du site')
+    summary_parser.add_argument('--all', action='store_true', help='Matrice de tous les sites')
+    summary_parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Format de la matrice (--all)')
     
     args = parser.parse_args()
     
@@ -372,9 +868,9 @@ def main():
         parser.print_help()
         return
     
-    # Création du client Netbox
+    # Création du client Netbox (inutile pour lire un instantané binaire)
     try:
-        client = create_client()
+        client = None if getattr(args, 'snapshot', None) else create_client()
     except Exception as e:
         print(f"❌ Erreur lors de la création du client: {e}")
         sys.exit(1)
@@ -392,21 +888,47 @@ def main():
             list_racks(client, filters if filters else None)
         
         elif args.command == 'elevation':
-            rack_elevation(client, args.rack)
+            rack_refs = args.rack + args.racks
+            if len(rack_refs) == 1 and not (args.site or args.side_by_side or args.output):
+                rack_elevation(client, rack_refs[0])
+            elif rack_refs or args.site:
+                multi_rack_elevation(client, rack_refs, args.site, args.side_by_side, args.output, args.workers)
+            else:
+                print("❌ Indiquez au moins un rack ou --site")
+        
+        elif args.command == 'capacity':
+            rack_capacity_report(client, args.site, args.location, args.snapshot)
         
         elif args.command == 'locations':
-            list_locations(client, args.site)
+            if args.tree or args.json:
+                location_hierarchy(client, args.site, args.depth, args.json)
+            else:
+                list_locations(client, args.site)
         
         elif args.command == 'cables':
             filters = {'site': args.site, 'status': args.status, 'type': args.type}
             filters = {k: v for k, v in filters.items() if v is not None}
             list_cables(client, filters if filters else None)
         
+        elif args.command == 'trace':
+            trace_interface(client, args.device, args.interface, args.site)
+        
+        elif args.command == 'cable-graph':
+            cable_graph_report(client, args.site, args.paths, args.limit)
+        
         elif args.command == 'power':
             list_power_feeds(client, args.site)
         
+        elif args.command == 'power-budget':
+            power_budget_report(client, args.site, args.flagged)
+        
         elif args.command == 'summary':
-            site_summary(client, args.site)
+            if args.all:
+                all_sites_summary(client, args.format)
+            elif args.site:
+                site_summary(client, args.site)
+            else:
+                print("❌ Indiquez un site ou --all")
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Opération interrompue par l'utilisateur")
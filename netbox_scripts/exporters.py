@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Export en flux des objets Netbox : CSV, NDJSON, tableau JSON, Parquet ou Arrow
+
+Les objets passent directement de la pagination à l'écrivain, sans être
+conservés : la mémoire reste bornée à une page (ou à un groupe de lignes en
+colonnaire) quelle que soit la taille de l'export. Chaque type d'objet
+déclare son schéma (colonne, chemin pointé, type) : mêmes colonnes stables
+en CSV, NDJSON et JSON, colonnes typées en Parquet/Arrow (pyarrow, optionnel).
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import date, datetime
+
+from aggregation import path_getter
+
+# Schémas déclarés : (colonne, chemin dans l'objet Netbox, type)
+# Types : int, float, bool, str, date, datetime, tags
+_TIMESTAMPS = [
+    ('created', 'created', 'datetime'),
+    ('last_updated', 'last_updated', 'datetime'),
+]
+
+EXPORT_TYPES = {
+    'devices': {
+        'endpoint': '/dcim/devices/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('name', 'name', 'str'),
+            ('site', 'site.name', 'str'),
+            ('location', 'location.name', 'str'),
+            ('rack', 'rack.name', 'str'),
+            ('position', 'position', 'float'),
+            ('face', 'face.value', 'str'),
+            ('role', 'role.name', 'str'),
+            ('device_type', 'device_type.model', 'str'),
+            ('manufacturer', 'device_type.manufacturer.name', 'str'),
+            ('platform', 'platform.name', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('serial', 'serial', 'str'),
+            ('asset_tag', 'asset_tag', 'str'),
+            ('primary_ip4', 'primary_ip4.address', 'str'),
+            ('primary_ip6', 'primary_ip6.address', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'sites': {
+        'endpoint': '/dcim/sites/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('name', 'name', 'str'),
+            ('slug', 'slug', 'str'),
+            ('status', 'status.value', 'str'),
+            ('region', 'region.name', 'str'),
+            ('group', 'group.name', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('facility', 'facility', 'str'),
+            ('time_zone', 'time_zone', 'str'),
+            ('physical_address', 'physical_address', 'str'),
+            ('latitude', 'latitude', 'float'),
+            ('longitude', 'longitude', 'float'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'racks': {
+        'endpoint': '/dcim/racks/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('name', 'name', 'str'),
+            ('facility_id', 'facility_id', 'str'),
+            ('site', 'site.name', 'str'),
+            ('location', 'location.name', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('role', 'role.name', 'str'),
+            ('serial', 'serial', 'str'),
+            ('asset_tag', 'asset_tag', 'str'),
+            ('u_height', 'u_height', 'int'),
+            ('starting_unit', 'starting_unit', 'int'),
+            ('desc_units', 'desc_units', 'bool'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'ip-addresses': {
+        'endpoint': '/ipam/ip-addresses/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('address', 'address', 'str'),
+            ('vrf', 'vrf.name', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('role', 'role.value', 'str'),
+            ('assigned_object_type', 'assigned_object_type', 'str'),
+            ('assigned_object_id', 'assigned_object_id', 'int'),
+            ('assigned_device', 'assigned_object.device.name', 'str'),
+            ('assigned_interface', 'assigned_object.name', 'str'),
+            ('dns_name', 'dns_name', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'prefixes': {
+        'endpoint': '/ipam/prefixes/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('prefix', 'prefix', 'str'),
+            ('vrf', 'vrf.name', 'str'),
+            ('site', 'site.name', 'str'),
+            ('scope_type', 'scope_type', 'str'),
+            ('scope', 'scope.name', 'str'),
+            ('vlan', 'vlan.vid', 'int'),
+            ('tenant', 'tenant.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('role', 'role.name', 'str'),
+            ('is_pool', 'is_pool', 'bool'),
+            ('mark_utilized', 'mark_utilized', 'bool'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'vlans': {
+        'endpoint': '/ipam/vlans/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('vid', 'vid', 'int'),
+            ('name', 'name', 'str'),
+            ('site', 'site.name', 'str'),
+            ('group', 'group.name', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('role', 'role.name', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'circuits': {
+        'endpoint': '/circuits/circuits/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('cid', 'cid', 'str'),
+            ('provider', 'provider.name', 'str'),
+            ('type', 'type.name', 'str'),
+            ('status', 'status.value', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('install_date', 'install_date', 'date'),
+            ('termination_date', 'termination_date', 'date'),
+            ('commit_rate', 'commit_rate', 'int'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'providers': {
+        'endpoint': '/circuits/providers/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('name', 'name', 'str'),
+            ('slug', 'slug', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'interfaces': {
+        'endpoint': '/dcim/interfaces/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('device', 'device.name', 'str'),
+            ('name', 'name', 'str'),
+            ('type', 'type.value', 'str'),
+            ('enabled', 'enabled', 'bool'),
+            ('parent', 'parent.name', 'str'),
+            ('lag', 'lag.name', 'str'),
+            ('mtu', 'mtu', 'int'),
+            ('mac_address', 'mac_address', 'str'),
+            ('speed', 'speed', 'int'),
+            ('mode', 'mode.value', 'str'),
+            ('untagged_vlan', 'untagged_vlan.vid', 'int'),
+            ('mgmt_only', 'mgmt_only', 'bool'),
+            ('cable', 'cable.id', 'int'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'cables': {
+        'endpoint': '/dcim/cables/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('label', 'label', 'str'),
+            ('type', 'type', 'str'),
+            ('status', 'status.value', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('color', 'color', 'str'),
+            ('length', 'length', 'float'),
+            ('length_unit', 'length_unit.value', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'circuit-terminations': {
+        'endpoint': '/circuits/circuit-terminations/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('circuit', 'circuit.cid', 'str'),
+            ('term_side', 'term_side', 'str'),
+            ('site', 'site.name', 'str'),
+            ('provider_network', 'provider_network.name', 'str'),
+            ('port_speed', 'port_speed', 'int'),
+            ('upstream_speed', 'upstream_speed', 'int'),
+            ('xconnect_id', 'xconnect_id', 'str'),
+            ('pp_info', 'pp_info', 'str'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'vrfs': {
+        'endpoint': '/ipam/vrfs/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('name', 'name', 'str'),
+            ('rd', 'rd', 'str'),
+            ('tenant', 'tenant.name', 'str'),
+            ('enforce_unique', 'enforce_unique', 'bool'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+    'device-types': {
+        'endpoint': '/dcim/device-types/',
+        'schema': [
+            ('id', 'id', 'int'),
+            ('manufacturer', 'manufacturer.name', 'str'),
+            ('model', 'model', 'str'),
+            ('slug', 'slug', 'str'),
+            ('part_number', 'part_number', 'str'),
+            ('u_height', 'u_height', 'float'),
+            ('is_full_depth', 'is_full_depth', 'bool'),
+            ('description', 'description', 'str'),
+            ('tags', 'tags', 'tags'),
+        ] + _TIMESTAMPS,
+    },
+}
+
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def compile_schema(schema):
+    """Schéma dont les chemins pointés sont remplacés par leurs lecteurs"""
+    return [(column, path_getter(path, None), kind) for column, path, kind in schema]
+
+
+def flatten(record, schema):
+    """Ligne plate selon un schéma compilé (valeurs brutes, None si absent ou vide ; tags en liste de noms)"""
+    row = {}
+    for column, get, kind in schema:
+        value = get(record)
+        if kind == 'tags' and isinstance(value, list):
+            value = [tag.get('name', '') if isinstance(tag, dict) else str(tag) for tag in value]
+        row[column] = value
+    return row
+
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+# Conversion d'une valeur brute vers le type déclaré
+CONVERTERS = {
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'str': str,
+    'date': date.fromisoformat,
+    'datetime': _to_datetime,
+    'tags': list,
+}
+
+
+def open_output(path, compression=None):
+    """Ouvre un fichier texte de sortie, compressé en gzip ou zstd au besoin"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstandard est requis pour la compression zstd (pip install zstandard)")
+        raw = open(path, 'wb')
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if compression:
+        raise ValueError(f"Compression non supportée: {compression} (gzip, zstd)")
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+class CsvWriter:
+    """CSV aux colonnes du schéma déclaré"""
+
+    def __init__(self, stream, schema):
+        self.schema = compile_schema(schema)
+        self.writer = csv.DictWriter(stream, fieldnames=[column for column, _, _ in schema])
+        self.writer.writeheader()
+
+    def write(self, record):
+        row = flatten(record, self.schema)
+        for column, value in row.items():
+            if value is None:
+                row[column] = ''
+            elif isinstance(value, list):
+                row[column] = ', '.join(value)
+        self.writer.writerow(row)
+
+    def close(self):
+        pass
+
+
+class NdjsonWriter:
+    """Un objet JSON par ligne, aux colonnes du schéma déclaré"""
+
+    def __init__(self, stream, schema):
+        self.stream = stream
+        self.schema = compile_schema(schema)
+
+    def write(self, record):
+        self.stream.write(json.dumps(flatten(record, self.schema), ensure_ascii=False, separators=(',', ':')))
+        self.stream.write('\n')
+
+    def close(self):
+        pass
+
+
+class JsonArrayWriter:
+    """Tableau JSON écrit élément par élément, aux colonnes du schéma déclaré"""
+
+    def __init__(self, stream, schema):
+        self.stream = stream
+        self.schema = compile_schema(schema)
+        self.first = True
+        stream.write('[')
+
+    def write(self, record):
+        self.stream.write('\n' if self.first else ',\n')
+        self.stream.write(json.dumps(flatten(record, self.schema), ensure_ascii=False))
+        self.first = False
+
+    def close(self):
+        self.stream.write('\n]\n' if not self.first else ']\n')
+
+
+WRITERS = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'json': JsonArrayWriter}
+
+
+def _pyarrow():
+    """Import différé de pyarrow (dépendance optionnelle des formats colonnaires)"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("pyarrow est requis pour les formats parquet et arrow (pip install pyarrow)")
+    return pyarrow
+
+
+class ColumnarWriter:
+    """Base des écrivains colonnaires : colonnes typées, un groupe de lignes tous les row_group_size objets"""
+
+    def __init__(self, path, schema, compression=None, row_group_size=50000):
+        pa = self.pa = _pyarrow()
+        types = {
+            'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'str': pa.string(),
+            'date': pa.date32(), 'datetime': pa.timestamp('us', tz='UTC'), 'tags': pa.list_(pa.string()),
+        }
+        self.schema = compile_schema(schema)
+        self.arrow_schema = pa.schema([(column, types[kind]) for column, _, kind in schema])
+        self.row_group_size = row_group_size
+        self.columns = {column: [] for column, _, _ in schema}
+        self.pending = 0
+        self.writer = self.open(path, compression)
+
+    def write(self, record):
+        row = flatten(record, self.schema)
+        for column, _, kind in self.schema:
+            value = row[column]
+            if value is not None and value != '':
+                try:
+                    value = CONVERTERS[kind](value)
+                except (TypeError, ValueError):
+                    value = None
+            elif kind != 'str':
+                value = None
+            self.columns[column].append(value)
+        self.pending += 1
+        if self.pending >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch = self.pa.RecordBatch.from_arrays(
+            [self.pa.array(self.columns[field.name], type=field.type) for field in self.arrow_schema],
+            schema=self.arrow_schema
+        )
+        self.writer.write_batch(batch)
+        self.columns = {column: [] for column in self.columns}
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class ParquetWriter(ColumnarWriter):
+    """Parquet, compression interne snappy (défaut), gzip ou zstd"""
+
+    def open(self, path, compression):
+        return self.pa.parquet.ParquetWriter(path, self.arrow_schema, compression=compression or 'snappy')
+
+
+class ArrowWriter(ColumnarWriter):
+    """Fichier Arrow IPC, compression interne zstd optionnelle"""
+
+    def open(self, path, compression):
+        if compression not in (None, 'zstd'):
+            raise ValueError("Le format arrow ne supporte que la compression zstd")
+        options = self.pa.ipc.IpcWriteOptions(compression=compression)
+        return self.pa.ipc.new_file(path, self.arrow_schema, options=options)
+
+
+# Écrivains binaires : ils ouvrent eux-mêmes le fichier et gèrent leur compression
+FILE_WRITERS = {'parquet': ParquetWriter, 'arrow': ArrowWriter}
+FORMATS = tuple(WRITERS) + tuple(FILE_WRITERS)
+
+
+class Progress:
+    """Progression sur stderr, rafraîchie au plus deux fois par seconde"""
+
+    def __init__(self, label, total=None, stream=sys.stderr, interval=0.5):
+        self.label = label
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.count = 0
+        self.started = time.monotonic()
+        self.shown = 0.0
+
+    def update(self, count=1):
+        self.count += count
+        now = time.monotonic()
+        if now - self.shown >= self.interval:
+            self.shown = now
+            self._show(now)
+
+    def _show(self, now):
+        rate = self.count / max(now - self.started, 1e-9)
+        if self.total:
+            percent = min(100.0, self.count / self.total * 100)
+            text = f"{self.label}: {self.count}/{self.total} ({percent:.0f}%) - {rate:,.0f}/s"
+        else:
+            text = f"{self.label}: {self.count} - {rate:,.0f}/s"
+        self.stream.write(f"\r⏳ {text}   ")
+        self.stream.flush()
+
+    def close(self):
+        self._show(time.monotonic())
+        self.stream.write('\n')
+        self.stream.flush()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+def _drain(writer, records, progress):
+    count = 0
+    for record in records:
+        writer.write(record)
+        count += 1
+        if progress:
+            progress.update()
+    writer.close()
+    return count
+
+
+def write_records(records, output_path, output_format, schema, compression=None, progress=None):
+    """Écrit un flux d'objets dans un fichier ; retourne le nombre d'objets écrits"""
+    if output_format in FILE_WRITERS:
+        return _drain(FILE_WRITERS[output_format](output_path, schema, compression), records, progress)
+    with open_output(output_path, compression) as stream:
+        return _drain(WRITERS[output_format](stream, schema), records, progress)
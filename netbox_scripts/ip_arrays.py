@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Représentation vectorisée (NumPy) de grands jeux d'adresses et de préfixes IP
+
+Chaque famille est stockée en colonnes : IPv4 en uint32, IPv6 en deux uint64
+(poids fort / poids faible), avec la longueur de préfixe, le VRF (0 = global),
+le code de status et l'ID Netbox. Cela représente ~30 octets par entrée au lieu
+de plusieurs centaines pour des objets ipaddress ou des dictionnaires.
+"""
+
+import socket
+import numpy as np
+
+# Codes numériques des status Netbox (0 = inconnu)
+STATUS_CODES = {
+    'active': 1,
+    'reserved': 2,
+    'deprecated': 3,
+    'dhcp': 4,
+    'slaac': 5,
+    'container': 6,
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+_MASK64 = (1 << 64) - 1
+
+
+class IPArray:
+    """Jeu d'entrées IP d'une même famille (4 ou 6) stocké en colonnes NumPy"""
+
+    def __init__(self, version, addr=None, hi=None, lo=None, prefixlen=None, vrf=None, status=None, ids=None):
+        self.version = version
+        if version == 4:
+            self.addr = np.asarray(addr if addr is not None else [], dtype=np.uint32)
+            size = len(self.addr)
+            self.hi = self.lo = None
+        else:
+            self.hi = np.asarray(hi if hi is not None else [], dtype=np.uint64)
+            self.lo = np.asarray(lo if lo is not None else [], dtype=np.uint64)
+            size = len(self.hi)
+            self.addr = None
+
+        max_len = 32 if version == 4 else 128
+        self.prefixlen = _column(prefixlen, size, np.uint8, max_len)
+        self.vrf = _column(vrf, size, np.int32, 0)
+        self.status = _column(status, size, np.uint8, 0)
+        self.ids = _column(ids, size, np.int64, 0)
+
+    def __len__(self):
+        return len(self.addr) if self.version == 4 else len(self.hi)
+
+    @property
+    def max_prefixlen(self):
+        return 32 if self.version == 4 else 128
+
+    def take(self, index):
+        """Sous-ensemble (masque booléen ou indices) sous forme d'un nouvel IPArray"""
+        if self.version == 4:
+            return IPArray(4, addr=self.addr[index], prefixlen=self.prefixlen[index],
+                           vrf=self.vrf[index], status=self.status[index], ids=self.ids[index])
+        return IPArray(6, hi=self.hi[index], lo=self.lo[index], prefixlen=self.prefixlen[index],
+                       vrf=self.vrf[index], status=self.status[index], ids=self.ids[index])
+
+    # ------------------------------------------------------------------
+    # Clés de tri et de recherche
+    # ------------------------------------------------------------------
+
+    def keys(self):
+        """Clé ordonnée de l'adresse : uint32 (IPv4) ou 16 octets big-endian (IPv6)
+
+        Les clés IPv6 de type 'S16' se comparent octet par octet, ce qui respecte
+        l'ordre numérique sur 128 bits et permet np.searchsorted.
+        """
+        if self.version == 4:
+            return self.addr
+        return _to_key128(self.hi, self.lo)
+
+    def network_keys(self):
+        """Clé du début de réseau de chaque entrée (adresse masquée par sa longueur)"""
+        if self.version == 4:
+            return self.addr & _mask32(self.prefixlen)
+        mask_hi, mask_lo = _mask128(self.prefixlen)
+        return _to_key128(self.hi & mask_hi, self.lo & mask_lo)
+
+    def broadcast_keys(self):
+        """Clé de fin de réseau de chaque entrée (dernière adresse couverte)"""
+        if self.version == 4:
+            return self.addr | ~_mask32(self.prefixlen)
+        mask_hi, mask_lo = _mask128(self.prefixlen)
+        return _to_key128(self.hi | ~mask_hi, self.lo | ~mask_lo)
+
+    def key_of(self, value):
+        """Convertit un entier Python (adresse) en clé comparable à keys()"""
+        return int_keys([value], self.version)[0]
+
+    def argsort(self, by_network=False):
+        """Ordre de tri par (VRF, adresse, longueur de préfixe)"""
+        if self.version == 4:
+            address = self.addr & _mask32(self.prefixlen) if by_network else self.addr
+            return np.lexsort((self.prefixlen, address, self.vrf))
+        if by_network:
+            mask_hi, mask_lo = _mask128(self.prefixlen)
+            return np.lexsort((self.prefixlen, self.lo & mask_lo, self.hi & mask_hi, self.vrf))
+        return np.lexsort((self.prefixlen, self.lo, self.hi, self.vrf))
+
+    def sorted(self, by_network=False):
+        """Copie triée par (VRF, adresse, longueur de préfixe)"""
+        return self.take(self.argsort(by_network))
+
+    # ------------------------------------------------------------------
+    # Opérations vectorisées
+    # ------------------------------------------------------------------
+
+    def duplicate_mask(self):
+        """Masque des entrées dont (VRF, adresse) apparaît déjà plus tôt (jeu trié)"""
+        if len(self) == 0:
+            return np.zeros(0, dtype=bool)
+        same = self.vrf[1:] == self.vrf[:-1]
+        if self.version == 4:
+            same &= self.addr[1:] == self.addr[:-1]
+        else:
+            same &= (self.hi[1:] == self.hi[:-1]) & (self.lo[1:] == self.lo[:-1])
+        return np.concatenate(([False], same))
+
+    def dedup(self):
+        """Supprime les doublons (VRF, adresse) en conservant la première occurrence"""
+        data = self.sorted()
+        return data.take(~data.duplicate_mask())
+
+    def contains(self, network, vrf=None):
+        """Masque des entrées dont l'adresse appartient au réseau (ipaddress.ip_network)"""
+        if network.version != self.version:
+            return np.zeros(len(self), dtype=bool)
+
+        if self.version == 4:
+            mask = np.uint32(int(network.netmask))
+            result = (self.addr & mask) == np.uint32(int(network.network_address))
+        else:
+            value, netmask = int(network.network_address), int(network.netmask)
+            result = ((self.hi & np.uint64(netmask >> 64)) == np.uint64(value >> 64)) & \
+                     ((self.lo & np.uint64(netmask & _MASK64)) == np.uint64(value & _MASK64))
+
+        if vrf is not None:
+            result &= self.vrf == vrf
+        return result
+
+    def vrf_slices(self):
+        """Pour un jeu trié, retourne {vrf: (début, fin)} des tranches contiguës"""
+        if len(self) == 0:
+            return {}
+        vrfs, starts = np.unique(self.vrf, return_index=True)
+        ends = np.append(starts[1:], len(self))
+        return {int(v): (int(s), int(e)) for v, s, e in zip(vrfs, starts, ends)}
+
+    def count_in_ranges(self, starts, ends):
+        """Compte les entrées dans chaque intervalle [début, fin] (jeu trié, un seul VRF)
+
+        starts et ends sont des clés (voir keys()/key_of()). Coût O(q log n).
+        """
+        keys = self.keys()
+        return np.searchsorted(keys, ends, side='right') - np.searchsorted(keys, starts, side='left')
+
+    def count_in_networks(self, networks):
+        """Compte les entrées de chaque réseau donné en tenant compte du VRF
+
+        networks est un IPArray de préfixes de la même famille. Retourne un
+        tableau de comptes aligné sur networks.
+        """
+        counts = np.zeros(len(networks), dtype=np.int64)
+        data = self.sorted()
+        slices = data.vrf_slices()
+        starts, ends = networks.network_keys(), networks.broadcast_keys()
+
+        for vrf, (lo, hi) in slices.items():
+            selected = np.nonzero(networks.vrf == vrf)[0]
+            if len(selected):
+                counts[selected] = data.take(slice(lo, hi)).count_in_ranges(starts[selected], ends[selected])
+        return counts
+
+    def bucket(self, prefixlen):
+        """Regroupe les adresses par bloc /prefixlen : retourne (IPArray des blocs, comptes)"""
+        if self.version == 4:
+            address = self.addr & _mask32(np.full(len(self), prefixlen, dtype=np.uint8))
+            blocks, counts = np.unique(address, return_counts=True)
+            return IPArray(4, addr=blocks, prefixlen=np.full(len(blocks), prefixlen)), counts
+
+        mask_hi, mask_lo = _mask128(np.full(len(self), prefixlen, dtype=np.uint8))
+        pairs = np.stack((self.hi & mask_hi, self.lo & mask_lo), axis=1)
+        blocks, counts = np.unique(pairs, axis=0, return_counts=True)
+        return IPArray(6, hi=blocks[:, 0], lo=blocks[:, 1], prefixlen=np.full(len(blocks), prefixlen)), counts
+
+    def to_strings(self, index=None):
+        """Reconvertit (une partie de) l'ensemble en notation CIDR lisible"""
+        index = range(len(self)) if index is None else index
+        results = []
+        for i in index:
+            if self.version == 4:
+                address = socket.inet_ntoa(int(self.addr[i]).to_bytes(4, 'big'))
+            else:
+                value = (int(self.hi[i]) << 64) | int(self.lo[i])
+                address = socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, 'big'))
+            results.append(f"{address}/{int(self.prefixlen[i])}")
+        return results
+
+
+def int_keys(values, version):
+    """Convertit une séquence d'entiers Python (adresses) en clés comparables à keys()"""
+    if version == 4:
+        return np.array(values, dtype=np.uint32)
+    hi = np.array([v >> 64 for v in values], dtype=np.uint64)
+    lo = np.array([v & _MASK64 for v in values], dtype=np.uint64)
+    return _to_key128(hi, lo)
+
+
+def _column(values, size, dtype, default):
+    """Construit une colonne NumPy, avec valeur par défaut si absente"""
+    if values is None:
+        return np.full(size, default, dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def _mask32(prefixlen):
+    """Masques réseau IPv4 vectorisés pour un tableau de longueurs"""
+    shift = (32 - prefixlen.astype(np.uint64))
+    return ((np.uint64(0xFFFFFFFF) << shift) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def _mask128(prefixlen):
+    """Masques réseau IPv6 vectorisés (poids fort, poids faible)"""
+    length = prefixlen.astype(np.int64)
+    high_bits = np.clip(length, 0, 64).astype(np.uint64)
+    low_bits = np.clip(length - 64, 0, 64).astype(np.uint64)
+    full = np.uint64(_MASK64)
+    # Un décalage de 64 bits n'est pas défini : traiter 0 à part
+    mask_hi = np.where(high_bits == 0, np.uint64(0), full << (np.uint64(64) - np.maximum(high_bits, 1)))
+    mask_lo = np.where(low_bits == 0, np.uint64(0), full << (np.uint64(64) - np.maximum(low_bits, 1)))
+    return mask_hi.astype(np.uint64), mask_lo.astype(np.uint64)
+
+
+def _to_key128(hi, lo):
+    """Assemble deux colonnes uint64 en clés big-endian de 16 octets"""
+    pairs = np.empty((len(hi), 2), dtype='>u8')
+    pairs[:, 0] = hi
+    pairs[:, 1] = lo
+    return pairs.view('S16').ravel()
+
+
+def _vrf_id(record):
+    vrf = record.get('vrf')
+    return vrf['id'] if vrf else 0
+
+
+def _status_code(record):
+    status = record.get('status')
+    if isinstance(status, dict):
+        status = status.get('value')
+    return STATUS_CODES.get(status, 0)
+
+
+def from_records(records, field='address'):
+    """Charge des objets Netbox (adresses IP ou préfixes) en deux IPArray (IPv4, IPv6)
+
+    Les enregistrements sont consommés au fil de l'eau (compatible avec
+    client.iter_all) ; seules les colonnes utiles sont conservées.
+    """
+    addresses, vrfs, statuses, ids = [], [], [], []
+    for record in records:
+        addresses.append(record[field])
+        vrfs.append(_vrf_id(record))
+        statuses.append(_status_code(record))
+        ids.append(record.get('id', 0))
+
+    return from_strings(addresses, vrf=vrfs, status=statuses, ids=ids)
+
+
+def from_strings(addresses, vrf=0, status=0, ids=None):
+    """Charge une liste de chaînes 'adresse[/longueur]' en deux IPArray (IPv4, IPv6)
+
+    vrf, status et ids sont des scalaires ou des séquences alignées sur addresses.
+    """
+    is_v6 = np.fromiter((':' in a for a in addresses), dtype=bool, count=len(addresses))
+    extra = {
+        'vrf': _broadcast(vrf, len(addresses), np.int32),
+        'status': _broadcast(status, len(addresses), np.uint8),
+        'ids': _broadcast(ids if ids is not None else 0, len(addresses), np.int64),
+    }
+
+    if is_v6.any():
+        v4_index, v6_index = np.nonzero(~is_v6)[0], np.nonzero(is_v6)[0]
+        v4_strings = [addresses[i] for i in v4_index]
+        v6_strings = [addresses[i] for i in v6_index]
+    else:
+        v4_index, v6_index = slice(None), np.zeros(0, dtype=np.int64)
+        v4_strings, v6_strings = addresses, []
+
+    addr, length = _parse_v4(v4_strings)
+    v4 = IPArray(4, addr=addr, prefixlen=length, **{k: v[v4_index] for k, v in extra.items()})
+
+    hi, lo, length = _parse_v6(v6_strings)
+    v6 = IPArray(6, hi=hi, lo=lo, prefixlen=length, **{k: v[v6_index] for k, v in extra.items()})
+    return v4, v6
+
+
+def _broadcast(values, size, dtype):
+    """Étend un scalaire (ou convertit une séquence) en colonne NumPy"""
+    if np.isscalar(values):
+        return np.full(size, values, dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def _parse_v4(addresses):
+    """Analyse vectorisée de chaînes IPv4 'a.b.c.d/len' en (adresses uint32, longueurs)"""
+    if not addresses:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint8)
+
+    # Les cinq nombres de chaque entrée sont lus d'un bloc par NumPy
+    text = '.'.join(addresses).replace('/', '.')
+    values = np.fromstring(text, dtype=np.uint32, sep='.')
+    if values.size == 5 * len(addresses):
+        values = values.reshape(-1, 5)
+        addr = (values[:, 0] << 24) | (values[:, 1] << 16) | (values[:, 2] << 8) | values[:, 3]
+        return addr.astype(np.uint32), values[:, 4].astype(np.uint8)
+
+    # Certaines entrées n'ont pas de longueur : analyse une par une
+    buffer, lengths = bytearray(), []
+    for value in addresses:
+        address, _, length = value.partition('/')
+        buffer += socket.inet_aton(address)
+        lengths.append(int(length) if length else 32)
+    return np.frombuffer(bytes(buffer), dtype='>u4').astype(np.uint32), np.array(lengths, dtype=np.uint8)
+
+
+def _parse_v6(addresses):
+    """Analyse de chaînes IPv6 en (poids fort, poids faible, longueurs)"""
+    buffer, lengths = bytearray(), []
+    inet_pton, af_inet6 = socket.inet_pton, socket.AF_INET6
+    for value in addresses:
+        address, _, length = value.partition('/')
+        buffer += inet_pton(af_inet6, address)
+        lengths.append(int(length) if length else 128)
+
+    pairs = np.frombuffer(bytes(buffer), dtype='>u8').reshape(-1, 2)
+    return pairs[:, 0].astype(np.uint64), pairs[:, 1].astype(np.uint64), np.array(lengths, dtype=np.uint8)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Détection des doublons et chevauchements IPAM par tri et balayage
+
+Toutes les vérifications travaillent sur un instantané chargé en une fois :
+les préfixes sont triés puis balayés avec une pile (O(n log n)), ce qui produit
+pour chaque VRF une table de segments élémentaires « adresse -> préfixe le plus
+spécifique ». Les adresses y sont ensuite recherchées de façon vectorisée, sans
+aucune comparaison deux à deux.
+"""
+
+import ipaddress
+import numpy as np
+import ip_arrays
+
+
+def _finding(kind, severity, vrf, **fields):
+    """Construit un constat sérialisable en JSON"""
+    return {'type': kind, 'severity': severity, 'vrf': vrf or None, **fields}
+
+
+def _host(ips, index):
+    """Adresse sans longueur de préfixe"""
+    return ips.to_strings([index])[0].split('/')[0]
+
+
+def index_prefixes(prefixes):
+    """Indexe les préfixes par (famille, VRF) en segments élémentaires
+
+    Retourne (tables, doublons) :
+      - tables[(version, vrf)] = (clés de début de segment, indices du préfixe
+        le plus spécifique couvrant le segment, -1 si aucun)
+      - doublons : liste de listes d'indices de préfixes identiques
+    """
+    groups = {}
+    for index, prefix in enumerate(prefixes):
+        network = ipaddress.ip_network(prefix['prefix'], strict=False)
+        vrf = prefix['vrf']['id'] if prefix.get('vrf') else 0
+        groups.setdefault((network.version, vrf), []).append(
+            (int(network.network_address), network.prefixlen, int(network.broadcast_address), index)
+        )
+
+    tables, duplicates = {}, []
+    for (version, vrf), entries in groups.items():
+        # Parent avant enfant : tri par début puis longueur croissante
+        entries.sort()
+        max_value = (1 << (32 if version == 4 else 128)) - 1
+        starts, owners, stack = [], [], []
+        previous = None
+
+        def emit(position, owner):
+            if starts and starts[-1] == position:
+                owners[-1] = owner
+            else:
+                starts.append(position)
+                owners.append(owner)
+
+        for start, length, end, index in entries:
+            if previous and previous[:2] == (start, length):
+                # Même réseau dans le même VRF
+                if duplicates and duplicates[-1][0] == previous[3]:
+                    duplicates[-1].append(index)
+                else:
+                    duplicates.append([previous[3], index])
+                continue
+            previous = (start, length, end, index)
+
+            # Dépiler les préfixes terminés avant ce début
+            while stack and stack[-1][0] < start:
+                top_end, _ = stack.pop()
+                if top_end < max_value:
+                    emit(top_end + 1, stack[-1][1] if stack else -1)
+
+            stack.append((end, index))
+            emit(start, index)
+
+        while stack:
+            top_end, _ = stack.pop()
+            if top_end < max_value:
+                emit(top_end + 1, stack[-1][1] if stack else -1)
+
+        tables[(version, vrf)] = (ip_arrays.int_keys(starts, version), np.array(owners, dtype=np.int64))
+
+    return tables, duplicates
+
+
+def deepest_prefix(ips, tables, vrf_override=None):
+    """Indice du préfixe le plus spécifique contenant chaque adresse (-1 si aucun)
+
+    vrf_override permet de chercher toutes les adresses dans un VRF donné
+    (ex: 0 pour les conteneurs globaux).
+    """
+    owners = np.full(len(ips), -1, dtype=np.int64)
+    keys = ips.keys()
+
+    for vrf in np.unique(ips.vrf):
+        table = tables.get((ips.version, int(vrf) if vrf_override is None else vrf_override))
+        if table is None:
+            continue
+        selected = np.nonzero(ips.vrf == vrf)[0]
+        segment_keys, segment_owners = table
+        position = np.searchsorted(segment_keys, keys[selected], side='right') - 1
+        found = position >= 0
+        owners[selected[found]] = segment_owners[position[found]]
+
+    return owners
+
+
+def duplicate_ips(ips):
+    """Adresses présentes plusieurs fois dans un même VRF"""
+    data = ips.sorted()
+    duplicated = data.duplicate_mask()
+    if not duplicated.any():
+        return
+
+    # Début de groupe : entrée originale immédiatement suivie d'un doublon
+    for start in np.nonzero(~duplicated[:-1] & duplicated[1:])[0]:
+        end = start + 1
+        while end < len(data) and duplicated[end]:
+            end += 1
+        yield _finding('duplicate_ip', 'error', int(data.vrf[start]),
+                       address=_host(data, start),
+                       ids=[int(i) for i in data.ids[start:end]])
+
+
+def misplaced_ips(ips, prefixes, tables):
+    """Adresses hors de tout préfixe, ou dont le masque déborde du préfixe parent"""
+    owners = deepest_prefix(ips, tables)
+
+    # Une adresse d'un VRF peut être couverte par un conteneur global
+    orphans = np.nonzero((owners < 0) & (ips.vrf != 0))[0]
+    if len(orphans):
+        owners[orphans] = deepest_prefix(ips.take(orphans), tables, vrf_override=0)
+
+    for index in np.nonzero(owners < 0)[0]:
+        yield _finding('orphan_ip', 'warning', int(ips.vrf[index]),
+                       address=ips.to_strings([index])[0], id=int(ips.ids[index]))
+
+    # Réseau de l'adresse plus large que son préfixe : chevauchement non imbriqué
+    lengths = np.array([ipaddress.ip_network(p['prefix'], strict=False).prefixlen for p in prefixes] + [0],
+                       dtype=np.int64)
+    wider = np.nonzero((owners >= 0) & (ips.prefixlen < lengths[owners]))[0]
+    for index in wider:
+        prefix = prefixes[owners[index]]
+        yield _finding('ip_wider_than_prefix', 'warning', int(ips.vrf[index]),
+                       address=ips.to_strings([index])[0], id=int(ips.ids[index]),
+                       prefix=prefix['prefix'], prefix_id=prefix.get('id'))
+
+
+def overlapping_ranges(ip_ranges):
+    """Plages IP d'un même VRF qui se chevauchent (balayage par début croissant)"""
+    groups = {}
+    for ip_range in ip_ranges:
+        start = ipaddress.ip_interface(ip_range['start_address'])
+        end = ipaddress.ip_interface(ip_range['end_address'])
+        vrf = ip_range['vrf']['id'] if ip_range.get('vrf') else 0
+        groups.setdefault((start.version, vrf), []).append((int(start.ip), int(end.ip), ip_range))
+
+    for (_, vrf), entries in groups.items():
+        entries.sort(key=lambda entry: entry[:2])
+        reach = None
+        for start, end, ip_range in entries:
+            if reach and start <= reach[0]:
+                yield _finding('ip_range_overlap', 'error', vrf,
+                               range=f"{ip_range['start_address']}-{ip_range['end_address']}",
+                               id=ip_range.get('id'), overlaps_id=reach[1].get('id'))
+            if not reach or end > reach[0]:
+                reach = (end, ip_range)
+
+
+def find_overlaps(ip_records, prefix_records, range_records=()):
+    """Exécute toutes les vérifications et produit les constats au fil de l'eau"""
+    prefixes = list(prefix_records)
+    yield from find_overlaps_in(ip_arrays.from_records(ip_records), prefixes, range_records)
+
+
+def find_overlaps_in(ip_sets, prefixes, range_records=()):
+    """Comme find_overlaps, pour des adresses déjà chargées en IPArray (IPv4, IPv6)"""
+    tables, duplicates = index_prefixes(prefixes)
+
+    for group in duplicates:
+        first = prefixes[group[0]]
+        yield _finding('duplicate_prefix', 'error', first['vrf']['id'] if first.get('vrf') else 0,
+                       prefix=first['prefix'], ids=[prefixes[i].get('id') for i in group])
+
+    for ips in ip_sets:
+        yield from duplicate_ips(ips)
+        yield from misplaced_ips(ips, prefixes, tables)
+
+    yield from overlapping_ranges(range_records)
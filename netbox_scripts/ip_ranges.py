@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Arithmétique d'intervalles pour le calcul de l'espace IP libre (IPv4 et IPv6)
+
+Les adresses sont manipulées comme des entiers (bornes incluses), ce qui permet
+de traiter un /48 IPv6 sans jamais énumérer ses adresses : le coût dépend
+uniquement du nombre d'entrées utilisées (O(m log m) pour le tri).
+"""
+
+import ipaddress
+
+
+def network_bounds(network):
+    """Retourne les bornes (début, fin) incluses d'un réseau sous forme d'entiers"""
+    network = ipaddress.ip_network(network, strict=False)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def address_bounds(address):
+    """Retourne les bornes d'une adresse isolée (ex: '10.0.0.1/24' -> une seule adresse)"""
+    value = int(ipaddress.ip_interface(address).ip)
+    return value, value
+
+
+def merge_intervals(intervals):
+    """Fusionne des intervalles qui se chevauchent ou se touchent (triés en sortie)"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_intervals(network, used):
+    """Calcule les intervalles libres d'un réseau privé des intervalles utilisés"""
+    net_start, net_end = network_bounds(network)
+    free = []
+    cursor = net_start
+
+    for start, end in merge_intervals(used):
+        # Ignorer ce qui sort du réseau analysé
+        if end < net_start or start > net_end:
+            continue
+        start, end = max(start, net_start), min(end, net_end)
+        if start > cursor:
+            free.append((cursor, start - 1))
+        cursor = max(cursor, end + 1)
+
+    if cursor <= net_end:
+        free.append((cursor, net_end))
+
+    return free
+
+
+def count_addresses(intervals):
+    """Nombre exact d'adresses couvertes par des intervalles disjoints (entier Python)"""
+    return sum(end - start + 1 for start, end in intervals)
+
+
+def interval_to_range(start, end, version):
+    """Convertit un intervalle en couple d'adresses lisibles"""
+    address_class = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    return address_class(start), address_class(end)
+
+
+def interval_to_networks(start, end, version):
+    """Découpe un intervalle en un minimum de blocs CIDR alignés"""
+    start, end = interval_to_range(start, end, version)
+    return list(ipaddress.summarize_address_range(start, end))
+
+
+def iter_free_subnets(free, prefixlen, version):
+    """Itère sur les sous-réseaux alignés de taille /prefixlen contenus dans l'espace libre"""
+    max_len = 32 if version == 4 else 128
+    size = 1 << (max_len - prefixlen)
+    network_class = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+
+    for start, end in free:
+        # Aligner le début sur la taille du bloc demandé
+        block = -(-start // size) * size
+        while block + size - 1 <= end:
+            yield network_class((block, prefixlen))
+            block += size
+
+
+def count_free_subnets(free, prefixlen, version):
+    """Nombre exact de sous-réseaux /prefixlen alignés disponibles (sans énumération)"""
+    max_len = 32 if version == 4 else 128
+    size = 1 << (max_len - prefixlen)
+    total = 0
+    for start, end in free:
+        first = -(-start // size)
+        last = (end + 1) // size
+        if last > first:
+            total += last - first
+    return total
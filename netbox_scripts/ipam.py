@@ -5,9 +5,18 @@ Scripts CLI pour la gestion IPAM (IP Address Management) dans Netbox
 
 import argparse
 import sys
+import json
+import time
+import ipaddress
+from itertools import islice
 from tabulate import tabulate
 from netbox_client import create_client
-import ipaddress
+import ip_ranges
+import ip_arrays
+import ip_overlaps
+import nbsnap
+import prefix_tree
+import vlan_map
 
 def list_prefixes(client, filters=None):
     """Liste tous les préfixes IP"""
@@ -159,6 +168,56 @@ def list_vlans(client, filters=None):
     print(f"\n🏷️  VLANs ({len(vlans)} trouvé(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def vlan_allocation_map(client, filters=None, next_count=5, heatmap=False):
+    """Carte d'allocation des VIDs par site ou groupe (un seul chargement des VLANs)"""
+    print("📋 Récupération des VLANs...")
+    
+    params = {}
+    if filters:
+        if filters.get('site'):
+            params['site'] = filters['site']
+        if filters.get('group'):
+            params['group'] = filters['group']
+    
+    vlans = client.iter_all('/ipam/vlans/', params)
+    groups = client.iter_all('/ipam/vlan-groups/')
+    maps = vlan_map.build_maps(vlans, groups)
+    
+    if not maps:
+        print("❌ Aucun VLAN trouvé")
+        return
+    
+    headers = ['Domaine', 'Utilisés', 'Libres', 'Conflits', f'{next_count} prochains libres', 'Plages libres']
+    rows = []
+    
+    for bitmap in sorted(maps.values(), key=lambda b: b.name):
+        free_ranges = vlan_map.format_ranges(bitmap.free_ranges())
+        rows.append([
+            bitmap.name,
+            bitmap.used_count(),
+            bitmap.free_count(),
+            ', '.join(str(vid) for vid in sorted(bitmap.conflicts)) or '-',
+            ', '.join(str(vid) for vid in bitmap.next_free(next_count)) or 'Aucun',
+            free_ranges[:60] + ('...' if len(free_ranges) > 60 else '')
+        ])
+    
+    print(f"\n🏷️  Allocation des VLAN IDs ({len(maps)} domaine(s)):")
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
+    
+    # Détail des conflits (même VID plusieurs fois dans un domaine)
+    for bitmap in maps.values():
+        for vid in sorted(bitmap.conflicts):
+            names = ', '.join(name or '?' for name in bitmap.vlans[vid])
+            print(f"⚠️  {bitmap.name}: VID {vid} attribué plusieurs fois ({names})")
+        for vid in sorted(bitmap.out_of_range):
+            print(f"⚠️  {bitmap.name}: VID {vid} hors de la plage {bitmap.min_vid}-{bitmap.max_vid}")
+    
+    if heatmap:
+        for bitmap in sorted(maps.values(), key=lambda b: b.name):
+            print(f"\n🗺️  {bitmap.name} (█ utilisé, · libre, ! conflit):")
+            for line in bitmap.heatmap():
+                print(line)
+
 def list_vrfs(client):
     """Liste les VRFs"""
     print("📋 Récupération des VRFs...")
@@ -189,52 +248,234 @@ def list_vrfs(client):
     print(f"\n🗂️  VRFs ({len(vrfs)} trouvé(s)):")
     print(tabulate(rows, headers=headers, tablefmt='grid'))
 
-def available_ips(client, prefix):
-    """Affiche les IPs disponibles dans un préfixe"""
+def _vrf_filter(prefix_obj):
+    """Filtre API restreignant une recherche au VRF d'un préfixe (global = null)"""
+    return {'vrf_id': prefix_obj['vrf']['id'] if prefix_obj.get('vrf') else 'null'}
+
+def find_prefix(client, prefix, vrf=None):
+    """Retrouve un préfixe par son CIDR (et éventuellement son VRF)"""
+    params = {'prefix': prefix}
+    if vrf:
+        params['vrf'] = vrf
+    prefixes = client.get('/ipam/prefixes/', params)
+    if not prefixes or not prefixes.get('results'):
+        return None
+    return prefixes['results'][0]
+
+def compute_free_space(client, prefix_obj):
+    """Calcule localement l'espace libre d'un préfixe par arithmétique d'intervalles
+    
+    Retourne (réseau, intervalles libres pour les adresses, intervalles libres
+    pour les sous-préfixes). Seules les entrées utilisées sont récupérées.
+    """
+    network = ipaddress.ip_network(prefix_obj['prefix'])
+    vrf_filter = _vrf_filter(prefix_obj)
+    
+    used_addresses = []
+    for ip in client.iter_all('/ipam/ip-addresses/', {'parent': str(network), **vrf_filter}):
+        used_addresses.append(ip_ranges.address_bounds(ip['address']))
+    
+    for ip_range in client.iter_all('/ipam/ip-ranges/', {'parent': str(network), **vrf_filter}):
+        start = ip_ranges.address_bounds(ip_range['start_address'])[0]
+        end = ip_ranges.address_bounds(ip_range['end_address'])[0]
+        used_addresses.append((start, end))
+    
+    child_prefixes = []
+    for child in client.iter_all('/ipam/prefixes/', {'within': str(network), **vrf_filter}):
+        child_prefixes.append(ip_ranges.network_bounds(child['prefix']))
+    
+    # Pour IPv4 (hors pool et /31, /32), réseau et broadcast ne sont pas attribuables
+    reserved = []
+    if network.version == 4 and network.prefixlen < 31 and not prefix_obj.get('is_pool'):
+        net_start, net_end = ip_ranges.network_bounds(network)
+        reserved = [(net_start, net_start), (net_end, net_end)]
+    
+    free_addresses = ip_ranges.free_intervals(network, used_addresses + reserved)
+    free_space = ip_ranges.free_intervals(network, used_addresses + child_prefixes)
+    return network, free_addresses, free_space
+
+def available_ips(client, prefix, vrf=None, size=None, count=20):
+    """Affiche l'espace libre d'un préfixe sous forme de plages ou de sous-préfixes alignés"""
     print(f"🔍 Recherche d'IPs disponibles dans: {prefix}")
     
-    # Trouver le préfixe
-    prefixes = client.get('/ipam/prefixes/', {'prefix': prefix})
-    if not prefixes or not prefixes.get('results'):
+    prefix_obj = find_prefix(client, prefix, vrf)
+    if not prefix_obj:
         print(f"❌ Préfixe '{prefix}' non trouvé")
         return
     
-    prefix_obj = prefixes['results'][0]
-    prefix_id = prefix_obj['id']
+    network, free_addresses, free_space = compute_free_space(client, prefix_obj)
+    version = network.version
     
-    # Récupérer les IPs disponibles
-    available = client.get(f'/ipam/prefixes/{prefix_id}/available-ips/')
+    if size is not None:
+        max_len = 32 if version == 4 else 128
+        if size < network.prefixlen or size > max_len:
+            print(f"❌ Taille /{size} invalide pour {network}")
+            return
+        
+        total = ip_ranges.count_free_subnets(free_space, size, version)
+        if total == 0:
+            print(f"❌ Aucun /{size} libre dans {network}")
+            return
+        
+        print(f"\n✅ Sous-préfixes /{size} libres dans {network} ({total} trouvé(s)):")
+        for i, subnet in enumerate(islice(ip_ranges.iter_free_subnets(free_space, size, version), count)):
+            print(f"  {i+1:2d}. {subnet}")
+        
+        if total > count:
+            print(f"  ... et {total - count} autres")
+        return
     
-    if not available:
+    free_total = ip_ranges.count_addresses(free_addresses)
+    if free_total == 0:
         print(f"❌ Aucune IP disponible dans {prefix}")
         return
     
-    print(f"\n✅ IPs disponibles dans {prefix} ({len(available)} trouvée(s)):")
+    print(f"\n✅ IPs disponibles dans {network}: {free_total} adresse(s) en {len(free_addresses)} plage(s)")
     
-    # Afficher les 20 premières IPs disponibles
-    display_count = min(20, len(available))
-    for i, ip in enumerate(available[:display_count]):
-        print(f"  {i+1:2d}. {ip['address']}")
+    headers = ['Début', 'Fin', 'Adresses', 'Blocs CIDR']
+    rows = []
+    for start, end in free_addresses[:count]:
+        first, last = ip_ranges.interval_to_range(start, end, version)
+        blocks = ip_ranges.interval_to_networks(start, end, version)
+        blocks_str = ', '.join(str(b) for b in blocks[:3]) + (' ...' if len(blocks) > 3 else '')
+        rows.append([str(first), str(last), end - start + 1, blocks_str])
+    
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
     
-    if len(available) > 20:
-        print(f"  ... et {len(available) - 20} autres")
+    if len(free_addresses) > count:
+        print(f"  ... et {len(free_addresses) - count} autres plages")
 
-def ip_usage_stats(client, prefix=None):
+def _first_free_addresses(free_intervals, count, network):
+    """Premières adresses libres (prévision locale de l'allocation)"""
+    candidates = []
+    for start, end in free_intervals:
+        for value in range(start, min(end, start + count - len(candidates) - 1) + 1):
+            candidates.append(f"{ipaddress.ip_address(value)}/{network.prefixlen}")
+        if len(candidates) >= count:
+            break
+    return candidates
+
+def allocate_ips(client, prefix, count, vrf=None, status='active', description=None,
+                 dns_name=None, dry_run=False, retries=3):
+    """Alloue count adresses dans un préfixe en une seule écriture groupée"""
+    print(f"🔍 Allocation de {count} adresse(s) dans: {prefix}")
+    
+    prefix_obj = find_prefix(client, prefix, vrf)
+    if not prefix_obj:
+        print(f"❌ Préfixe '{prefix}' non trouvé")
+        return
+    
+    payload = []
+    for _ in range(count):
+        item = {'status': status}
+        if description:
+            item['description'] = description
+        if dns_name:
+            item['dns_name'] = dns_name
+        payload.append(item)
+    
+    started = time.monotonic()
+    writes = 0
+    
+    for attempt in range(1, retries + 1):
+        # Calcul local des candidats : vérifie la capacité avant toute écriture
+        network, free_addresses, _ = compute_free_space(client, prefix_obj)
+        free_total = ip_ranges.count_addresses(free_addresses)
+        if free_total < count:
+            print(f"❌ Seulement {free_total} adresse(s) libre(s) dans {network}")
+            return
+        
+        candidates = _first_free_addresses(free_addresses, count, network)
+        if dry_run:
+            print(f"\n🧪 Simulation - adresses qui seraient allouées ({count}):")
+            for i, address in enumerate(candidates[:20]):
+                print(f"  {i+1:2d}. {address}")
+            if count > 20:
+                print(f"  ... et {count - 20} autres")
+            return
+        
+        # Une seule requête : Netbox réserve les adresses sous verrou côté serveur
+        status_code, created = client.send('POST', f"/ipam/prefixes/{prefix_obj['id']}/available-ips/",
+                                           data=payload)
+        writes += 1
+        
+        if status_code in (200, 201):
+            break
+        
+        if status_code == 409 and attempt < retries:
+            # Conflit : des adresses ont été prises entre-temps, recalculer
+            print(f"⚠️  Conflit d'allocation (tentative {attempt}/{retries}), nouvel essai...")
+            time.sleep(0.5 * attempt)
+            continue
+        
+        print(f"❌ Erreur HTTP {status_code}: {created}")
+        return
+    
+    elapsed = time.monotonic() - started
+    created = created if isinstance(created, list) else [created]
+    allocated = [ip['address'] for ip in created]
+    
+    print(f"\n✅ {len(allocated)} adresse(s) allouée(s) dans {prefix_obj['prefix']}:")
+    for i, address in enumerate(allocated[:20]):
+        print(f"  {i+1:2d}. {address}")
+    if len(allocated) > 20:
+        print(f"  ... et {len(allocated) - 20} autres")
+    
+    differing = len(set(allocated) - set(candidates))
+    if differing:
+        print(f"ℹ️  {differing} adresse(s) différente(s) de la prévision locale (allocation concurrente)")
+    
+    rate = len(allocated) / elapsed if elapsed > 0 else 0
+    print(f"⏱️  {len(allocated)} adresse(s) en {elapsed:.2f}s ({rate:.0f} adr/s, {writes} écriture(s))")
+
+def _snapshot_prefixes(nets_sets):
+    """Préfixes d'un instantané binaire sous la forme des objets Netbox utilisés ici"""
+    return [{'id': int(nets.ids[i]), 'prefix': text, 'vrf': {'id': int(nets.vrf[i])} if nets.vrf[i] else None}
+            for nets in nets_sets for i, text in enumerate(nets.to_strings())]
+
+def ip_usage_stats(client, prefix=None, snapshot_file=None):
     """Statistiques d'utilisation IP"""
-    if prefix:
-        print(f"📊 Statistiques d'utilisation pour: {prefix}")
-        prefixes = client.get('/ipam/prefixes/', {'prefix': prefix})
-        if not prefixes or not prefixes.get('results'):
-            print(f"❌ Préfixe '{prefix}' non trouvé")
+    if snapshot_file:
+        # Instantané binaire : colonnes lues par mmap, sans requête ni analyse JSON
+        print(f"📊 Statistiques d'utilisation IP (instantané {snapshot_file})")
+        snap = nbsnap.Snapshot(snapshot_file)
+        ips_v4, ips_v6 = snap.ip_arrays('ip-addresses')
+        nets_v4, nets_v6 = snap.ip_arrays('prefixes')
+        if prefix:
+            network = ipaddress.ip_network(prefix)
+            nets_v4, nets_v6 = (nets.take(nets.contains(network) & (nets.prefixlen == network.prefixlen))
+                                for nets in (nets_v4, nets_v6))
+        prefix_list = _snapshot_prefixes((nets_v4, nets_v6))
+        if not prefix_list:
+            print(f"❌ Préfixe '{prefix}' non trouvé" if prefix else "❌ Aucun préfixe trouvé")
             return
-        prefix_list = prefixes['results']
     else:
-        print("📊 Statistiques globales d'utilisation IP")
-        prefix_list = client.get_all('/ipam/prefixes/')
+        if prefix:
+            print(f"📊 Statistiques d'utilisation pour: {prefix}")
+            prefixes = client.get('/ipam/prefixes/', {'prefix': prefix})
+            if not prefixes or not prefixes.get('results'):
+                print(f"❌ Préfixe '{prefix}' non trouvé")
+                return
+            prefix_list = prefixes['results']
+            ip_params = {'parent': prefix}
+        else:
+            print("📊 Statistiques globales d'utilisation IP")
+            prefix_list = client.get_all('/ipam/prefixes/')
+            ip_params = {}
+        
+        if not prefix_list:
+            print("❌ Aucun préfixe trouvé")
+            return
+        
+        # Charger les adresses en une seule passe puis compter localement par préfixe
+        # (au lieu d'une requête de comptage par préfixe)
+        ips_v4, ips_v6 = ip_arrays.from_records(client.iter_all('/ipam/ip-addresses/', ip_params))
+        nets_v4, nets_v6 = ip_arrays.from_records(prefix_list, field='prefix')
     
-    if not prefix_list:
-        print("❌ Aucun préfixe trouvé")
-        return
+    used_counts = {}
+    for ips, nets in ((ips_v4, nets_v4), (ips_v6, nets_v6)):
+        for prefix_id, count in zip(nets.ids, ips.count_in_networks(nets)):
+            used_counts[int(prefix_id)] = int(count)
     
     headers = ['Préfixe', 'Total IPs', 'IPs Utilisées', 'IPs Libres', 'Utilisation %']
     rows = []
@@ -248,9 +489,8 @@ def ip_usage_stats(client, prefix=None):
             if network.version == 4 and network.prefixlen < 31:
                 total_ips -= 2
             
-            # Compter les IPs utilisées dans ce préfixe
-            used_ips = client.get('/ipam/ip-addresses/', {'parent': prefix_obj['prefix']})
-            used_count = used_ips['count'] if used_ips else 0
+            # IPs utilisées dans ce préfixe (même VRF)
+            used_count = used_counts.get(prefix_obj['id'], 0)
             
             free_count = total_ips - used_count
             usage_percent = (used_count / total_ips * 100) if total_ips > 0 else 0
@@ -271,6 +511,81 @@ def ip_usage_stats(client, prefix=None):
     if rows:
         print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def prefix_hierarchy(client, vrf=None, root=None, max_depth=None):
+    """Affiche l'arbre des préfixes construit localement, avec l'utilisation agrégée"""
+    print("📋 Récupération des préfixes et adresses IP...")
+    
+    params = {'vrf': vrf} if vrf else {}
+    prefix_params, ip_params = dict(params), dict(params)
+    if root:
+        prefix_params['within_include'] = root
+        ip_params['parent'] = root
+    
+    forest = prefix_tree.build_tree(client.iter_all('/ipam/prefixes/', prefix_params),
+                                    client.iter_all('/ipam/ip-addresses/', ip_params))
+    
+    if not forest:
+        print("❌ Aucun préfixe trouvé")
+        return
+    
+    if root:
+        node = prefix_tree.find_node(forest, root)
+        if not node:
+            print(f"❌ Préfixe '{root}' non trouvé")
+            return
+        forest = {node.prefix['vrf']['name'] if node.prefix.get('vrf') else 'Global': [node]}
+    
+    for vrf_name, roots in sorted(forest.items()):
+        print(f"\n🌳 VRF {vrf_name}:")
+        # Rendu ligne par ligne au fil du parcours
+        for line in prefix_tree.iter_lines(roots, max_depth):
+            print(line, flush=True)
+    
+    if max_depth is not None:
+        print("\n💡 Déplier une branche: python3 ipam.py tree --root <préfixe>")
+
+def detect_overlaps(client, vrf=None, output_file=None, snapshot_file=None):
+    """Détecte doublons et chevauchements IPAM, constats émis en NDJSON"""
+    # Les messages vont sur stderr pour laisser stdout au flux NDJSON
+    if snapshot_file:
+        print(f"🔍 Lecture de l'instantané binaire {snapshot_file}...", file=sys.stderr)
+        snap = nbsnap.Snapshot(snapshot_file)
+        ip_sets = snap.ip_arrays('ip-addresses')
+        nets_sets = snap.ip_arrays('prefixes')
+        if vrf:
+            # L'instantané ne conserve que l'ID des VRF
+            if not str(vrf).isdigit():
+                print("❌ Avec --snapshot, --vrf attend l'ID du VRF", file=sys.stderr)
+                return
+            ip_sets = [ips.take(ips.vrf == int(vrf)) for ips in ip_sets]
+            nets_sets = [nets.take(nets.vrf == int(vrf)) for nets in nets_sets]
+        print("ℹ️  Plages IP absentes de l'instantané binaire: non vérifiées", file=sys.stderr)
+        findings = ip_overlaps.find_overlaps_in(ip_sets, _snapshot_prefixes(nets_sets))
+    else:
+        print("🔍 Chargement de l'instantané IPAM...", file=sys.stderr)
+        params = {'vrf': vrf} if vrf else {}
+        prefixes = client.iter_all('/ipam/prefixes/', params)
+        ip_addresses = client.iter_all('/ipam/ip-addresses/', params)
+        ip_ranges_list = client.iter_all('/ipam/ip-ranges/', params)
+        findings = ip_overlaps.find_overlaps(ip_addresses, prefixes, ip_ranges_list)
+    
+    out = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
+    counts = {}
+    try:
+        for finding in findings:
+            out.write(json.dumps(finding, ensure_ascii=False) + '\n')
+            counts[finding['type']] = counts.get(finding['type'], 0) + 1
+        out.flush()
+    finally:
+        if output_file:
+            out.close()
+    
+    if counts:
+        summary = [[kind, count] for kind, count in sorted(counts.items())]
+        print(tabulate(summary, headers=['Constat', 'Nombre'], tablefmt='grid'), file=sys.stderr)
+    else:
+        print("✅ Aucun doublon ni chevauchement détecté", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description='Scripts CLI pour IPAM Netbox')
     subparsers = parser.add_subparsers(dest='command', help='Commandes disponibles')
@@ -295,16 +610,49 @@ def main():
     vlans_parser.add_argument('--group', help='Filtrer par groupe')
     vlans_parser.add_argument('--status', help='Filtrer par status')
     
+    # Commande vlan-map
+    vlan_map_parser = subparsers.add_parser('vlan-map', help='Carte d\'allocation des VLAN IDs')
+    vlan_map_parser.add_argument('--site', help='Filtrer par site')
+    vlan_map_parser.add_argument('--group', help='Filtrer par groupe')
+    vlan_map_parser.add_argument('--next', type=int, default=5, help='Nombre de VIDs libres proposés')
+    vlan_map_parser.add_argument('--heatmap', action='store_true', help='Afficher la carte des VIDs')
+    
     # Commande vrfs
     vrfs_parser = subparsers.add_parser('vrfs', help='Liste les VRFs')
     
     # Commande available
     available_parser = subparsers.add_parser('available', help='IPs disponibles dans un préfixe')
     available_parser.add_argument('prefix', help='Préfixe à analyser (ex: 192.168.1.0/24)')
+    available_parser.add_argument('--vrf', help='VRF du préfixe')
+    available_parser.add_argument('--size', type=int, help='Taille des sous-préfixes libres recherchés (ex: 29)')
+    available_parser.add_argument('--count', type=int, default=20, help='Nombre de résultats affichés')
+    
+    # Commande allocate
+    allocate_parser = subparsers.add_parser('allocate', help='Alloue N adresses dans un préfixe')
+    allocate_parser.add_argument('prefix', help='Préfixe source (ex: 10.0.0.0/24)')
+    allocate_parser.add_argument('--count', type=int, required=True, help='Nombre d\'adresses à allouer')
+    allocate_parser.add_argument('--vrf', help='VRF du préfixe')
+    allocate_parser.add_argument('--status', default='active', help='Status des adresses créées')
+    allocate_parser.add_argument('--description', help='Description des adresses créées')
+    allocate_parser.add_argument('--dns-name', help='Nom DNS des adresses créées')
+    allocate_parser.add_argument('--dry-run', action='store_true', help='Afficher les candidats sans écrire')
     
     # Commande stats
     stats_parser = subparsers.add_parser('stats', help='Statistiques d\'utilisation')
     stats_parser.add_argument('--prefix', help='Préfixe spécifique à analyser')
+    stats_parser.add_argument('--snapshot', help='Instantané binaire (.nbsnap) à analyser au lieu de Netbox')
+    
+    # Commande tree
+    tree_parser = subparsers.add_parser('tree', help='Arbre hiérarchique des préfixes')
+    tree_parser.add_argument('--vrf', help='Filtrer par VRF')
+    tree_parser.add_argument('--root', help='Préfixe racine à afficher (ex: 10.0.0.0/8)')
+    tree_parser.add_argument('--max-depth', type=int, help='Profondeur maximale avant repli')
+    
+    # Commande overlaps
+    overlaps_parser = subparsers.add_parser('overlaps', help='Doublons et chevauchements (NDJSON)')
+    overlaps_parser.add_argument('--vrf', help='Limiter à un VRF')
+    overlaps_parser.add_argument('--output', help='Fichier NDJSON de sortie (défaut: stdout)')
+    overlaps_parser.add_argument('--snapshot', help='Instantané binaire (.nbsnap) à analyser au lieu de Netbox')
     
     args = parser.parse_args()
     
@@ -312,9 +660,9 @@ def main():
         parser.print_help()
         return
     
-    # Création du client Netbox
+    # Création du client Netbox (inutile pour lire un instantané binaire)
     try:
-        client = create_client()
+        client = None if getattr(args, 'snapshot', None) else create_client()
     except Exception as e:
         print(f"❌ Erreur lors de la création du client: {e}")
         sys.exit(1)
@@ -350,14 +698,29 @@ def main():
             filters = {k: v for k, v in filters.items() if v is not None}
             list_vlans(client, filters if filters else None)
         
+        elif args.command == 'vlan-map':
+            filters = {'site': args.site, 'group': args.group}
+            filters = {k: v for k, v in filters.items() if v is not None}
+            vlan_allocation_map(client, filters if filters else None, args.next, args.heatmap)
+        
         elif args.command == 'vrfs':
             list_vrfs(client)
         
         elif args.command == 'available':
-            available_ips(client, args.prefix)
+            available_ips(client, args.prefix, args.vrf, args.size, args.count)
+        
+        elif args.command == 'allocate':
+            allocate_ips(client, args.prefix, args.count, args.vrf, args.status,
+                         args.description, args.dns_name, args.dry_run)
         
         elif args.command == 'stats':
-            ip_usage_stats(client, args.prefix)
+            ip_usage_stats(client, args.prefix, args.snapshot)
+        
+        elif args.command == 'tree':
+            prefix_hierarchy(client, args.vrf, args.root, args.max_depth)
+        
+        elif args.command == 'overlaps':
+            detect_overlaps(client, args.vrf, args.output, args.snapshot)
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Opération interrompue par l'utilisateur")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Hiérarchie des localisations construite localement, avec racks et équipements
+
+Les localisations, racks et équipements sont chargés une fois ; chaque objet
+est rattaché à sa localisation par ID, puis les compteurs remontent des
+feuilles vers les sites en parcourant les nœuds en ordre inverse de largeur
+(temps linéaire, aucune requête de comptage par localisation).
+"""
+
+
+class LocationNode:
+    """Localisation (ou site, à la racine) et ses compteurs directs et cumulés"""
+
+    __slots__ = ('id', 'name', 'kind', 'children', 'racks', 'devices', 'units',
+                 'total_racks', 'total_devices', 'total_units')
+
+    def __init__(self, object_id, name, kind='location'):
+        self.id = object_id
+        self.name = name
+        self.kind = kind
+        self.children = []
+        self.racks = 0          # Racks rattachés directement
+        self.devices = 0        # Équipements rattachés directement
+        self.units = 0          # Unités (U) des racks directs
+        self.total_racks = 0
+        self.total_devices = 0
+        self.total_units = 0
+
+    def to_dict(self):
+        """Export imbriqué (parcours itératif, sans récursion)"""
+        root = self._fields()
+        stack = [(self, root)]
+        while stack:
+            node, data = stack.pop()
+            for child in node.children:
+                child_data = child._fields()
+                data['children'].append(child_data)
+                stack.append((child, child_data))
+        return root
+
+    def _fields(self):
+        return {
+            'id': self.id, 'name': self.name, 'type': self.kind,
+            'racks': self.racks, 'devices': self.devices, 'units': self.units,
+            'total_racks': self.total_racks, 'total_devices': self.total_devices,
+            'total_units': self.total_units, 'children': [],
+        }
+
+
+def build_tree(sites, locations, racks=(), devices=()):
+    """Construit un arbre par site ; retourne la liste des nœuds de site"""
+    roots = {site['id']: LocationNode(site['id'], site['name'], 'site') for site in sites}
+    nodes = {location['id']: LocationNode(location['id'], location['name']) for location in locations}
+
+    for location in locations:
+        node = nodes[location['id']]
+        parent = location.get('parent')
+        if parent and parent['id'] in nodes:
+            nodes[parent['id']].children.append(node)
+        elif location.get('site') and location['site']['id'] in roots:
+            roots[location['site']['id']].children.append(node)
+
+    def owner(obj):
+        """Nœud d'un rack ou équipement : sa localisation, sinon son site"""
+        if obj.get('location') and obj['location']['id'] in nodes:
+            return nodes[obj['location']['id']]
+        if obj.get('site'):
+            return roots.get(obj['site']['id'])
+        return None
+
+    for rack in racks:
+        node = owner(rack)
+        if node:
+            node.racks += 1
+            node.units += rack.get('u_height') or 0
+
+    for device in devices:
+        node = owner(device)
+        if node:
+            node.devices += 1
+
+    # Parcours en largeur puis remontée en ordre inverse : chaque enfant est
+    # totalisé avant son parent
+    order = list(roots.values())
+    for node in order:
+        for child in node.children:
+            order.append(child)
+    for node in reversed(order):
+        node.total_racks = node.racks + sum(child.total_racks for child in node.children)
+        node.total_devices = node.devices + sum(child.total_devices for child in node.children)
+        node.total_units = node.units + sum(child.total_units for child in node.children)
+        node.children.sort(key=lambda child: child.name)
+
+    return sorted(roots.values(), key=lambda root: root.name)
+
+
+def iter_lines(root, max_depth=None):
+    """Génère les lignes de l'arbre d'un site au fil du parcours"""
+    yield f"🏢 {root.name}  ({root.total_racks} rack(s), {root.total_devices} équipement(s), {root.total_units}U)"
+    if root.racks or root.devices:
+        yield f"│   (hors localisation: {root.racks} rack(s), {root.devices} équipement(s))"
+
+    stack = [(child, '', i == len(root.children) - 1, 1) for i, child in reversed(list(enumerate(root.children)))]
+    while stack:
+        node, indent, last, depth = stack.pop()
+        line = (f"{indent}{'└── ' if last else '├── '}📍 {node.name}  "
+                f"[{node.total_racks} rack(s), {node.total_devices} équipement(s), {node.total_units}U]")
+
+        if node.children and max_depth is not None and depth >= max_depth:
+            yield line + f"  ▸ {len(node.children)} sous-localisation(s)"
+            continue
+
+        yield line
+        child_indent = indent + ('    ' if last else '│   ')
+        for i in range(len(node.children) - 1, -1, -1):
+            stack.append((node.children[i], child_indent, i == len(node.children) - 1, depth + 1))
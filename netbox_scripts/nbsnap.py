@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Instantané binaire de l'inventaire (.nbsnap), lu par mmap sans analyse
+
+Les objets principaux (équipements, racks, interfaces, câbles, adresses IP,
+préfixes) sont stockés en colonnes de largeur fixe, little-endian et alignées
+sur 8 octets. Les chaînes sont dédupliquées dans une table commune et les
+colonnes texte n'en contiennent que l'indice (-1 = absent). Les adresses et
+préfixes sont rangés par famille dans les colonnes de ip_arrays.IPArray.
+
+Un en-tête JSON en fin de fichier décrit l'emplacement de chaque colonne : à
+l'ouverture, seul cet en-tête est lu ; les colonnes sont des vues NumPy sur
+le fichier projeté en mémoire (aucune copie, pages chargées à la demande).
+
+Disposition : 'NBSNAP01' | position de l'en-tête (u64) | taille (u64) |
+colonnes... | index des chaînes (i64, n+1) | octets des chaînes | en-tête.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+import ip_arrays
+from aggregation import path_getter
+
+MAGIC = b'NBSNAP01'
+_PREAMBLE = struct.Struct('<8sQQ')
+_ALIGN = 8
+
+# Type de colonne -> (dtype stocké, code du module array pour la collecte)
+KINDS = {
+    'int': ('<i8', 'q'),
+    'int32': ('<i4', 'i'),
+    'float': ('<f4', 'f'),
+    'bool': ('|u1', 'B'),
+    'str': ('<i4', 'i'),
+}
+
+ABSENT = -1
+ABSENT_BOOL = 255   # Colonnes booléennes non signées : -1 n'y tient pas
+
+
+def _cable_end(side, field):
+    """Première terminaison d'une extrémité de câble (type d'objet ou ID)"""
+    def get(cable):
+        terminations = cable.get(f"{side}_terminations") or []
+        return terminations[0].get(field) if terminations else None
+    return get
+
+
+# Tables à colonnes (nom, chemin pointé ou fonction, type) ; les valeurs
+# absentes valent -1 (entiers, chaînes), 255 (booléens) ou NaN (flottants). Les équipements
+# reçoivent en plus les colonnes u_height et full_depth, déduites de leur type.
+TABLES = {
+    'devices': [
+        ('id', 'id', 'int'),
+        ('name', 'name', 'str'),
+        ('status', 'status.value', 'str'),
+        ('role', 'role.name', 'str'),
+        ('site', 'site.slug', 'str'),
+        ('site_name', 'site.name', 'str'),
+        ('site_id', 'site.id', 'int'),
+        ('location', 'location.slug', 'str'),
+        ('location_id', 'location.id', 'int'),
+        ('rack_id', 'rack.id', 'int'),
+        ('position', 'position', 'float'),
+        ('face', 'face.value', 'str'),
+        ('device_type_id', 'device_type.id', 'int'),
+    ],
+    'racks': [
+        ('id', 'id', 'int'),
+        ('name', 'name', 'str'),
+        ('status', 'status.value', 'str'),
+        ('site', 'site.slug', 'str'),
+        ('site_name', 'site.name', 'str'),
+        ('site_id', 'site.id', 'int'),
+        ('location', 'location.slug', 'str'),
+        ('location_id', 'location.id', 'int'),
+        ('u_height', 'u_height', 'int32'),
+        ('starting_unit', 'starting_unit', 'int32'),
+    ],
+    'interfaces': [
+        ('id', 'id', 'int'),
+        ('device_id', 'device.id', 'int'),
+        ('name', 'name', 'str'),
+        ('type', 'type.value', 'str'),
+        ('enabled', 'enabled', 'bool'),
+        ('mgmt_only', 'mgmt_only', 'bool'),
+        ('speed', 'speed', 'int'),
+        ('cable_id', 'cable.id', 'int'),
+    ],
+    'cables': [
+        ('id', 'id', 'int'),
+        ('status', 'status.value', 'str'),
+        ('type', 'type', 'str'),
+        ('a_type', _cable_end('a', 'object_type'), 'str'),
+        ('a_id', _cable_end('a', 'object_id'), 'int'),
+        ('b_type', _cable_end('b', 'object_type'), 'str'),
+        ('b_id', _cable_end('b', 'object_id'), 'int'),
+    ],
+}
+
+# Tables d'adresses, scindées par famille ('<nom>.4' et '<nom>.6')
+IP_TABLES = {
+    'ip-addresses': 'address',
+    'prefixes': 'prefix',
+}
+
+# Type d'objet exporté dont chaque table est issue
+SOURCES = {name: name for name in list(TABLES) + list(IP_TABLES)}
+
+
+class StringTable:
+    """Chaînes dédupliquées : valeur -> indice, dans l'ordre d'apparition"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        if value is None:
+            return ABSENT
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            # Tables collectées en parallèle : l'attribution d'un indice est exclusive
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = self.codes[value] = len(self.values)
+                    self.values.append(value.encode('utf-8'))
+        return code
+
+
+def by_device_type(type_ids, values, default, dtype):
+    """Valeur de chaque équipement d'après son type {ID du type: valeur} ; default si inconnu"""
+    result = np.full(len(type_ids), default, dtype=dtype)
+    if values:
+        known = np.array(sorted(values), dtype=np.int64)
+        column = np.array([values[i] for i in known], dtype=dtype)
+        position = np.clip(np.searchsorted(known, type_ids), 0, len(known) - 1)
+        found = known[position] == type_ids
+        result[found] = column[position[found]]
+    return result
+
+
+def collect_table(name, records, strings):
+    """Convertit un flux d'objets en colonnes NumPy {colonne: tableau}"""
+    columns = TABLES[name]
+    getters = [path if callable(path) else path_getter(path, None) for _, path, _ in columns]
+    values = [array(KINDS[kind][1]) for _, _, kind in columns]
+
+    for record in records:
+        for get, column, (_, _, kind) in zip(getters, values, columns):
+            value = get(record)
+            if kind == 'str':
+                value = strings.code(value)
+            elif kind == 'float':
+                value = float('nan') if value is None else float(value)
+            elif kind == 'bool':
+                value = ABSENT_BOOL if value is None else int(bool(value))
+            elif value is None:
+                value = ABSENT
+            column.append(value)
+
+    return {name: {col: np.frombuffer(column, dtype=KINDS[kind][1]).astype(KINDS[kind][0])
+                   for (col, _, kind), column in zip(columns, values)}}
+
+
+def collect_ip_table(name, records):
+    """Adresses ou préfixes en deux tables par famille, colonnes d'IPArray"""
+    v4, v6 = ip_arrays.from_records(records, field=IP_TABLES[name])
+    common = lambda ips: {'prefixlen': ips.prefixlen.astype('|u1'), 'vrf': ips.vrf.astype('<i4'),
+                          'status': ips.status.astype('|u1'), 'id': ips.ids.astype('<i8')}
+    return {
+        f"{name}.4": {'addr': v4.addr.astype('<u4'), **common(v4)},
+        f"{name}.6": {'hi': v6.hi.astype('<u8'), 'lo': v6.lo.astype('<u8'), **common(v6)},
+    }
+
+
+def collect(name, records, strings):
+    if name in IP_TABLES:
+        return collect_ip_table(name, records)
+    return collect_table(name, records, strings)
+
+
+def write(path, tables, strings, meta=None):
+    """Écrit les tables {nom: {colonne: tableau}} et la table des chaînes"""
+    header = {'version': 1, 'created': datetime.now().isoformat(timespec='seconds'),
+              **(meta or {}), 'tables': {}}
+
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, 0, 0))
+
+        def put(data):
+            f.write(b'\0' * (-f.tell() % _ALIGN))
+            offset = f.tell()
+            f.write(np.ascontiguousarray(data).tobytes())
+            return offset
+
+        for name, columns in tables.items():
+            rows = len(next(iter(columns.values()))) if columns else 0
+            entry = header['tables'][name] = {'rows': rows, 'columns': {}}
+            for col, data in columns.items():
+                entry['columns'][col] = {'dtype': data.dtype.str, 'offset': put(data)}
+
+        lengths = np.fromiter((len(v) for v in strings.values), dtype='<i8', count=len(strings.values))
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype('<i8')
+        header['strings'] = {'count': len(strings.values), 'index': put(offsets), 'data': f.tell()}
+        for value in strings.values:
+            f.write(value)
+
+        encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        position = f.tell()
+        f.write(encoded)
+        f.seek(0)
+        f.write(_PREAMBLE.pack(MAGIC, position, len(encoded)))
+    os.replace(tmp, path)
+    return header
+
+
+def build(path, fetch, run=None, meta=None):
+    """Construit un instantané ; fetch(type) retourne un flux d'objets, ou None si indisponible
+
+    run(fonction, éléments) produit (élément, résultat), comme
+    client.run_concurrently ; par défaut les tables sont chargées à la suite.
+    """
+    run = run or (lambda func, items: ((item, func(item)) for item in items))
+    device_types = list(fetch('device-types') or ())
+    # Un type 0U (PDU, panneau latéral) garde sa hauteur nulle : il n'occupe aucune unité
+    heights = {dt['id']: dt['u_height'] if dt.get('u_height') is not None else 1 for dt in device_types}
+    full_depth = {dt['id']: dt['is_full_depth'] if dt.get('is_full_depth') is not None else True
+                  for dt in device_types}
+
+    sources = {name: fetch(source) for name, source in SOURCES.items()}
+    sources = {name: records for name, records in sources.items() if records is not None}
+
+    strings = StringTable()
+    tables = {}
+    for _, result in run(lambda name: collect(name, sources[name], strings), list(sources)):
+        tables.update(result)
+    if 'devices' in tables:
+        devices = tables['devices']
+        devices['u_height'] = by_device_type(devices['device_type_id'], heights, 1, '<f4')
+        devices['full_depth'] = by_device_type(devices['device_type_id'], full_depth, True, '|u1')
+
+    return write(path, dict(sorted(tables.items())), strings, meta)
+
+
+class Snapshot:
+    """Instantané ouvert par mmap ; colonnes exposées en vues NumPy"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, position, length = _PREAMBLE.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: ce n'est pas un instantané binaire .nbsnap")
+        self.header = json.loads(self._map[position:position + length])
+        self.tables = self.header['tables']
+
+        strings = self.header['strings']
+        self._string_index = np.frombuffer(self._map, dtype='<i8', count=strings['count'] + 1,
+                                           offset=strings['index'])
+        self._string_data = strings['data']
+
+    def rows(self, table):
+        return self.tables[table]['rows'] if table in self.tables else 0
+
+    def column(self, table, name):
+        """Colonne en vue NumPy en lecture seule, sans copie"""
+        info = self.tables[table]['columns'][name]
+        return np.frombuffer(self._map, dtype=info['dtype'], count=self.tables[table]['rows'],
+                             offset=info['offset'])
+
+    def string(self, code):
+        if code < 0:
+            return None
+        start = self._string_data + int(self._string_index[code])
+        end = self._string_data + int(self._string_index[code + 1])
+        return self._map[start:end].decode('utf-8')
+
+    def strings(self, codes):
+        return [self.string(int(code)) for code in codes]
+
+    def code(self, value):
+        """Indice d'une chaîne dans la table (-1 si absente), sans la décoder entière"""
+        encoded = value.encode('utf-8')
+        start = self._string_data
+        end = start + int(self._string_index[-1])
+        position = self._map.find(encoded, start, end)
+        while position >= 0:
+            relative = position - start
+            i = int(np.searchsorted(self._string_index, relative))
+            if (i < len(self._string_index) - 1 and self._string_index[i] == relative
+                    and self._string_index[i + 1] - relative == len(encoded)):
+                return i
+            position = self._map.find(encoded, position + 1, end)
+        return ABSENT
+
+    def match(self, table, name, value):
+        """Masque des lignes dont la colonne texte vaut value"""
+        return self.column(table, name) == self.code(value)
+
+    def records(self, table, columns, index=None):
+        """Lignes sous forme de dictionnaires (pour de petites sélections)"""
+        kinds = {col: kind for col, _, kind in TABLES[table]}
+        data = {}
+        for col in columns:
+            values = self.column(table, col)
+            values = values if index is None else values[index]
+            if kinds.get(col) == 'str':
+                data[col] = self.strings(values)
+            elif kinds.get(col) == 'bool':
+                data[col] = [None if value == ABSENT_BOOL else bool(value) for value in values.tolist()]
+            else:
+                data[col] = values.tolist()
+        count = len(next(iter(data.values()))) if data else 0
+        return [{col: data[col][i] for col in columns} for i in range(count)]
+
+    def ip_arrays(self, name):
+        """Adresses ou préfixes sous forme de deux IPArray (IPv4, IPv6) sans copie"""
+        v4, v6 = f"{name}.4", f"{name}.6"
+        if v4 not in self.tables:
+            raise ValueError(f"{self.path}: table '{name}' absente de l'instantané")
+        common = lambda table: dict(prefixlen=self.column(table, 'prefixlen'), vrf=self.column(table, 'vrf'),
+                                    status=self.column(table, 'status'), ids=self.column(table, 'id'))
+        return (ip_arrays.IPArray(4, addr=self.column(v4, 'addr'), **common(v4)),
+                ip_arrays.IPArray(6, hi=self.column(v6, 'hi'), lo=self.column(v6, 'lo'), **common(v6)))
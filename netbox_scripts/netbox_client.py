@@ -6,9 +6,86 @@ Client API Netbox commun pour tous les scripts
 import requests
 import json
 import sys
-from urllib.parse import urljoin, urlparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from urllib.parse import urljoin, urlparse, parse_qs
+from requests.adapters import HTTPAdapter
 from config import get_final_config
 
+# Codes HTTP transitoires pour lesquels une écriture peut être rejouée
+RETRY_ALWAYS = {429, 503}        # Requête refusée avant traitement
+RETRY_IDEMPOTENT = {502, 504}    # Issue inconnue : uniquement si idempotent
+
+class RateLimiter:
+    """Limiteur de débit (seau à jetons) partagé entre les threads"""
+    
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Attend qu'un jeton soit disponible (aucune attente si rate <= 0)"""
+        if not self.rate or self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(max(1, self.rate), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class BulkReport:
+    """Rapport d'une écriture groupée : résultat ou erreur par objet"""
+    
+    def __init__(self, operation, objects):
+        self.operation = operation
+        self.objects = objects
+        self.results = {}   # index -> objet retourné par Netbox
+        self.errors = {}    # index -> message d'erreur
+        self.requests = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+    
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+    
+    def record(self, outcomes):
+        with self._lock:
+            for index, ok, value in outcomes:
+                if ok:
+                    self.results[index] = value
+                else:
+                    self.errors[index] = value
+    
+    @property
+    def succeeded(self):
+        return [self.results[i] for i in sorted(self.results)]
+    
+    @property
+    def failed(self):
+        return [(self.objects[i], self.errors[i]) for i in sorted(self.errors)]
+    
+    def print_summary(self, max_errors=10):
+        """Affiche le bilan de l'opération"""
+        total = len(self.objects)
+        rate = total / self.elapsed if self.elapsed > 0 else 0
+        print(f"✅ {self.operation}: {len(self.results)}/{total} objet(s) en {self.elapsed:.2f}s "
+              f"({rate:.0f} obj/s, {self.requests} requête(s))")
+        for obj, error in self.failed[:max_errors]:
+            label = obj.get('id') or obj.get('name') or obj.get('address') or obj
+            print(f"  ❌ {label}: {error}")
+        if len(self.errors) > max_errors:
+            print(f"  ... et {len(self.errors) - max_errors} autres échecs")
+
 class NetboxClient:
     def __init__(self, config=None):
         """Initialise le client Netbox"""
@@ -18,6 +95,15 @@ class NetboxClient:
         self.token = self.config['api_token']
         self.timeout = self.config['timeout']
         self.verify_ssl = self.config['verify_ssl']
+        self.max_workers = self.config.get('max_workers', 4)
+        self.max_retries = self.config.get('max_retries', 3)
+        self.rate_limiter = RateLimiter(self.config.get('rate_limit', 0))
+        
+        # Session partagée : connexions réutilisées entre requêtes et threads
+        self.session = requests.Session()
+        self.pool_size = 0
+        self.pool_lock = threading.Lock()
+        self._ensure_pool(self.max_workers)
         
         # Headers pour toutes les requêtes
         self.headers = {
@@ -32,20 +118,40 @@ class NetboxClient:
             print("Veuillez modifier netbox_config.json ou définir NETBOX_TOKEN")
             sys.exit(1)
     
+    def _ensure_pool(self, size):
+        """Agrandit le pool de connexions au plus grand nombre de threads utilisé
+        
+        Un pool plus petit que le nombre de threads force urllib3 à ouvrir puis
+        jeter des connexions au-delà de sa taille, annulant leur réutilisation.
+        """
+        with self.pool_lock:
+            if size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.pool_size = size
+    
+    def _request(self, method, endpoint, params=None, data=None):
+        """Envoie la requête HTTP brute vers l'API Netbox"""
+        url = urljoin(self.api_url, endpoint.lstrip('/'))
+        self.rate_limiter.acquire()
+        return self.session.request(
+            method=method,
+            url=url,
+            headers=self.headers,
+            params=params,
+            json=data,
+            timeout=self.timeout,
+            verify=self.verify_ssl
+        )
+    
     def _make_request(self, method, endpoint, params=None, data=None):
         """Effectue une requête HTTP vers l'API Netbox"""
         url = urljoin(self.api_url, endpoint.lstrip('/'))
         
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                params=params,
-                json=data,
-                timeout=self.timeout,
-                verify=self.verify_ssl
-            )
+            response = self._request(method, endpoint, params=params, data=data)
             
             # Gestion des erreurs HTTP
             if response.status_code == 401:
@@ -77,43 +183,194 @@ class NetboxClient:
             print("❌ Réponse JSON invalide")
             return None
     
+    def send(self, method, endpoint, params=None, data=None):
+        """Effectue une requête et retourne (code HTTP, contenu) sans gestion d'erreur
+        
+        Destiné aux chemins d'écriture qui doivent réagir eux-mêmes aux codes
+        d'erreur (ex: 409 en cas de conflit). Les erreurs réseau sont propagées.
+        """
+        response = self._request(method, endpoint, params=params, data=data)
+        try:
+            payload = response.json() if response.content else None
+        except ValueError:
+            payload = response.text
+        return response.status_code, payload
+    
     def get(self, endpoint, params=None):
         """Effectue une requête GET"""
         return self._make_request('GET', endpoint, params=params)
     
-    def get_all(self, endpoint, params=None, max_items=None):
-        """Récupère tous les éléments avec pagination"""
-        all_results = []
-        params = params or {}
-        max_items = max_items or self.config['max_items']
+    def post(self, endpoint, data):
+        """Effectue une requête POST"""
+        return self._make_request('POST', endpoint, data=data)
+    
+    def iter_pages(self, endpoint, params=None, keyset=False):
+        """Itère sur les pages d'un endpoint en suivant les liens next
         
-        # Première requête
-        response = self.get(endpoint, params)
-        if not response:
-            return []
+        Lève RuntimeError si une page ne peut pas être récupérée, afin qu'un
+        échec en cours de pagination ne passe jamais pour une fin de liste.
         
-        all_results.extend(response.get('results', []))
+        En mode keyset, les pages sont demandées par ID croissant avec id__gt
+        (le dernier ID reçu) au lieu de l'offset des liens next : une création
+        ou une suppression pendant la pagination ne fait ni sauter ni répéter
+        d'objet. Un id__gt fourni dans params sert de point de départ.
+        """
+        params = dict(params or {})
+        params.setdefault('limit', self.config['items_per_page'])
+        if keyset:
+            params['ordering'] = 'id'
         
-        # Pagination
-        while response.get('next') and len(all_results) < max_items:
-            next_url = response['next']
+        while True:
+            response = self.get(endpoint, params)
+            if response is None:
+                raise RuntimeError(f"Échec de la récupération de {endpoint} ({params})")
+            yield response
+            
+            results = response.get('results') or []
+            if not response.get('next') or (keyset and not results):
+                break
+            
+            if keyset:
+                params['id__gt'] = results[-1]['id']
+                continue
+            
             # Extraire les paramètres de l'URL next
-            from urllib.parse import parse_qs, urlparse
-            parsed = urlparse(next_url)
-            next_params = parse_qs(parsed.query)
+            parsed = urlparse(response['next'])
+            params = parse_qs(parsed.query)
             
             # Convertir les listes en valeurs simples
-            for key, value in next_params.items():
+            for key, value in params.items():
                 if isinstance(value, list) and len(value) == 1:
-                    next_params[key] = value[0]
+                    params[key] = value[0]
+    
+    def iter_all(self, endpoint, params=None, keyset=False):
+        """Itère sur tous les éléments d'un endpoint, page par page, sans limite globale"""
+        for page in self.iter_pages(endpoint, params, keyset):
+            yield from page.get('results', [])
+    
+    def get_all(self, endpoint, params=None, max_items=None):
+        """Récupère tous les éléments avec pagination (limité à max_items)"""
+        max_items = max_items or self.config['max_items']
+        return list(islice(self.iter_all(endpoint, params), max_items))
+    
+    def run_concurrently(self, func, items, max_workers=None):
+        """Exécute func sur chaque élément en parallèle ; produit (élément, résultat) à la fin de chacun"""
+        items = list(items)
+        if not items:
+            return
+        max_workers = max_workers or self.max_workers
+        self._ensure_pool(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def _chunks(self, indexed_objects):
+        """Découpe une liste d'objets en lots bornés en taille JSON et en nombre"""
+        max_bytes = self.config.get('bulk_max_bytes', 1000000)
+        max_items = self.config.get('bulk_max_items', 500)
+        chunk, size = [], 2
+        for index, obj in indexed_objects:
+            obj_size = len(json.dumps(obj, default=str)) + 1
+            if chunk and (size + obj_size > max_bytes or len(chunk) >= max_items):
+                yield chunk
+                chunk, size = [], 2
+            chunk.append((index, obj))
+            size += obj_size
+        if chunk:
+            yield chunk
+    
+    def _send_with_retry(self, method, endpoint, data, idempotent, report):
+        """Envoie une écriture groupée avec reprise sur les erreurs transitoires
+        
+        Une création n'est rejouée que si la requête n'a pas pu être traitée
+        (429, 503, connexion impossible) afin de ne jamais créer de doublons.
+        """
+        for attempt in range(self.max_retries + 1):
+            report.count_request()
+            delay = 2 ** attempt * 0.5
+            try:
+                response = self._request(method, endpoint, data=data)
+            except requests.exceptions.ConnectTimeout as e:
+                error = f"Connexion impossible: {e}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not idempotent:
+                    return None, f"Issue incertaine, non rejouée: {e}"
+                error = str(e)
+            else:
+                status = response.status_code
+                retryable = status in RETRY_ALWAYS or (idempotent and status in RETRY_IDEMPOTENT)
+                if not retryable or attempt == self.max_retries:
+                    try:
+                        payload = response.json() if response.content else None
+                    except ValueError:
+                        payload = response.text
+                    return status, payload
+                error = f"HTTP {status}"
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = int(retry_after)
             
-            response = self.get(endpoint, next_params)
-            if not response:
-                break
-                
-            all_results.extend(response.get('results', []))
+            if attempt < self.max_retries:
+                time.sleep(delay)
         
-        return all_results[:max_items]
+        return None, error
+    
+    def _write_chunk(self, method, endpoint, chunk, idempotent, report):
+        """Écrit un lot ; en cas de rejet, isole les objets fautifs pour un rapport par objet"""
+        status, payload = self._send_with_retry(method, endpoint, [obj for _, obj in chunk], idempotent, report)
+        
+        if status is not None and status < 300:
+            results = payload if isinstance(payload, list) and len(payload) == len(chunk) else [None] * len(chunk)
+            return [(index, True, result) for (index, _), result in zip(chunk, results)]
+        
+        if method == 'DELETE' and status == 404 and len(chunk) == 1:
+            # Déjà supprimé : la suppression est idempotente
+            return [(chunk[0][0], True, None)]
+        
+        # Netbox est transactionnel : un lot rejeté n'a rien écrit
+        if status == 400 and isinstance(payload, list) and len(payload) == len(chunk) and any(payload):
+            failed = [(index, False, error) for (index, _), error in zip(chunk, payload) if error]
+            valid = [item for item, error in zip(chunk, payload) if not error]
+            if valid:
+                return failed + self._write_chunk(method, endpoint, valid, idempotent, report)
+            return failed
+        
+        if status in (400, 404, 409) and len(chunk) > 1:
+            # Erreur globale : scinder le lot en deux pour isoler les objets fautifs
+            middle = len(chunk) // 2
+            return (self._write_chunk(method, endpoint, chunk[:middle], idempotent, report) +
+                    self._write_chunk(method, endpoint, chunk[middle:], idempotent, report))
+        
+        error = f"HTTP {status}: {payload}" if status is not None else payload
+        return [(index, False, error) for index, _ in chunk]
+    
+    def _bulk_write(self, operation, method, endpoint, objects, idempotent):
+        """Écrit des objets par lots concurrents et retourne un BulkReport"""
+        objects = list(objects)
+        report = BulkReport(operation, objects)
+        started = time.monotonic()
+        
+        chunks = list(self._chunks(enumerate(objects)))
+        write = lambda chunk: self._write_chunk(method, endpoint, chunk, idempotent, report)
+        for _, outcomes in self.run_concurrently(write, chunks):
+            report.record(outcomes)
+        
+        report.elapsed = time.monotonic() - started
+        return report
+    
+    def bulk_create(self, endpoint, objects):
+        """Crée des objets en masse (POST d'une liste sur l'endpoint)"""
+        return self._bulk_write('Création', 'POST', endpoint, objects, idempotent=False)
+    
+    def bulk_update(self, endpoint, objects):
+        """Met à jour des objets en masse (PATCH d'une liste, chaque objet avec son 'id')"""
+        return self._bulk_write('Mise à jour', 'PATCH', endpoint, objects, idempotent=True)
+    
+    def bulk_delete(self, endpoint, ids):
+        """Supprime des objets en masse (DELETE d'une liste d'IDs)"""
+        objects = [{'id': i['id'] if isinstance(i, dict) else i} for i in ids]
+        return self._bulk_write('Suppression', 'DELETE', endpoint, objects, idempotent=True)
     
     def test_connection(self):
         """Test la connexion à l'API Netbox"""
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Bilan électrique calculé localement : alimentations, tableaux et racks
+
+La puissance d'une alimentation se calcule comme dans Netbox :
+tension × ampérage × utilisation max (× √3 en triphasé). La consommation d'un
+port d'alimentation est la somme des ports branchés sur les prises de son
+équipement (PDU), sinon ses propres valeurs allouée et maximale. Tout est
+agrégé en une passe sur les ports chargés, sans requête par objet.
+"""
+
+import math
+
+FEED = 'dcim.powerfeed'
+OUTLET = 'dcim.poweroutlet'
+
+
+def feed_capacity(feed):
+    """Puissance disponible d'une alimentation en watts"""
+    voltage = abs(feed.get('voltage') or 0)
+    amperage = feed.get('amperage') or 0
+    max_utilization = feed.get('max_utilization') or 100
+    capacity = voltage * amperage * max_utilization / 100
+    phase = feed.get('phase') or {}
+    if (phase.get('value') if isinstance(phase, dict) else phase) == 'three-phase':
+        capacity *= math.sqrt(3)
+    return capacity
+
+
+def _upstream(port):
+    """(type, id) de l'objet amont d'un port : pair de câble, sinon extrémité du chemin"""
+    for type_field, peers_field in (('link_peers_type', 'link_peers'),
+                                    ('connected_endpoints_type', 'connected_endpoints')):
+        peers = port.get(peers_field)
+        if port.get(type_field) and peers:
+            return port[type_field], peers[0]['id']
+    return None, None
+
+
+class PowerLoad:
+    """Consommation cumulée (allouée, maximale) d'une alimentation, d'un tableau ou d'un rack"""
+
+    __slots__ = ('capacity', 'allocated', 'maximum', 'ports')
+
+    def __init__(self, capacity=0.0):
+        self.capacity = capacity
+        self.allocated = 0
+        self.maximum = 0
+        self.ports = 0
+
+    def add(self, allocated, maximum, ports=1):
+        self.allocated += allocated
+        self.maximum += maximum
+        self.ports += ports
+
+    def utilization(self):
+        return self.allocated / self.capacity * 100 if self.capacity else 0.0
+
+    @property
+    def overcommitted(self):
+        return self.capacity > 0 and self.allocated > self.capacity
+
+    @property
+    def at_risk(self):
+        """Consommation maximale au-delà de la capacité (allouée encore dans les limites)"""
+        return self.capacity > 0 and self.maximum > self.capacity >= self.allocated
+
+
+def compute_budget(feeds, ports, outlets):
+    """Agrège la consommation par alimentation, tableau et rack
+
+    Retourne (charges par ID d'alimentation, par ID de tableau, par ID de rack).
+    """
+    feeds = list(feeds)
+    outlet_inlet = {outlet['id']: outlet['power_port']['id'] for outlet in outlets if outlet.get('power_port')}
+
+    # Port amont -> ports branchés sur ses prises ; alimentation -> ports raccordés
+    children, on_feed, draws = {}, {}, {}
+    for port in ports:
+        draws[port['id']] = (port.get('allocated_draw') or 0, port.get('maximum_draw') or 0)
+        upstream_type, upstream_id = _upstream(port)
+        if upstream_type == OUTLET and upstream_id in outlet_inlet:
+            children.setdefault(outlet_inlet[upstream_id], []).append(port['id'])
+        elif upstream_type == FEED:
+            on_feed.setdefault(upstream_id, []).append(port['id'])
+
+    # Consommation effective, des feuilles vers la racine (chaînes de PDU comprises)
+    effective = {}
+
+    def resolve(port_id):
+        stack, visiting = [port_id], {port_id}
+        while stack:
+            current = stack[-1]
+            # Les ports déjà en cours de visite (branchement en boucle) comptent pour zéro
+            pending = [c for c in children.get(current, ()) if c not in effective and c not in visiting]
+            if pending:
+                visiting.update(pending)
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if current in children:
+                effective[current] = tuple(sum(effective.get(c, (0, 0))[i] for c in children[current]) for i in (0, 1))
+            else:
+                effective[current] = draws.get(current, (0, 0))
+        return effective[port_id]
+
+    by_feed, by_panel, by_rack = {}, {}, {}
+    for feed in feeds:
+        load = by_feed[feed['id']] = PowerLoad(feed_capacity(feed))
+        for port_id in on_feed.get(feed['id'], ()):
+            load.add(*resolve(port_id))
+
+        groups = []
+        if feed.get('power_panel'):
+            groups.append(by_panel.setdefault(feed['power_panel']['id'], PowerLoad()))
+        if feed.get('rack'):
+            groups.append(by_rack.setdefault(feed['rack']['id'], PowerLoad()))
+        for group in groups:
+            group.capacity += load.capacity
+            group.add(load.allocated, load.maximum, load.ports)
+
+    return by_feed, by_panel, by_rack
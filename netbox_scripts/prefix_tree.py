@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Hiérarchie des préfixes IP construite localement en une seule passe
+
+Les préfixes sont triés par (famille, début, longueur) puis empilés : le
+sommet de pile qui contient le préfixe courant est son parent. L'utilisation
+est ensuite agrégée des feuilles vers la racine sans autre requête.
+"""
+
+import ipaddress
+import ip_arrays
+import ip_overlaps
+
+
+class PrefixNode:
+    """Nœud de l'arbre des préfixes"""
+
+    __slots__ = ('prefix', 'network', 'children', 'depth', 'direct_ips', 'ip_count', 'allocated')
+
+    def __init__(self, prefix, network, depth):
+        self.prefix = prefix
+        self.network = network
+        self.children = []
+        self.depth = depth
+        self.direct_ips = 0     # Adresses dont c'est le préfixe le plus spécifique
+        self.ip_count = 0       # Adresses du sous-arbre complet
+        self.allocated = 0      # Adresses couvertes par les enfants ou des IPs directes
+
+    @property
+    def utilization(self):
+        return self.allocated / self.network.num_addresses * 100
+
+    def descendants(self):
+        """Nombre total de sous-préfixes (parcours itératif)"""
+        count, stack = 0, list(self.children)
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+
+def build_tree(prefixes, ip_records=()):
+    """Construit la forêt des préfixes, par VRF, avec l'utilisation agrégée
+
+    Retourne {nom du VRF: [racines]}. Une seule passe de pile sur les préfixes
+    triés, puis une passe en ordre inverse pour remonter les compteurs.
+    """
+    prefixes = list(prefixes)
+    entries = []
+    for index, prefix in enumerate(prefixes):
+        network = ipaddress.ip_network(prefix['prefix'], strict=False)
+        vrf = prefix['vrf']['name'] if prefix.get('vrf') else 'Global'
+        entries.append((vrf, network.version, int(network.network_address), network.prefixlen, index, network))
+    entries.sort(key=lambda entry: entry[:5])
+
+    forest, nodes, order = {}, [None] * len(prefixes), []
+    stack, current_vrf = [], None
+
+    for vrf, _, start, _, index, network in entries:
+        if (vrf, network.version) != current_vrf:
+            stack, current_vrf = [], (vrf, network.version)
+
+        # Dépiler les préfixes qui ne contiennent pas le préfixe courant
+        while stack and int(stack[-1].network.broadcast_address) < start:
+            stack.pop()
+
+        parent = stack[-1] if stack else None
+        node = PrefixNode(prefixes[index], network, parent.depth + 1 if parent else 0)
+        if parent:
+            parent.children.append(node)
+        else:
+            forest.setdefault(vrf, []).append(node)
+
+        stack.append(node)
+        nodes[index] = node
+        order.append(node)
+
+    # Rattacher chaque adresse à son préfixe le plus spécifique
+    tables, _ = ip_overlaps.index_prefixes(prefixes)
+    for ips in ip_arrays.from_records(ip_records):
+        for owner in ip_overlaps.deepest_prefix(ips, tables):
+            if owner >= 0:
+                nodes[owner].direct_ips += 1
+
+    # Agrégation des feuilles vers la racine (ordre de tri inversé)
+    for node in reversed(order):
+        node.ip_count += node.direct_ips
+        node.allocated = sum(child.network.num_addresses for child in node.children) + node.direct_ips
+        for child in node.children:
+            node.ip_count += child.ip_count
+
+    return forest
+
+
+def find_node(forest, cidr):
+    """Retrouve le nœud d'un préfixe donné dans la forêt"""
+    network = ipaddress.ip_network(cidr, strict=False)
+    for roots in forest.values():
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node.network == network:
+                return node
+            if node.network.version == network.version and network.subnet_of(node.network):
+                stack.extend(node.children)
+    return None
+
+
+def _bar(percent, width=10):
+    filled = min(width, int(round(percent / 100 * width)))
+    return '█' * filled + '░' * (width - filled)
+
+
+def iter_lines(roots, max_depth=None):
+    """Génère les lignes de l'arbre au fil du parcours (rendu incrémental)
+
+    Les nœuds au-delà de max_depth (relatif aux racines données) sont repliés
+    avec le nombre de sous-préfixes masqués.
+    """
+    base_depth = roots[0].depth if roots else 0
+    stack = [(node, '', i == len(roots) - 1) for i, node in reversed(list(enumerate(roots)))]
+
+    while stack:
+        node, indent, last = stack.pop()
+        prefix = node.prefix
+        branch = '└── ' if last else '├── '
+        status = prefix['status']['label'] if prefix.get('status') else 'N/A'
+        line = (f"{indent}{branch}{node.network}  [{status}]  {_bar(node.utilization)} "
+                f"{node.utilization:5.1f}%  ({node.ip_count} IP)")
+        if prefix.get('description'):
+            line += f"  {prefix['description'][:40]}"
+
+        relative_depth = node.depth - base_depth
+        if node.children and max_depth is not None and relative_depth >= max_depth:
+            line += f"  ▸ +{node.descendants()} sous-préfixe(s)"
+            yield line
+            continue
+
+        yield line
+        child_indent = indent + ('    ' if last else '│   ')
+        for i in range(len(node.children) - 1, -1, -1):
+            stack.append((node.children[i], child_indent, i == len(node.children) - 1))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Calcul local de l'occupation des racks à partir d'un chargement unique
+
+Chaque rack est représenté par un bitmap d'occupation par face au demi-U près
+(Netbox accepte des positions en 0.5U) : un équipement pleine profondeur occupe
+les deux faces, un équipement demi-profondeur seulement la sienne. Le nombre de requêtes est constant quel que
+soit le nombre de racks : racks, équipements et types d'équipements.
+
+Depuis un instantané binaire, les positions des équipements arrivent en
+colonnes : l'occupation est alors calculée de façon vectorisée sur un tableau
+de demi-unités couvrant tous les racks, sans boucle par équipement.
+"""
+
+import numpy as np
+
+from vlan_map import bit_runs
+
+
+FACES = ('front', 'rear')
+
+
+class RackOccupancy:
+    """Occupation d'un rack : un bit par demi-unité et par face
+
+    Une demi-unité est comptée occupée dès qu'une face l'est ; overlaps
+    compte les équipements partageant au moins une demi-unité d'une même face
+    avec un autre (les deux équipements d'une collision sont comptés).
+    """
+
+    def __init__(self, rack):
+        self.rack = rack
+        self.u_height = rack.get('u_height') or 0
+        self.starting_unit = rack.get('starting_unit') or 1
+        self.slots = int(self.u_height * 2)
+        self.front = 0
+        self.rear = 0
+        self.devices = 0
+        self.overlaps = 0
+        self.placed = []        # (masque, faces) de chaque équipement placé
+        self.colliding = set()  # indices dans placed des équipements en chevauchement
+
+    def place(self, position, u_height, face=None, full_depth=True):
+        """Place un équipement de u_height U à partir de la position donnée"""
+        start = int(round((float(position) - self.starting_unit) * 2))
+        length = int(round(float(u_height) * 2))
+        if length <= 0 or start < 0 or start >= self.slots:
+            return
+        length = min(length, self.slots - start)
+        mask = ((1 << length) - 1) << start
+        faces = FACES if full_depth or face not in FACES else (face,)
+        if any(getattr(self, f) & mask for f in faces):
+            self.colliding.add(len(self.placed))
+            self.colliding.update(i for i, (other, other_faces) in enumerate(self.placed)
+                                  if other & mask and set(faces) & set(other_faces))
+            self.overlaps = len(self.colliding)
+        for f in faces:
+            setattr(self, f, getattr(self, f) | mask)
+        self.placed.append((mask, faces))
+        self.devices += 1
+
+    @property
+    def bits(self):
+        return self.front | self.rear
+
+    @property
+    def free_bits(self):
+        return ~self.bits & ((1 << self.slots) - 1)
+
+    def used_units(self):
+        return bin(self.bits).count('1') / 2
+
+    def free_units(self):
+        return self.u_height - self.used_units()
+
+    def largest_free_block(self):
+        """Plus grand bloc contigu libre, en U"""
+        runs = bit_runs(self.free_bits)
+        return max((end - start + 1 for start, end in runs), default=0) / 2
+
+    def fragmentation(self):
+        """Part de l'espace libre hors du plus grand bloc (0 = d'un seul tenant)"""
+        free = self.free_units()
+        return 1 - self.largest_free_block() / free if free else 0.0
+
+
+def compute_occupancy(racks, devices, device_types):
+    """Construit l'occupation de tous les racks en une passe sur les équipements"""
+    heights = {dt['id']: dt.get('u_height', 1) for dt in device_types}
+    full_depth = {dt['id']: dt.get('is_full_depth', True) for dt in device_types}
+    occupancy = {rack['id']: RackOccupancy(rack) for rack in racks}
+
+    for device in devices:
+        rack = device.get('rack')
+        if not rack or device.get('position') is None or rack['id'] not in occupancy:
+            continue
+        device_type = device['device_type']['id'] if device.get('device_type') else None
+        face = device['face']['value'] if device.get('face') else None
+        occupancy[rack['id']].place(device['position'], heights.get(device_type, 1), face,
+                                    full_depth.get(device_type, True))
+
+    return occupancy
+
+
+def occupancy_from_columns(racks, device_rack, device_position, device_height, device_front=None, device_rear=None):
+    """Occupation des racks depuis des colonnes d'équipements (ID de rack, position, hauteur)
+
+    device_front et device_rear indiquent les faces occupées par chaque
+    équipement (les deux par défaut, comme un équipement pleine profondeur).
+    """
+    occupancy = {rack['id']: RackOccupancy(rack) for rack in racks}
+    entries = list(occupancy.values())
+    if not entries:
+        return occupancy
+
+    rack_ids = np.array([o.rack['id'] for o in entries], dtype=np.int64)
+    order = np.argsort(rack_ids)
+    slots = np.array([o.slots for o in entries], dtype=np.int64)
+    starting = np.array([o.starting_unit for o in entries], dtype=np.float64)
+    base = np.concatenate(([0], np.cumsum(slots)))
+    everywhere = np.ones(len(device_rack), dtype=bool)
+    front = everywhere if device_front is None else np.asarray(device_front, dtype=bool)
+    rear = everywhere if device_rear is None else np.asarray(device_rear, dtype=bool)
+
+    # Rack de chaque équipement (indice dans entries), équipements non placés écartés
+    position = np.clip(np.searchsorted(rack_ids[order], device_rack), 0, len(entries) - 1)
+    rack = order[position]
+    valid = (rack_ids[rack] == device_rack) & ~np.isnan(device_position)
+
+    start = np.rint((device_position - starting[rack]) * 2)
+    length = np.rint(device_height * 2)
+    valid &= (length > 0) & (start >= 0) & (start < slots[rack])
+    rack, start, length = rack[valid], start[valid].astype(np.int64), length[valid].astype(np.int64)
+    front, rear = front[valid], rear[valid]
+    length = np.minimum(length, slots[rack] - start)
+
+    # Couverture de chaque demi-unité par face, par différences cumulées ; un
+    # équipement est en chevauchement si une demi-unité de ses faces est couverte
+    # plusieurs fois (comptage cumulé des demi-unités surchargées sur son étendue)
+    begin = base[rack] + start
+    end = begin + length
+    size = int(base[-1]) + 1
+    colliding = np.zeros(len(rack), dtype=bool)
+    coverage = {}
+    for face, selected in (('front', front), ('rear', rear)):
+        counts = np.bincount(begin[selected], minlength=size) - np.bincount(end[selected], minlength=size)
+        coverage[face] = np.cumsum(counts)[:-1]
+        crowded = np.concatenate(([0], np.cumsum(coverage[face] > 1)))
+        colliding |= selected & (crowded[end] > crowded[begin])
+    devices = np.bincount(rack, minlength=len(entries))
+    overlaps = np.bincount(rack[colliding], minlength=len(entries))
+
+    for i, entry in enumerate(entries):
+        for face in FACES:
+            segment = coverage[face][base[i]:base[i + 1]]
+            setattr(entry, face, int.from_bytes(np.packbits(segment > 0, bitorder='little').tobytes(), 'little'))
+        entry.overlaps = int(overlaps[i])
+        entry.devices = int(devices[i])
+    return occupancy
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Réconciliation d'un état désiré (CSV, JSON ou YAML) avec Netbox
+
+L'état courant est lu en une passe puis indexé par clé naturelle avec une
+empreinte du contenu ; seules les clés dont l'empreinte diffère produisent une
+écriture. Un fichier inchangé ne coûte donc que la lecture de l'instantané.
+"""
+
+import csv
+import hashlib
+import json
+from pathlib import Path
+
+from aggregation import path_getter
+
+# Définition des types réconciliables :
+#   key    : champs formant la clé naturelle
+#   fields : champ du fichier -> (chemin dans l'objet Netbox, endpoint de référence)
+OBJECT_TYPES = {
+    'devices': {
+        'endpoint': '/dcim/devices/',
+        'key': ('site', 'name'),
+        'fields': {
+            'name': ('name', None),
+            'site': ('site.name', '/dcim/sites/'),
+            'role': ('role.name', '/dcim/device-roles/'),
+            'device_type': ('device_type.model', '/dcim/device-types/'),
+            'platform': ('platform.name', '/dcim/platforms/'),
+            'tenant': ('tenant.name', '/tenancy/tenants/'),
+            'status': ('status.value', None),
+            'serial': ('serial', None),
+            'asset_tag': ('asset_tag', None),
+            'description': ('description', None),
+        },
+    },
+    'interfaces': {
+        'endpoint': '/dcim/interfaces/',
+        'key': ('device', 'name'),
+        'fields': {
+            'device': ('device.name', '/dcim/devices/'),
+            'name': ('name', None),
+            'type': ('type.value', None),
+            'enabled': ('enabled', None),
+            'mtu': ('mtu', None),
+            'mode': ('mode.value', None),
+            'mac_address': ('mac_address', None),
+            'description': ('description', None),
+        },
+    },
+    'ip-addresses': {
+        'endpoint': '/ipam/ip-addresses/',
+        'key': ('vrf', 'address'),
+        'fields': {
+            'address': ('address', None),
+            'vrf': ('vrf.name', '/ipam/vrfs/'),
+            'tenant': ('tenant.name', '/tenancy/tenants/'),
+            'status': ('status.value', None),
+            'role': ('role.value', None),
+            'dns_name': ('dns_name', None),
+            'description': ('description', None),
+        },
+    },
+    'vlans': {
+        'endpoint': '/ipam/vlans/',
+        'key': ('site', 'group', 'vid'),
+        'fields': {
+            'vid': ('vid', None),
+            'name': ('name', None),
+            'site': ('site.name', '/dcim/sites/'),
+            'group': ('group.name', '/ipam/vlan-groups/'),
+            'tenant': ('tenant.name', '/tenancy/tenants/'),
+            'status': ('status.value', None),
+            'description': ('description', None),
+        },
+    },
+}
+
+
+def load_desired(path):
+    """Charge un fichier d'état désiré (liste d'objets) selon son extension"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if suffix == '.csv':
+            return list(csv.DictReader(f))
+        if suffix == '.json':
+            data = json.load(f)
+        elif suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML est requis pour les fichiers YAML (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Format non supporté: {suffix} (csv, json, yaml)")
+
+    # Accepter une liste ou un objet {"objects": [...]}
+    if isinstance(data, dict):
+        data = data.get('objects', [])
+    return data or []
+
+
+def normalize(value):
+    """Forme canonique d'une valeur pour la comparaison (fichier comme API)"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    return text.lower() if text.lower() in ('true', 'false') else text
+
+
+def content_hash(values):
+    """Empreinte stable d'un ensemble de champs normalisés"""
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def index_current(records, spec, fields):
+    """Indexe l'instantané Netbox : clé naturelle -> [(id, empreinte, valeurs), ...]
+    
+    Plusieurs objets peuvent partager une clé (ex: équipements sans nom) ; ils
+    sont tous conservés afin que build_plan refuse de choisir entre eux.
+    """
+    getters = {field: path_getter(spec['fields'][field][0], None) for field in set(fields) | set(spec['key'])}
+    index = {}
+    for record in records:
+        values = {field: normalize(getters[field](record)) for field in fields}
+        key = tuple(normalize(getters[k](record)) for k in spec['key'])
+        index.setdefault(key, []).append((record['id'], content_hash(values), values))
+    return index
+
+
+def parse_scope(filters, spec):
+    """Convertit des filtres 'champ=valeur' en périmètre de suppression"""
+    scope = {}
+    for item in filters or []:
+        field, sep, value = item.partition('=')
+        if not sep or field not in spec['fields']:
+            raise ValueError(f"Filtre de périmètre invalide: '{item}' (champ=valeur, champs: "
+                             f"{', '.join(spec['fields'])})")
+        scope[field] = normalize(value)
+    return scope
+
+
+def build_plan(desired, current, spec, prune_scope=None):
+    """Calcule le plan minimal : créations, mises à jour (champs modifiés) et suppressions
+    
+    Les suppressions ne portent que sur les objets correspondant à tous les
+    filtres de prune_scope ; sans périmètre explicite, rien n'est supprimé.
+    """
+    plan = {'create': [], 'update': [], 'delete': [], 'unchanged': 0}
+    seen = set()
+    ambiguous = []
+
+    for record in desired:
+        values = {field: normalize(record.get(field)) for field in record if field in spec['fields']}
+        key = tuple(normalize(record.get(k)) for k in spec['key'])
+        seen.add(key)
+
+        existing = current.get(key)
+        if not existing:
+            plan['create'].append(record)
+            continue
+        if len(existing) > 1:
+            ambiguous.append((key, existing))
+            continue
+
+        object_id, digest, current_values = existing[0]
+        if content_hash(values) == digest:
+            plan['unchanged'] += 1
+            continue
+
+        # Empreintes différentes (ou champs absents de cet objet) : comparer champ à champ
+        changes = {field: record[field] for field in values if values[field] != current_values.get(field)}
+        if changes:
+            plan['update'].append({'id': object_id, 'key': list(key), 'changes': changes})
+        else:
+            plan['unchanged'] += 1
+
+    if prune_scope:
+        plan['delete'] = [{'id': object_id, 'key': list(key)}
+                          for key, entries in current.items() if key not in seen
+                          for object_id, _, values in entries
+                          if all(values.get(field) == value for field, value in prune_scope.items())]
+
+    if ambiguous:
+        details = '; '.join(f"{'/'.join(key)} (ids {', '.join(str(entry[0]) for entry in entries)})"
+                            for key, entries in ambiguous[:5])
+        raise ValueError(f"{len(ambiguous)} clé(s) naturelle(s) partagée(s) par plusieurs objets "
+                         f"Netbox, plan refusé: {details}")
+    return plan
+
+
+class ReferenceResolver:
+    """Résout les noms de références en IDs, un chargement par endpoint au besoin"""
+
+    def __init__(self, client, spec):
+        self.client = client
+        self.spec = spec
+        self.tables = {}
+
+    def resolve(self, field, value):
+        path, endpoint = self.spec['fields'][field]
+        if endpoint is None:
+            return value
+        if value in (None, ''):
+            return None
+
+        if endpoint not in self.tables:
+            # Un nom peut désigner plusieurs objets (ex: modèle chez deux constructeurs)
+            attribute = path.split('.')[-1]
+            table = {}
+            for obj in self.client.iter_all(endpoint):
+                table.setdefault(normalize(obj.get(attribute)), []).append(obj['id'])
+            self.tables[endpoint] = table
+        object_ids = self.tables[endpoint].get(normalize(value))
+        if not object_ids:
+            raise ValueError(f"{field} '{value}' introuvable")
+        if len(object_ids) > 1:
+            raise ValueError(f"{field} '{value}' ambigu: {len(object_ids)} objets portent ce nom "
+                             f"(ids {', '.join(str(i) for i in object_ids)})")
+        return object_ids[0]
+
+    def payload(self, values):
+        """Convertit des champs du fichier en charge utile d'écriture Netbox"""
+        payload = {}
+        for field, value in values.items():
+            if field not in self.spec['fields']:
+                continue
+            target = self.spec['fields'][field][0].split('.')[0]
+            value = self.resolve(field, value)
+            payload[target] = None if value == '' else value
+        return payload
+
+
+def apply_plan(client, spec, plan):
+    """Applique un plan par écritures groupées ; retourne les rapports et les erreurs locales"""
+    resolver = ReferenceResolver(client, spec)
+    reports, errors = [], []
+
+    creates = []
+    for record in plan['create']:
+        try:
+            creates.append(resolver.payload(record))
+        except ValueError as e:
+            errors.append((record, str(e)))
+
+    updates = []
+    for update in plan['update']:
+        try:
+            updates.append({'id': update['id'], **resolver.payload(update['changes'])})
+        except ValueError as e:
+            errors.append((update, str(e)))
+
+    if creates:
+        reports.append(client.bulk_create(spec['endpoint'], creates))
+    if updates:
+        reports.append(client.bulk_update(spec['endpoint'], updates))
+    if plan['delete']:
+        reports.append(client.bulk_delete(spec['endpoint'], [d['id'] for d in plan['delete']]))
+
+    return reports, errors
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Instantané complet de l'inventaire dans une archive unique, avec reprise
+
+Chaque type d'objet est paginé par ordre d'ID (id__gt) dans son propre
+fichier NDJSON ; chaque page y est ajoutée comme un membre gzip indépendant
+puis un point de reprise (dernier ID écrit) est enregistré. Après une
+interruption, le fichier est tronqué au dernier point de reprise et l'export
+repart de l'ID suivant. Les types sont exportés en parallèle, puis rassemblés dans une
+archive tar avec un manifeste (nombres d'objets, tailles, sha256).
+
+Deux archives se comparent par jointure par fusion sur les IDs triés, en
+flux : la mémoire utilisée ne dépend pas du nombre d'objets.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+from datetime import datetime
+from pathlib import Path
+
+import exporters
+
+MANIFEST = 'manifest.json'
+FORMAT = 'ndjson.gz'
+
+
+def data_file(data_type):
+    return f"{data_type}.{FORMAT}"
+
+
+def _write_json(path, data):
+    """Écriture atomique (fichier temporaire puis renommage)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return None
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_type(client, data_type, workdir, page_size=1000, on_page=None):
+    """Exporte un type page par page, en reprenant au dernier point de reprise
+
+    Retourne l'état final du point de reprise (last_id, count, pages, bytes, done).
+    """
+    endpoint = exporters.EXPORT_TYPES[data_type]['endpoint']
+    path = Path(workdir) / data_file(data_type)
+    checkpoint_path = Path(workdir) / f"{data_type}.checkpoint.json"
+
+    state = _read_json(checkpoint_path)
+    if not state or 'last_id' not in state:
+        state = {'last_id': 0, 'count': 0, 'pages': 0, 'bytes': 0, 'done': False}
+    if state['done']:
+        return state
+
+    # Écarter une page écrite après le dernier point de reprise
+    with open(path, 'ab') as f:
+        f.truncate(state['bytes'])
+
+    for page in client.iter_pages(endpoint, {'limit': page_size, 'id__gt': state['last_id']}, keyset=True):
+        results = page.get('results', [])
+        if results:
+            lines = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in results)
+            member = gzip.compress(lines.encode('utf-8'))
+            with open(path, 'ab') as f:
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+
+            state['last_id'] = results[-1]['id']
+            state['count'] += len(results)
+            state['pages'] += 1
+            state['bytes'] += len(member)
+        state['total'] = page.get('count')
+        state['done'] = not page.get('next')
+        _write_json(checkpoint_path, state)
+
+        if on_page:
+            on_page(data_type, state)
+    return state
+
+
+def create_snapshot(client, output, types, page_size=1000, max_workers=None, on_page=None):
+    """Exporte les types en parallèle puis construit l'archive ; retourne le manifeste
+
+    Les fichiers de travail sont dans '<output>.partial' : relancer la même
+    commande reprend là où l'export s'était arrêté.
+    """
+    workdir = Path(f"{output}.partial")
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    started = _read_json(workdir / 'started.json')
+    if not started:
+        started = {'created': datetime.now().isoformat(timespec='seconds'), 'types': list(types)}
+        _write_json(workdir / 'started.json', started)
+
+    states = {}
+    for data_type, state in client.run_concurrently(
+            lambda t: export_type(client, t, workdir, page_size, on_page), started['types'], max_workers):
+        states[data_type] = state
+
+    manifest = {
+        'created': started['created'],
+        'completed': datetime.now().isoformat(timespec='seconds'),
+        'netbox_url': client.base_url,
+        'format': FORMAT,
+        'types': {},
+    }
+    for data_type in started['types']:
+        path = workdir / data_file(data_type)
+        manifest['types'][data_type] = {
+            'endpoint': exporters.EXPORT_TYPES[data_type]['endpoint'],
+            'file': data_file(data_type),
+            'count': states[data_type]['count'],
+            'pages': states[data_type]['pages'],
+            'bytes': path.stat().st_size,
+            'sha256': sha256_file(path),
+        }
+    _write_json(workdir / MANIFEST, manifest)
+
+    # Les membres sont déjà compressés : archive tar sans recompression
+    tmp = f"{output}.tmp"
+    with tarfile.open(tmp, 'w') as archive:
+        archive.add(workdir / MANIFEST, arcname=MANIFEST)
+        for data_type in started['types']:
+            archive.add(workdir / data_file(data_type), arcname=data_file(data_type))
+    os.replace(tmp, output)
+    shutil.rmtree(workdir)
+    return manifest
+
+
+def read_manifest(archive_path):
+    with tarfile.open(archive_path, 'r') as archive:
+        return json.load(archive.extractfile(MANIFEST))
+
+
+# Champs ignorés à la comparaison : dérivés ou modifiés à chaque écriture
+IGNORED_FIELDS = {'url', 'display', 'last_updated'}
+
+
+def iter_records(archive, data_type):
+    """Objets d'un type dans une archive ouverte, en flux (ordre des IDs)"""
+    member = archive.extractfile(data_file(data_type))
+    with gzip.open(member, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _canonical(value):
+    """Forme comparable d'une valeur : objets imbriqués sans url/display"""
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if k not in IGNORED_FIELDS}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def record_hash(record):
+    """Empreinte du contenu comparable d'un objet et sa forme canonique"""
+    canonical = _canonical(record)
+    encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).digest(), canonical
+
+
+def field_deltas(old, new):
+    """Champs de premier niveau modifiés : {champ: (ancienne, nouvelle valeur)}"""
+    return {field: (old.get(field), new.get(field))
+            for field in sorted(set(old) | set(new))
+            if old.get(field) != new.get(field)}
+
+
+def _ordered(records, data_type):
+    """Vérifie que les IDs sont strictement croissants (ni désordre ni doublon)"""
+    previous = None
+    for record in records:
+        if previous is not None and record['id'] <= previous:
+            raise ValueError(f"{data_type}: IDs non triés ou en double dans l'instantané "
+                             f"({previous} puis {record['id']})")
+        previous = record['id']
+        yield record
+
+
+def diff_records(old_records, new_records, data_type=''):
+    """Jointure par fusion sur les IDs triés de deux flux d'objets
+
+    Produit ('added', objet), ('removed', objet) et ('modified', nouvel objet,
+    deltas) ; seuls deux objets sont en mémoire à la fois.
+    """
+    old_iter = _ordered(old_records, data_type)
+    new_iter = _ordered(new_records, data_type)
+    old = next(old_iter, None)
+    new = next(new_iter, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old['id'] < new['id']):
+            yield 'removed', old, None
+            old = next(old_iter, None)
+        elif old is None or new['id'] < old['id']:
+            yield 'added', new, None
+            new = next(new_iter, None)
+        else:
+            old_hash, old_canonical = record_hash(old)
+            new_hash, new_canonical = record_hash(new)
+            if old_hash != new_hash:
+                yield 'modified', new, field_deltas(old_canonical, new_canonical)
+            old = next(old_iter, None)
+            new = next(new_iter, None)
+
+
+def diff_snapshots(old_path, new_path, types=None):
+    """Différences type par type entre deux archives ; produit (type, nature, objet, deltas)"""
+    with tarfile.open(old_path, 'r') as old_archive, tarfile.open(new_path, 'r') as new_archive:
+        old_types = json.load(old_archive.extractfile(MANIFEST))['types']
+        new_types = json.load(new_archive.extractfile(MANIFEST))['types']
+        for data_type in types or [t for t in new_types if t in old_types]:
+            if data_type not in old_types or data_type not in new_types:
+                continue
+            changes = diff_records(iter_records(old_archive, data_type), iter_records(new_archive, data_type), data_type)
+            for kind, record, deltas in changes:
+                yield data_type, kind, record, deltas
@@ -4,12 +4,20 @@ Scripts utilitaires pour Netbox CLI
 """
 
 import argparse
+import os
 import sys
+import tarfile
 import json
-import csv
+import time
 from datetime import datetime
 from tabulate import tabulate
 from netbox_client import create_client
+from config import get_cache_path
+import reconcile
+import exporters
+import snapshot
+import nbsnap
+import validation
 
 def global_search(client, search_term):
     """Recherche globale dans Netbox"""
@@ -193,198 +201,407 @@ def global_search(client, search_term):
             ])
         print(tabulate(rows, headers=headers, tablefmt='grid'))
 
-def export_data(client, data_type, output_format='csv', output_file=None):
-    """Exporte des données Netbox"""
+def export_data(client, data_type, output_format='csv', output_file=None, compression=None):
+    """Exporte des données Netbox en flux (mémoire bornée à une page)"""
     print(f"📤 Export des données: {data_type} en format {output_format}")
     
-    # Mapping des types de données vers les endpoints
-    endpoints = {
-        'devices': '/dcim/devices/',
-        'sites': '/dcim/sites/',
-        'racks': '/dcim/racks/',
-        'ip-addresses': '/ipam/ip-addresses/',
-        'prefixes': '/ipam/prefixes/',
-        'vlans': '/ipam/vlans/',
-        'circuits': '/circuits/circuits/',
-        'providers': '/circuits/providers/'
-    }
-    
-    if data_type not in endpoints:
+    if data_type not in exporters.EXPORT_TYPES:
         print(f"❌ Type de données non supporté: {data_type}")
-        print(f"Types disponibles: {', '.join(endpoints.keys())}")
+        print(f"Types disponibles: {', '.join(exporters.EXPORT_TYPES.keys())}")
+        return
+    
+    if output_format not in exporters.FORMATS:
+        print(f"❌ Format non supporté: {output_format}")
+        print(f"Formats disponibles: {', '.join(exporters.FORMATS)}")
         return
     
-    # Récupérer les données
-    data = client.get_all(endpoints[data_type])
+    spec = exporters.EXPORT_TYPES[data_type]
     
-    if not data:
+    # Nombre total pour la progression (une requête d'une ligne)
+    first = client.get(spec['endpoint'], {'limit': 1})
+    total = first['count'] if first else None
+    if not total:
         print(f"❌ Aucune donnée trouvée pour {data_type}")
         return
     
     # Nom du fichier par défaut
     if not output_file:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"netbox_{data_type}_{timestamp}.{output_format}"
+        # Les formats colonnaires compressent en interne : pas de suffixe
+        suffix = exporters.COMPRESSIONS.get(compression, '') if output_format in exporters.WRITERS else ''
+        output_file = f"netbox_{data_type}_{timestamp}.{output_format}{suffix}"
     
-    # Export selon le format
-    if output_format.lower() == 'json':
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    progress = exporters.Progress(data_type, total)
+    try:
+        count = exporters.write_records(client.iter_all(spec['endpoint']), output_file, output_format,
+                                        spec['schema'], compression, progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    progress.close()
     
-    elif output_format.lower() == 'csv':
-        if not data:
-            print("❌ Aucune donnée à exporter")
-            return
-        
-        # Extraire les clés communes
-        all_keys = set()
-        for item in data:
-            all_keys.update(item.keys())
-        
-        # Filtrer les clés complexes et garder les plus importantes
-        simple_keys = []
-        for key in sorted(all_keys):
-            if not isinstance(data[0].get(key), (dict, list)) or key in ['id', 'name', 'display']:
-                simple_keys.append(key)
-        
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=simple_keys)
-            writer.writeheader()
-            
-            for item in data:
-                # Simplifier les valeurs complexes
-                row = {}
-                for key in simple_keys:
-                    value = item.get(key, '')
-                    if isinstance(value, dict):
-                        if 'name' in value:
-                            value = value['name']
-                        elif 'display' in value:
-                            value = value['display']
-                        else:
-                            value = str(value)
-                    elif isinstance(value, list):
-                        value = ', '.join(str(v) for v in value)
-                    row[key] = value
-                writer.writerow(row)
+    print(f"✅ Export terminé: {count} enregistrements dans {output_file} ({progress.elapsed:.1f}s)")
+
+def create_snapshot(client, output_file=None, types=None, page_size=1000, workers=None):
+    """Instantané de tout l'inventaire dans une archive, exporté en parallèle et reprenable"""
+    types = types or list(exporters.EXPORT_TYPES)
+    unknown = [t for t in types if t not in exporters.EXPORT_TYPES]
+    if unknown:
+        print(f"❌ Type(s) non supporté(s): {', '.join(unknown)}")
+        return
+    
+    if not output_file:
+        output_file = f"netbox_snapshot_{datetime.now().strftime('%Y%m%d')}.tar"
     
+    if os.path.exists(f"{output_file}.partial"):
+        print(f"🔁 Reprise de l'instantané interrompu: {output_file}")
     else:
-        print(f"❌ Format non supporté: {output_format}")
-        print("Formats disponibles: json, csv")
-        return
+        print(f"📸 Instantané de {len(types)} type(s) vers {output_file}")
     
-    print(f"✅ Export terminé: {len(data)} enregistrements dans {output_file}")
+    def on_page(data_type, state):
+        if state['done']:
+            print(f"  ✅ {data_type}: {state['count']} objet(s) en {state['pages']} page(s)", file=sys.stderr)
+    
+    started = time.monotonic()
+    manifest = snapshot.create_snapshot(client, output_file, types, page_size, workers, on_page)
+    
+    headers = ['Type', 'Objets', 'Taille', 'SHA-256']
+    rows = [[data_type, entry['count'], f"{entry['bytes'] / 1024:,.1f} Ko", entry['sha256'][:16]]
+            for data_type, entry in manifest['types'].items()]
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
+    print(f"✅ Instantané terminé: {output_file} ({time.monotonic() - started:.1f}s)")
+
+def create_binary_snapshot(client, output_file, source=None, workers=None):
+    """Instantané binaire (.nbsnap) des objets principaux, depuis Netbox ou une archive"""
+    if not output_file:
+        output_file = f"netbox_inventory_{datetime.now().strftime('%Y%m%d')}.nbsnap"
+    
+    started = time.monotonic()
+    if source:
+        # Archive tar d'un instantané : lecture séquentielle des membres
+        print(f"📦 Conversion de {source} vers {output_file}")
+        with tarfile.open(source, 'r') as archive:
+            available = json.load(archive.extractfile(snapshot.MANIFEST))['types']
+            fetch = lambda data_type: snapshot.iter_records(archive, data_type) if data_type in available else None
+            header = nbsnap.build(output_file, fetch, meta={'source': source})
+        if 'device-types' not in available:
+            print("⚠️  Types d'équipements absents de l'archive: hauteur de 1U supposée", file=sys.stderr)
+    else:
+        print(f"📸 Instantané binaire de {client.base_url} vers {output_file}")
+        fetch = lambda data_type: client.iter_all(exporters.EXPORT_TYPES[data_type]['endpoint'])
+        run = lambda func, items: client.run_concurrently(func, items, workers)
+        header = nbsnap.build(output_file, fetch, run, meta={'source': client.base_url})
+    
+    rows = [[name, table['rows'], len(table['columns'])] for name, table in header['tables'].items()]
+    print(tabulate(rows, headers=['Table', 'Lignes', 'Colonnes'], tablefmt='grid'))
+    size = os.path.getsize(output_file)
+    print(f"✅ {output_file}: {size / 1024 / 1024:,.1f} Mo, {header['strings']['count']} chaîne(s) "
+          f"({time.monotonic() - started:.1f}s)")
 
-def netbox_status(client):
-    """Affiche le statut général de Netbox"""
+def _short_value(value):
+    """Rendu compact d'une valeur de delta (objet imbriqué -> son nom)"""
+    if isinstance(value, dict):
+        for key in ('name', 'value', 'address', 'cid', 'id'):
+            if key in value:
+                return str(value[key])
+    if isinstance(value, list):
+        return '[' + ', '.join(_short_value(v) for v in value) + ']'
+    return 'N/A' if value is None else str(value)[:40]
+
+def diff_snapshots(old_file, new_file, types=None, output_format='table', limit=20):
+    """Différences entre deux instantanés, par jointure triée en flux"""
+    log = sys.stdout if output_format == 'table' else sys.stderr
+    print(f"🔍 Comparaison: {old_file} → {new_file}", file=log)
+    
+    counts = {}
+    shown = {}
+    rows = []
+    for data_type, kind, record, deltas in snapshot.diff_snapshots(old_file, new_file, types):
+        type_counts = counts.setdefault(data_type, {'added': 0, 'removed': 0, 'modified': 0})
+        type_counts[kind] += 1
+        
+        if output_format == 'ndjson':
+            change = {'type': data_type, 'change': kind, 'id': record['id'],
+                      'name': record.get('display') or record.get('name')}
+            if deltas:
+                change['deltas'] = {field: {'old': old, 'new': new} for field, (old, new) in deltas.items()}
+            print(json.dumps(change, ensure_ascii=False, default=str))
+            continue
+        
+        # Table : seuls les premiers changements de chaque type sont détaillés
+        if shown.get(data_type, 0) >= limit:
+            continue
+        shown[data_type] = shown.get(data_type, 0) + 1
+        name = record.get('display') or record.get('name') or ''
+        details = '; '.join(f"{field}: {_short_value(old)} → {_short_value(new)}"
+                            for field, (old, new) in (deltas or {}).items())
+        symbol = {'added': '➕', 'removed': '➖', 'modified': '✏️ '}[kind]
+        rows.append([data_type, f"{symbol} {kind}", record['id'], str(name)[:30], details[:100]])
+    
+    if output_format == 'table' and rows:
+        print(f"\n📋 Changements (au plus {limit} par type):")
+        print(tabulate(rows, headers=['Type', 'Changement', 'ID', 'Nom', 'Champs modifiés'], tablefmt='grid'))
+    
+    summary = [[data_type, c['added'], c['removed'], c['modified']] for data_type, c in counts.items()]
+    if summary:
+        print(f"\n📊 Résumé:", file=log)
+        print(tabulate(summary, headers=['Type', 'Ajoutés', 'Supprimés', 'Modifiés'], tablefmt='grid'), file=log)
+    else:
+        print("✅ Aucune différence", file=log)
+
+# Types d'objets comptés par la commande status
+STATUS_OBJECTS = [
+    ('Sites', '/dcim/sites/'),
+    ('Équipements', '/dcim/devices/'),
+    ('Racks', '/dcim/racks/'),
+    ('Interfaces', '/dcim/interfaces/'),
+    ('Câbles', '/dcim/cables/'),
+    ('Préfixes IP', '/ipam/prefixes/'),
+    ('Adresses IP', '/ipam/ip-addresses/'),
+    ('VLANs', '/ipam/vlans/'),
+    ('VRFs', '/ipam/vrfs/'),
+    ('Circuits', '/circuits/circuits/'),
+    ('Fournisseurs', '/circuits/providers/')
+]
+
+def _collect_status(client):
+    """Statut de l'instance et nombre d'objets par type, toutes les requêtes en parallèle
+
+    Seul 'count' est utile : une page d'un objet en représentation brève suffit.
+    Le pool de connexions du client s'ajuste au nombre de requêtes simultanées.
+    Retourne (statut, {endpoint: nombre}, {endpoint: erreur}, durée).
+    """
+    def fetch(endpoint):
+        try:
+            if endpoint == '/status/':
+                return client.get(endpoint), None
+            response = client.get(endpoint, {'limit': 1, 'brief': 1})
+            if not response:
+                return None, "réponse invalide"
+            return response['count'], None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+    
+    endpoints = ['/status/'] + [endpoint for _, endpoint in STATUS_OBJECTS]
+    started = time.monotonic()
+    results = dict(client.run_concurrently(fetch, endpoints, len(endpoints)))
+    errors = {endpoint: error for endpoint, (_, error) in results.items() if error}
+    status, _ = results.pop('/status/')
+    counts = {endpoint: count for endpoint, (count, _) in results.items()}
+    return status, counts, errors, time.monotonic() - started
+
+def netbox_status(client, watch=None):
+    """Affiche le statut général de Netbox, rafraîchi toutes les watch secondes si demandé"""
     print("📊 Statut général de Netbox")
     print("=" * 40)
     
+    status, counts, errors, elapsed = _collect_status(client)
+    if not status:
+        print("❌ Impossible de récupérer le statut" + (f": {errors['/status/']}" if '/status/' in errors else ''))
+        return
+    
     # Informations sur l'instance
+    print("✅ Connexion à Netbox: OK")
+    if status.get('netbox-version'):
+        print(f"📦 Version Netbox: {status['netbox-version']}")
+    if status.get('python-version'):
+        print(f"🐍 Version Python: {status['python-version']}")
+    
+    previous = None
+    while True:
+        print(f"\n📈 Statistiques des objets ({datetime.now().strftime('%H:%M:%S')}, {elapsed * 1000:.0f} ms):")
+        
+        headers = ['Type d\'objet', 'Nombre']
+        stats = []
+        for name, endpoint in STATUS_OBJECTS:
+            count = counts.get(endpoint)
+            row = [name, count if count is not None else f"❌ Erreur: {errors.get(endpoint)}"]
+            if previous is not None:
+                # Évolution depuis le rafraîchissement précédent
+                before = previous.get(endpoint)
+                delta = count - before if count is not None and before is not None else 0
+                row.append(f"{'📈' if delta > 0 else '📉'} {delta:+,}" if delta else '')
+            stats.append(row)
+        if previous is not None:
+            headers.append('Évolution')
+        
+        print(tabulate(stats, headers=headers, tablefmt='grid'), flush=True)
+        if not watch:
+            return
+        
+        # Mode surveillance : nouvelle collecte après l'intervalle (Ctrl+C pour quitter)
+        time.sleep(watch)
+        previous = counts
+        _, counts, errors, elapsed = _collect_status(client)
+
+def list_validation_rules(client):
+    """Liste les règles de validation disponibles"""
     try:
-        status = client.get('/status/')
-        if status:
-            print("✅ Connexion à Netbox: OK")
-            if status.get('netbox-version'):
-                print(f"📦 Version Netbox: {status['netbox-version']}")
-            if status.get('python-version'):
-                print(f"🐍 Version Python: {status['python-version']}")
-        else:
-            print("❌ Impossible de récupérer le statut")
+        rules = validation.load_rules(client.config)
+    except (ImportError, ValueError) as e:
+        print(f"❌ Règles de validation invalides: {e}")
+        return
+    
+    rows = [[name, f"{validation.SEVERITY_ICONS[r.severity]} {r.severity}", ', '.join(r.tables), r.description]
+            for name, r in sorted(rules.items())]
+    print(tabulate(rows, headers=['Règle', 'Gravité', 'Tables', 'Description'], tablefmt='grid'))
+
+def validate_data(client, rule_names=None, output_format='table', output_file=None, min_severity=None, limit=20,
+                  incremental=False, rebuild=False):
+    """Validation des données par le moteur de règles (un chargement par type d'objet)
+    
+    En mode incrémental, seuls les objets modifiés depuis la validation
+    précédente sont relus et seules les règles concernées sont réévaluées.
+    """
+    # Constats JSON/CSV sur stdout : les messages passent sur stderr
+    log = sys.stdout if output_format == 'table' or output_file else sys.stderr
+    print("🔍 Validation des données Netbox", file=log)
+    print("=" * 40, file=log)
+    
+    try:
+        rules = validation.load_rules(client.config)
+    except (ImportError, ValueError) as e:
+        print(f"❌ Règles de validation invalides: {e}", file=log)
+        return
+    
+    if rule_names:
+        unknown = [name for name in rule_names if name not in rules]
+        if unknown:
+            print(f"❌ Règle(s) inconnue(s): {', '.join(unknown)}", file=log)
+            print(f"Règles disponibles: {', '.join(sorted(rules))}", file=log)
             return
-    except Exception as e:
-        print(f"❌ Erreur de connexion: {e}")
+        rules = {name: rules[name] for name in rule_names}
+    
+    started = time.monotonic()
+    try:
+        if incremental:
+            state = validation.ValidationState(get_cache_path(client.config, 'validation_state.json.gz'), client.base_url)
+            if not rebuild and state.load():
+                print(f"🔁 Validation incrémentale depuis le {state.saved_at}", file=log)
+            else:
+                print("📦 Pas d'état précédent: validation complète", file=log)
+            findings, failures, evaluated, fetched = validation.run_incremental(client, state, rules.values())
+            state.save()
+            
+            full = [name for name, count in fetched.items() if count is None]
+            touched = sum(count for count in fetched.values() if count is not None)
+            print(f"📦 {touched} objet(s) relu(s) depuis le filigrane" + (f", table(s) chargée(s) en entier: {', '.join(sorted(full))}" if full else "")
+                  + f" en {time.monotonic() - started:.1f}s", file=log)
+            print(f"🔄 {len(evaluated)} règle(s) réévaluée(s) sur {len(rules)}" + (f": {', '.join(sorted(evaluated))}" if evaluated else ""), file=log)
+        else:
+            tables = validation.load_tables(client, rules.values())
+            loaded = sum(len(table) for table in tables.values())
+            print(f"📦 {loaded} objet(s) chargé(s) dans {len(tables)} table(s) en {time.monotonic() - started:.1f}s", file=log)
+            findings, failures = validation.run_rules(client, rules.values(), tables)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=log)
         return
     
-    print(f"\n📈 Statistiques des objets:")
-    
-    # Compter les différents types d'objets
-    stats = []
-    
-    objects_to_count = [
-        ('Sites', '/dcim/sites/'),
-        ('Équipements', '/dcim/devices/'),
-        ('Racks', '/dcim/racks/'),
-        ('Interfaces', '/dcim/interfaces/'),
-        ('Câbles', '/dcim/cables/'),
-        ('Préfixes IP', '/ipam/prefixes/'),
-        ('Adresses IP', '/ipam/ip-addresses/'),
-        ('VLANs', '/ipam/vlans/'),
-        ('VRFs', '/ipam/vrfs/'),
-        ('Circuits', '/circuits/circuits/'),
-        ('Fournisseurs', '/circuits/providers/')
-    ]
+    for name, error in sorted(failures.items()):
+        print(f"❌ Règle {name} en échec: {error}", file=log)
+    
+    # Filtre de gravité minimale (error > warning > info)
+    allowed = validation.SEVERITIES[:validation.SEVERITIES.index(min_severity) + 1] if min_severity else validation.SEVERITIES
+    order = sorted(findings, key=lambda n: (validation.SEVERITIES.index(rules[n].severity), n))
+    results = [finding for name in order for finding in findings[name] if finding['severity'] in allowed]
     
-    for name, endpoint in objects_to_count:
+    if output_format != 'table':
+        stream = open(output_file, 'w', encoding='utf-8', newline='') if output_file else sys.stdout
         try:
-            response = client.get(endpoint)
-            count = response['count'] if response else 0
-            stats.append([name, count])
-        except:
-            stats.append([name, 'Erreur'])
+            writer = exporters.WRITERS[output_format](stream, validation.FINDING_SCHEMA)
+            for finding in results:
+                writer.write(finding)
+            writer.close()
+        finally:
+            if output_file:
+                stream.close()
+    
+    summary = []
+    for name in order:
+        if rules[name].severity in allowed and findings[name]:
+            summary.append([f"{validation.SEVERITY_ICONS[rules[name].severity]} {rules[name].severity}",
+                            name, len(findings[name]), rules[name].description])
+    
+    if not summary:
+        print("✅ Aucun problème détecté" if not failures else "⚠️  Aucun constat (règles en échec ci-dessus)", file=log)
+        return
     
-    print(tabulate(stats, headers=['Type d\'objet', 'Nombre'], tablefmt='grid'))
-
-def validate_data(client):
-    """Validation basique des données"""
-    print("🔍 Validation des données Netbox")
-    print("=" * 40)
+    print("⚠️  Problèmes détectés:", file=log)
+    print(tabulate(summary, headers=['Gravité', 'Règle', 'Objets', 'Description'], tablefmt='grid'), file=log)
     
-    issues = []
+    if output_format == 'table' and limit:
+        rows = [[validation.SEVERITY_ICONS[f['severity']], f['rule'], f['object'], f['message']] for f in results[:limit]]
+        print(f"\n📋 Détail ({min(limit, len(results))} sur {len(results)}):")
+        print(tabulate(rows, headers=['', 'Règle', 'Objet', 'Message'], tablefmt='grid'))
+    elif output_file:
+        print(f"✅ {len(results)} constat(s) dans {output_file}")
+
+def reconcile_state(client, data_type, desired_file, apply=False, prune=False, plan_output=None, scope=None):
+    """Compare un fichier d'état désiré à Netbox et applique le plan minimal"""
+    spec = reconcile.OBJECT_TYPES[data_type]
     
-    # Vérifier les équipements sans IP primaire
+    # Les suppressions exigent un périmètre explicite : celui déduit du fichier est trop large
     try:
-        devices = client.get_all('/dcim/devices/')
-        devices_without_ip = [d for d in devices if not d.get('primary_ip4') and not d.get('primary_ip6')]
-        if devices_without_ip:
-            issues.append(f"🔴 {len(devices_without_ip)} équipements sans IP primaire")
-    except:
-        issues.append("❌ Erreur lors de la vérification des équipements")
+        prune_scope = reconcile.parse_scope(scope, spec)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if prune and not prune_scope:
+        print("❌ --prune exige un périmètre explicite (ex: --scope site=Paris)")
+        return
+    print(f"🔄 Réconciliation {data_type} depuis {desired_file}")
     
-    # Vérifier les interfaces non connectées
     try:
-        interfaces = client.get('/dcim/interfaces/', {'connected': 'false'})
-        unconnected_count = interfaces['count'] if interfaces else 0
-        if unconnected_count > 0:
-            issues.append(f"🟡 {unconnected_count} interfaces non connectées")
-    except:
-        issues.append("❌ Erreur lors de la vérification des interfaces")
+        desired = reconcile.load_desired(desired_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ Lecture du fichier impossible: {e}")
+        return
     
-    # Vérifier les racks sans équipements
-    try:
-        racks = client.get_all('/dcim/racks/')
-        empty_racks = []
-        for rack in racks:
-            devices_in_rack = client.get('/dcim/devices/', {'rack_id': rack['id']})
-            if not devices_in_rack or devices_in_rack['count'] == 0:
-                empty_racks.append(rack)
-        
-        if empty_racks:
-            issues.append(f"🟡 {len(empty_racks)} racks vides")
-    except:
-        issues.append("❌ Erreur lors de la vérification des racks")
+    unknown = sorted({field for record in desired for field in record} - set(spec['fields']))
+    if unknown:
+        print(f"⚠️  Champs ignorés: {', '.join(unknown)}")
     
-    # Vérifier les circuits sans terminaisons
+    # Une seule lecture de l'état courant, indexée par clé naturelle
+    fields = sorted({field for record in desired for field in record if field in spec['fields']} | set(prune_scope))
+    current = reconcile.index_current(client.iter_all(spec['endpoint']), spec, fields)
     try:
-        circuits = client.get_all('/circuits/circuits/')
-        circuits_without_terms = []
-        for circuit in circuits:
-            terms = client.get('/circuits/circuit-terminations/', {'circuit_id': circuit['id']})
-            if not terms or terms['count'] == 0:
-                circuits_without_terms.append(circuit)
-        
-        if circuits_without_terms:
-            issues.append(f"🔴 {len(circuits_without_terms)} circuits sans terminaisons")
-    except:
-        issues.append("❌ Erreur lors de la vérification des circuits")
+        plan = reconcile.build_plan(desired, current, spec, prune_scope if prune else None)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
     
-    # Affichage des résultats
-    if issues:
-        print("⚠️  Problèmes détectés:")
-        for issue in issues:
-            print(f"  {issue}")
-    else:
-        print("✅ Aucun problème majeur détecté")
+    summary = [
+        ['➕ Créations', len(plan['create'])],
+        ['✏️  Mises à jour', len(plan['update'])],
+        ['🗑️  Suppressions', len(plan['delete'])],
+        ['✅ Inchangés', plan['unchanged']]
+    ]
+    print(tabulate(summary, headers=['Action', 'Nombre'], tablefmt='grid'))
+    
+    for update in plan['update'][:10]:
+        changes = ', '.join(f"{field}={value}" for field, value in update['changes'].items())
+        print(f"  ✏️  {'/'.join(str(k) for k in update['key'] if k)}: {changes}")
+    if len(plan['update']) > 10:
+        print(f"  ... et {len(plan['update']) - 10} autres mises à jour")
+    
+    if plan_output:
+        with open(plan_output, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2, ensure_ascii=False, default=str)
+        print(f"📝 Plan enregistré dans {plan_output}")
+    
+    if not (plan['create'] or plan['update'] or plan['delete']):
+        print("✅ Netbox est déjà conforme à l'état désiré")
+        return
+    
+    if not apply:
+        print("💡 Relancer avec --apply pour appliquer le plan")
+        return
+    
+    reports, errors = reconcile.apply_plan(client, spec, plan)
+    for record, error in errors:
+        print(f"  ❌ {error}")
+    for report in reports:
+        report.print_summary()
 
 def main():
     parser = argparse.ArgumentParser(description='Utilitaires CLI pour Netbox')
@@ -396,15 +613,56 @@ def main():
     
     # Commande export
     export_parser = subparsers.add_parser('export', help='Exporter des données')
-    export_parser.add_argument('type', choices=['devices', 'sites', 'racks', 'ip-addresses', 'prefixes', 'vlans', 'circuits', 'providers'], help='Type de données à exporter')
-    export_parser.add_argument('--format', choices=['json', 'csv'], default='csv', help='Format d\'export')
+    export_parser.add_argument('type', choices=list(exporters.EXPORT_TYPES), help='Type de données à exporter')
+    export_parser.add_argument('--format', choices=exporters.FORMATS, default='csv', help='Format d\'export')
+    export_parser.add_argument('--compress', choices=list(exporters.COMPRESSIONS), help='Compression du fichier')
     export_parser.add_argument('--output', help='Fichier de sortie')
     
+    # Commande snapshot
+    snapshot_parser = subparsers.add_parser('snapshot', help='Instantané complet de l\'inventaire (archive reprenable)')
+    snapshot_parser.add_argument('--output', help='Archive de sortie (.tar)')
+    snapshot_parser.add_argument('--types', help='Types à inclure, séparés par des virgules (défaut: tous)')
+    snapshot_parser.add_argument('--page-size', type=int, default=1000, help='Objets par page')
+    snapshot_parser.add_argument('--workers', type=int, help='Types exportés simultanément')
+    
+    # Commande binary-snapshot
+    binary_parser = subparsers.add_parser('binary-snapshot', help='Instantané binaire (.nbsnap) pour l\'analyse locale')
+    binary_parser.add_argument('--output', help='Fichier de sortie (défaut: netbox_inventory_<date>.nbsnap)')
+    binary_parser.add_argument('--from', dest='source', help='Convertir une archive tar d\'instantané au lieu d\'interroger Netbox')
+    binary_parser.add_argument('--workers', type=int, help='Nombre de types chargés simultanément')
+    
+    # Commande diff
+    diff_parser = subparsers.add_parser('diff', help='Différences entre deux instantanés')
+    diff_parser.add_argument('old', help='Instantané de référence (.tar)')
+    diff_parser.add_argument('new', help='Instantané récent (.tar)')
+    diff_parser.add_argument('--types', help='Types à comparer, séparés par des virgules')
+    diff_parser.add_argument('--format', choices=['table', 'ndjson'], default='table', help='Format de sortie')
+    diff_parser.add_argument('--limit', type=int, default=20, help='Changements détaillés par type (table)')
+    
+    # Commande reconcile
+    reconcile_parser = subparsers.add_parser('reconcile', help='Réconcilier un état désiré avec Netbox')
+    reconcile_parser.add_argument('type', choices=sorted(reconcile.OBJECT_TYPES), help='Type d\'objets')
+    reconcile_parser.add_argument('file', help='Fichier d\'état désiré (CSV, JSON ou YAML)')
+    reconcile_parser.add_argument('--apply', action='store_true', help='Appliquer le plan (sinon simulation)')
+    reconcile_parser.add_argument('--prune', action='store_true', help='Supprimer les objets absents du fichier')
+    reconcile_parser.add_argument('--scope', action='append', metavar='CHAMP=VALEUR',
+                                  help='Périmètre des suppressions (obligatoire avec --prune, répétable)')
+    reconcile_parser.add_argument('--plan-output', help='Enregistrer le plan en JSON')
+    
     # Commande status
     status_parser = subparsers.add_parser('status', help='Statut de Netbox')
+    status_parser.add_argument('--watch', type=float, metavar='SECONDES', help='Rafraîchir les statistiques à intervalle régulier')
     
     # Commande validate
     validate_parser = subparsers.add_parser('validate', help='Validation des données')
+    validate_parser.add_argument('--rules', help='Règles à exécuter, séparées par des virgules (défaut: toutes)')
+    validate_parser.add_argument('--format', choices=['table', 'json', 'ndjson', 'csv'], default='table', help='Format des constats')
+    validate_parser.add_argument('--output', help='Fichier de sortie des constats (défaut: stdout)')
+    validate_parser.add_argument('--severity', choices=validation.SEVERITIES, help='Gravité minimale affichée')
+    validate_parser.add_argument('--limit', type=int, default=20, help='Constats détaillés affichés (table)')
+    validate_parser.add_argument('--list-rules', action='store_true', help='Lister les règles disponibles')
+    validate_parser.add_argument('--incremental', action='store_true', help='Relire seulement les objets modifiés depuis la dernière validation')
+    validate_parser.add_argument('--rebuild', action='store_true', help='Avec --incremental: repartir d\'un état vide')
     
     args = parser.parse_args()
     
@@ -412,6 +670,25 @@ def main():
         parser.print_help()
         return
     
+    # Comparaison d'instantanés : fichiers locaux, sans connexion à Netbox
+    if args.command == 'diff':
+        types = [t.strip() for t in args.types.split(',')] if args.types else None
+        try:
+            diff_snapshots(args.old, args.new, types, args.format, args.limit)
+        except (IOError, KeyError, ValueError, tarfile.TarError) as e:
+            print(f"❌ Erreur lors de la comparaison: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+    
+    # Conversion d'une archive existante : également sans connexion
+    if args.command == 'binary-snapshot' and args.source:
+        try:
+            create_binary_snapshot(None, args.output, args.source)
+        except (IOError, KeyError, ValueError, tarfile.TarError) as e:
+            print(f"❌ Erreur lors de la conversion: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+    
     # Création du client Netbox
     try:
         client = create_client()
@@ -424,14 +701,29 @@ def main():
         if args.command == 'search':
             global_search(client, args.term)
         
+        elif args.command == 'snapshot':
+            types = [t.strip() for t in args.types.split(',')] if args.types else None
+            create_snapshot(client, args.output, types, args.page_size, args.workers)
+        
+        elif args.command == 'binary-snapshot':
+            create_binary_snapshot(client, args.output, workers=args.workers)
+        
         elif args.command == 'export':
-            export_data(client, args.type, args.format, args.output)
+            export_data(client, args.type, args.format, args.output, args.compress)
+        
+        elif args.command == 'reconcile':
+            reconcile_state(client, args.type, args.file, args.apply, args.prune, args.plan_output, args.scope)
         
         elif args.command == 'status':
-            netbox_status(client)
+            netbox_status(client, args.watch)
         
         elif args.command == 'validate':
-            validate_data(client)
+            if args.list_rules:
+                list_validation_rules(client)
+            else:
+                rule_names = [r.strip() for r in args.rules.split(',')] if args.rules else None
+                validate_data(client, rule_names, args.format, args.output, args.severity, args.limit,
+                              args.incremental, args.rebuild)
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Opération interrompue par l'utilisateur")
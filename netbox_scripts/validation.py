@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Moteur de règles de validation sur des tables partagées
+
+Chaque type d'objet nécessaire est chargé une seule fois dans une Table
+(objets + index construits à la demande : par ID ou par chemin pointé). Les
+règles ne font aucune requête : elles reçoivent les tables et produisent des
+constats (objet, message). Ajouter une règle n'ajoute donc au plus qu'un
+chargement de table, jamais de requête par objet.
+
+Les règles sont déclarées :
+  - dans un module, avec le décorateur @rule (ce module ou ceux listés dans
+    'validation_modules' de la configuration) ;
+  - dans la configuration ('validation_rules'), sous forme déclarative :
+    table, filtre 'where' et champs obligatoires 'require'.
+"""
+
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import threading
+import types
+from datetime import datetime, timedelta
+
+from aggregation import MISSING, path_getter
+from cable_graph import UNCABLED_INTERFACE_TYPES
+
+SEVERITIES = ('error', 'warning', 'info')
+SEVERITY_ICONS = {'error': '🔴', 'warning': '🟡', 'info': '🔵'}
+
+# Colonnes des constats (export CSV / JSON via exporters)
+FINDING_SCHEMA = [
+    ('rule', 'rule', 'str'),
+    ('severity', 'severity', 'str'),
+    ('object_type', 'object_type', 'str'),
+    ('object_id', 'object_id', 'int'),
+    ('object', 'object', 'str'),
+    ('message', 'message', 'str'),
+]
+
+# Tables chargeables : type d'objet (journal des modifications), endpoint et
+# champs demandés (réponses allégées)
+TABLES = {
+    'devices': {
+        'content_type': 'dcim.device',
+        'endpoint': '/dcim/devices/',
+        'fields': ['id', 'name', 'site', 'rack', 'status', 'primary_ip4', 'primary_ip6'],
+    },
+    'interfaces': {
+        'content_type': 'dcim.interface',
+        'endpoint': '/dcim/interfaces/',
+        'fields': ['id', 'name', 'device', 'type', 'cable', 'enabled', 'mgmt_only'],
+    },
+    'racks': {
+        'content_type': 'dcim.rack',
+        'endpoint': '/dcim/racks/',
+        'fields': ['id', 'name', 'site', 'status'],
+    },
+    'circuits': {
+        'content_type': 'circuits.circuit',
+        'endpoint': '/circuits/circuits/',
+        'fields': ['id', 'cid', 'provider', 'status'],
+    },
+    'circuit-terminations': {
+        'content_type': 'circuits.circuittermination',
+        'endpoint': '/circuits/circuit-terminations/',
+        'fields': ['id', 'circuit', 'term_side'],
+    },
+    'ip-addresses': {
+        'content_type': 'ipam.ipaddress',
+        'endpoint': '/ipam/ip-addresses/',
+        'fields': ['id', 'address', 'vrf', 'status', 'assigned_object_type', 'assigned_object_id'],
+    },
+    'sites': {
+        'content_type': 'dcim.site',
+        'endpoint': '/dcim/sites/',
+        'fields': ['id', 'name', 'status'],
+    },
+}
+
+
+class Table:
+    """Objets d'un type, partagés entre les règles, avec index paresseux"""
+
+    def __init__(self, name, records):
+        self.name = name
+        self.records = records
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def index(self, path):
+        """{valeur du chemin pointé: [objets]} ; construit une fois, partagé entre règles"""
+        index = self._indexes.get(path)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(path)
+                if index is None:
+                    get = path_getter(path)
+                    index = {}
+                    for record in self.records:
+                        index.setdefault(get(record), []).append(record)
+                    self._indexes[path] = index
+        return index
+
+    def get(self, object_id):
+        found = self.index('id').get(object_id)
+        return found[0] if found else None
+
+    def has(self, path, value):
+        return value in self.index(path)
+
+
+class Rule:
+    """Règle de validation : fonction check(tables) produisant (objet, message)
+
+    subject est la table des objets signalés (la première des tables lues).
+    """
+
+    def __init__(self, name, tables, check, severity='warning', description='', fields=None, signature=None):
+        if severity not in SEVERITIES:
+            raise ValueError(f"Règle '{name}': gravité inconnue '{severity}' ({', '.join(SEVERITIES)})")
+        unknown = [table for table in tables if table not in TABLES]
+        if unknown:
+            raise ValueError(f"Règle '{name}': table(s) inconnue(s) {', '.join(unknown)}")
+        self.name = name
+        self.tables = tuple(tables)
+        self.subject = self.tables[0]
+        self.check = check
+        self.severity = severity
+        self.description = description
+        # Champs supplémentaires à charger, par table
+        self.fields = fields or {}
+        # Constats mémorisés invalidés si la définition ou le code change (validation incrémentale)
+        self.signature = signature or f"{name}|{','.join(self.tables)}|{severity}|{code_digest(check)}"
+
+
+def code_digest(func):
+    """Empreinte du code d'une fonction : instructions, noms et constantes, fonctions imbriquées comprises"""
+    digest = hashlib.sha1()
+
+    def feed(code):
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode('utf-8'))
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                feed(const)
+            else:
+                digest.update(repr(const).encode('utf-8'))
+
+    feed(func.__code__)
+    return digest.hexdigest()[:16]
+
+
+RULES = {}
+
+
+def rule(name, tables, severity='warning', description=''):
+    """Décorateur d'enregistrement d'une règle dans le registre"""
+    def register(check):
+        RULES[name] = Rule(name, tables, check, severity, description)
+        return check
+    return register
+
+
+def _label(record):
+    label = record.get('name') or record.get('cid') or record.get('address') or record.get('display') or f"#{record.get('id')}"
+    # Une interface n'est identifiable qu'avec son équipement
+    if isinstance(record.get('device'), dict) and record['device'].get('name'):
+        return f"{record['device']['name']}:{label}"
+    return label
+
+
+# ----------------------------------------------------------------------
+# Règles intégrées
+# ----------------------------------------------------------------------
+
+@rule('device-primary-ip', ['devices'], 'error', "Équipement sans IP primaire")
+def _device_primary_ip(tables):
+    for device in tables['devices']:
+        if not device.get('primary_ip4') and not device.get('primary_ip6'):
+            yield device, "Aucune IP primaire (IPv4 ni IPv6)"
+
+
+@rule('interface-unconnected', ['interfaces'], 'info', "Interface physique sans câble")
+def _interface_unconnected(tables):
+    for interface in tables['interfaces']:
+        if (interface.get('type') or {}).get('value') in UNCABLED_INTERFACE_TYPES:
+            continue
+        if not interface.get('cable') and interface.get('enabled', True) and not interface.get('mgmt_only'):
+            yield interface, "Interface active non câblée"
+
+
+@rule('rack-empty', ['racks', 'devices'], 'warning', "Rack sans équipement")
+def _rack_empty(tables):
+    devices = tables['devices']
+    for rack in tables['racks']:
+        if not devices.has('rack.id', rack['id']):
+            yield rack, "Aucun équipement dans le rack"
+
+
+@rule('circuit-no-termination', ['circuits', 'circuit-terminations'], 'error', "Circuit sans terminaison")
+def _circuit_no_termination(tables):
+    terminations = tables['circuit-terminations']
+    for circuit in tables['circuits']:
+        if not terminations.has('circuit.id', circuit['id']):
+            yield circuit, "Aucune terminaison A ni Z"
+
+
+@rule('device-rack-site', ['devices', 'racks'], 'error', "Équipement dans un rack d'un autre site")
+def _device_rack_site(tables):
+    racks = tables['racks']
+    for device in tables['devices']:
+        if not device.get('rack') or not device.get('site'):
+            continue
+        rack = racks.get(device['rack']['id'])
+        if rack and rack.get('site') and rack['site']['id'] != device['site']['id']:
+            yield device, f"Site {device['site'].get('name')} mais rack {rack['name']} sur le site {rack['site'].get('name')}"
+
+
+@rule('ip-unassigned', ['ip-addresses'], 'info', "Adresse IP active non assignée")
+def _ip_unassigned(tables):
+    for ip in tables['ip-addresses']:
+        status = ip.get('status') or {}
+        if not ip.get('assigned_object_id') and status.get('value') == 'active':
+            yield ip, "Adresse active sans interface assignée"
+
+
+# ----------------------------------------------------------------------
+# Règles déclarées dans la configuration et modules de règles
+# ----------------------------------------------------------------------
+
+def config_rule(spec):
+    """Construit une règle déclarative depuis la configuration
+
+    Exemple : {"name": "device-serial", "table": "devices", "severity": "warning",
+               "where": {"status.value": "active"}, "require": ["serial"]}
+    Les valeurs de 'where' peuvent être une liste de valeurs acceptées.
+    """
+    try:
+        name, table = spec['name'], spec['table']
+    except KeyError as e:
+        raise ValueError(f"Règle de configuration incomplète: {e} manquant") from e
+
+    where = [(path_getter(path), value if isinstance(value, list) else [value])
+             for path, value in (spec.get('where') or {}).items()]
+    require = list(spec.get('require') or [])
+    if not require:
+        raise ValueError(f"Règle '{name}': 'require' doit lister au moins un champ")
+    required = [(path, path_getter(path)) for path in require]
+
+    def check(tables):
+        for record in tables[table]:
+            if all(get(record) in values for get, values in where):
+                missing = [path for path, get in required if get(record) == MISSING]
+                if missing:
+                    yield record, f"Champ(s) manquant(s): {', '.join(missing)}"
+
+    # Les champs lus doivent être chargés : premier élément de chaque chemin
+    fields = {path.split('.')[0] for path in list(spec.get('where') or {}) + require}
+    return Rule(name, [table], check, spec.get('severity', 'warning'),
+                spec.get('description', ''), {table: sorted(fields)}, json.dumps(spec, sort_keys=True))
+
+
+def load_rules(config):
+    """Registre complet : règles intégrées, modules et règles déclarées en configuration"""
+    for module in config.get('validation_modules') or []:
+        importlib.import_module(module)
+    rules = dict(RULES)
+    for spec in config.get('validation_rules') or []:
+        configured = config_rule(spec)
+        rules[configured.name] = configured
+    return rules
+
+
+# ----------------------------------------------------------------------
+# Exécution
+# ----------------------------------------------------------------------
+
+def table_fields(rules):
+    """Champs à charger pour chaque table utilisée par les règles"""
+    fields = {}
+    for selected in rules:
+        for table in selected.tables:
+            fields.setdefault(table, set(TABLES[table]['fields']))
+        for table, extra in selected.fields.items():
+            fields[table].update(extra)
+    return {table: sorted(names) for table, names in fields.items()}
+
+
+def load_table(client, name, fields, params=None):
+    """Charge une table (ou ses objets filtrés par params) avec les seuls champs utiles
+
+    Pagination par ID (keyset) : une page manquante lève une erreur et une
+    écriture concurrente ne fait sauter aucun objet (une table incomplète
+    produirait de faux constats, ex: racks « vides »).
+    """
+    return list(client.iter_all(TABLES[name]['endpoint'], {'fields': ','.join(fields), **(params or {})},
+                                keyset=True))
+
+
+def load_tables(client, rules, max_workers=None):
+    """Charge en parallèle, une seule fois, chaque table lue par les règles"""
+    fields = table_fields(rules)
+    tables = {}
+    for name, records in client.run_concurrently(lambda n: load_table(client, n, fields[n]), list(fields), max_workers):
+        tables[name] = Table(name, records)
+    return tables
+
+
+def _evaluate(selected, tables):
+    """Constats d'une règle ; une règle en échec retourne son exception"""
+    try:
+        return [{
+            'rule': selected.name,
+            'severity': selected.severity,
+            'object_type': selected.subject,
+            'object_id': record.get('id'),
+            'object': _label(record),
+            'message': message,
+        } for record, message in selected.check(tables)]
+    except Exception as e:
+        return e
+
+
+def run_rules(client, rules, tables, max_workers=None):
+    """Exécute les règles en parallèle sur les tables partagées
+
+    Retourne ({règle: [constats]}, {règle: exception}).
+    """
+    findings, failures = {}, {}
+    for selected, result in client.run_concurrently(lambda r: _evaluate(r, tables), list(rules), max_workers):
+        if isinstance(result, Exception):
+            failures[selected.name] = result
+        else:
+            findings[selected.name] = result
+    return findings, failures
+
+
+# ----------------------------------------------------------------------
+# Validation incrémentale
+# ----------------------------------------------------------------------
+
+# Marge de relecture sous le filigrane : une écriture encore en cours lors du
+# relevé peut être validée ensuite avec un horodatage ou un ID de journal
+# antérieurs à ceux du filigrane
+SAFETY_SECONDS = 300
+SAFETY_CHANGES = 1000
+
+
+def latest_change(client):
+    """Filigrane courant : (ID, horodatage) de la dernière entrée du journal des modifications"""
+    page = client.get('/extras/object-changes/', {'limit': 1, 'ordering': '-id', 'fields': 'id,time'})
+    if page is None:
+        raise RuntimeError("Échec de la lecture du journal des modifications")
+    results = page.get('results') or []
+    return {'id': results[0]['id'], 'time': results[0]['time']} if results else {'id': 0, 'time': None}
+
+
+def deleted_ids(client, name, change_id):
+    """IDs des objets d'une table supprimés depuis une entrée du journal"""
+    changes = client.iter_all('/extras/object-changes/',
+                              {'changed_object_type': TABLES[name]['content_type'], 'action': 'delete',
+                               'id__gt': change_id, 'fields': 'id,changed_object_id'}, keyset=True)
+    return {change['changed_object_id'] for change in changes}
+
+
+def rewind(watermark):
+    """Filigrane reculé de la marge de sécurité (horodatage et ID du journal)"""
+    time = datetime.fromisoformat(watermark['time'].replace('Z', '+00:00'))
+    return {'id': max(0, watermark['id'] - SAFETY_CHANGES),
+            'time': (time - timedelta(seconds=SAFETY_SECONDS)).isoformat()}
+
+
+def refresh_table(client, name, fields, records, watermark):
+    """Applique à une table en cache les objets modifiés et supprimés depuis le filigrane
+
+    Retourne (objets, nombre d'objets réellement changés, nombre d'objets relus).
+    Les bornes last_updated__gte et id__gt sont reculées de la marge de
+    sécurité : les objets relus inutilement sont écartés par la comparaison
+    de contenu, seuls ceux qui diffèrent comptent comme changés.
+    """
+    since = rewind(watermark)
+    updated = load_table(client, name, fields, {'last_updated__gte': since['time']})
+    deleted = deleted_ids(client, name, since['id'])
+
+    by_id = {record['id']: record for record in records}
+    changed = 0
+    for record in updated:
+        if by_id.get(record['id']) != record:
+            by_id[record['id']] = record
+            changed += 1
+    for object_id in deleted:
+        if by_id.pop(object_id, None) is not None:
+            changed += 1
+    return [by_id[object_id] for object_id in sorted(by_id)], changed, len(updated) + len(deleted)
+
+
+class ValidationState:
+    """Tables, filigranes et constats mémorisés entre deux validations (JSON gzip)
+
+    Chaque table porte son filigrane et une révision incrémentée quand son
+    contenu change ; chaque règle mémorise ses constats avec les révisions des
+    tables lues. Une règle n'est réévaluée que si l'une d'elles a changé.
+    """
+
+    def __init__(self, path, netbox_url):
+        self.path = path
+        self.netbox_url = netbox_url
+        self.data = {'netbox_url': netbox_url, 'tables': {}, 'rules': {}}
+
+    def load(self):
+        """Charge l'état s'il existe et correspond à cette instance Netbox"""
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, EOFError, json.JSONDecodeError):
+            return False
+        if data.get('netbox_url') != self.netbox_url:
+            return False
+        self.data = data
+        return True
+
+    def save(self):
+        self.data['saved_at'] = datetime.now().isoformat(timespec='seconds')
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+    @property
+    def saved_at(self):
+        return self.data.get('saved_at')
+
+    def table(self, name, fields):
+        """Entrée de table en cache, si elle contient au moins les champs demandés"""
+        entry = self.data['tables'].get(name)
+        if entry and entry.get('time') and set(fields) <= set(entry['fields']):
+            return entry
+        return None
+
+    def store_table(self, name, fields, records, watermark, changed):
+        entry = self.data['tables'].get(name) or {'revision': 0}
+        revision = entry['revision'] + 1 if changed else entry['revision']
+        self.data['tables'][name] = {'fields': sorted(fields), 'id': watermark['id'], 'time': watermark['time'],
+                                     'revision': revision, 'records': records}
+
+    def revisions(self, selected):
+        return {table: self.data['tables'][table]['revision'] for table in selected.tables}
+
+    def findings(self, selected):
+        """Constats mémorisés d'une règle, ou None s'ils ne sont plus à jour"""
+        entry = self.data['rules'].get(selected.name)
+        if entry and entry['signature'] == selected.signature and entry['revisions'] == self.revisions(selected):
+            return entry['findings']
+        return None
+
+    def store_findings(self, selected, findings):
+        self.data['rules'][selected.name] = {'signature': selected.signature,
+                                             'revisions': self.revisions(selected), 'findings': findings}
+
+
+def refresh_tables(client, state, rules, max_workers=None):
+    """Met à jour les tables en cache (objets modifiés seulement) ou les charge en entier
+
+    Retourne (tables, {table: objets relus, ou None si chargement complet}).
+    """
+    fields = table_fields(rules)
+    # Filigrane relevé avant les chargements : une modification concurrente sera relue au prochain passage
+    watermark = latest_change(client)
+
+    def refresh(name):
+        cached = state.table(name, fields[name])
+        if cached is None:
+            return load_table(client, name, fields[name]), True, None
+        records, changed, fetched = refresh_table(client, name, fields[name], cached['records'], cached)
+        return records, changed > 0, fetched
+
+    tables, fetched = {}, {}
+    for name, (records, changed, count) in client.run_concurrently(refresh, list(fields), max_workers):
+        state.store_table(name, fields[name], records, watermark, changed)
+        tables[name] = Table(name, records)
+        fetched[name] = count
+    return tables, fetched
+
+
+def run_incremental(client, state, rules, max_workers=None):
+    """Réévalue seulement les règles dont une table a changé depuis la dernière validation
+
+    Retourne ({règle: [constats]}, {règle: exception}, règles réévaluées, objets relus).
+    """
+    rules = list(rules)
+    tables, fetched = refresh_tables(client, state, rules, max_workers)
+
+    findings = {}
+    stale = []
+    for selected in rules:
+        cached = state.findings(selected)
+        if cached is None:
+            stale.append(selected)
+        else:
+            findings[selected.name] = cached
+
+    evaluated, failures = run_rules(client, stale, tables, max_workers)
+    for selected in stale:
+        if selected.name in evaluated:
+            state.store_findings(selected, evaluated[selected.name])
+    findings.update(evaluated)
+    return findings, failures, [selected.name for selected in stale], fetched
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Carte d'allocation des VLAN IDs par site ou groupe de VLANs
+
+Chaque domaine est un bitmap de 4096 bits (un entier Python) : tester un VID
+est en O(1), et les recherches de VIDs ou de plages libres ne coûtent que
+quelques opérations sur 4096/64 mots machine.
+"""
+
+MIN_VID = 1
+MAX_VID = 4094
+
+
+def _range_mask(min_vid, max_vid):
+    """Masque des VIDs autorisés [min_vid, max_vid]"""
+    return ((1 << (max_vid + 1)) - 1) ^ ((1 << min_vid) - 1)
+
+
+class VlanBitmap:
+    """Bitmap des VIDs utilisés d'un domaine (site, groupe ou global)"""
+
+    def __init__(self, name, min_vid=MIN_VID, max_vid=MAX_VID):
+        self.name = name
+        self.min_vid = min_vid
+        self.max_vid = max_vid
+        self.mask = _range_mask(min_vid, max_vid)
+        self.bits = 0
+        self.vlans = {}         # vid -> [noms des VLANs]
+        self.conflicts = set()  # VIDs attribués plusieurs fois
+        self.out_of_range = set()
+
+    def add(self, vid, name=None):
+        """Marque un VID comme utilisé ; signale les doublons et les hors-plage"""
+        bit = 1 << vid
+        if self.bits & bit:
+            self.conflicts.add(vid)
+        if not self.mask & bit:
+            self.out_of_range.add(vid)
+        self.bits |= bit
+        self.vlans.setdefault(vid, []).append(name)
+
+    def is_free(self, vid):
+        return bool(self.mask >> vid & 1) and not self.bits >> vid & 1
+
+    @property
+    def free_bits(self):
+        return ~self.bits & self.mask
+
+    def used_count(self):
+        return bin(self.bits & self.mask).count('1')
+
+    def free_count(self):
+        return bin(self.free_bits).count('1')
+
+    def next_free(self, count=1, start=None):
+        """Les count prochains VIDs libres à partir de start"""
+        free = self.free_bits
+        if start:
+            free &= ~((1 << start) - 1)
+
+        result = []
+        while free and len(result) < count:
+            lowest = free & -free
+            result.append(lowest.bit_length() - 1)
+            free ^= lowest
+        return result
+
+    def free_ranges(self):
+        """Plages de VIDs libres [(début, fin)] en un passage par plage"""
+        return bit_runs(self.free_bits)
+
+    def used_ranges(self):
+        return bit_runs(self.bits & self.mask)
+
+    def heatmap(self, width=64):
+        """Rendu compact : une ligne de `width` VIDs (█ utilisé, · libre, ! conflit)"""
+        lines = []
+        row_mask = (1 << width) - 1
+        for row_start in range(0, 4096, width):
+            # Ignorer les lignes entièrement hors de la plage du domaine
+            if not (self.mask >> row_start) & row_mask:
+                continue
+            cells = []
+            for vid in range(row_start, row_start + width):
+                if not self.mask >> vid & 1:
+                    cells.append(' ')
+                elif vid in self.conflicts:
+                    cells.append('!')
+                elif self.bits >> vid & 1:
+                    cells.append('█')
+                else:
+                    cells.append('·')
+            lines.append(f"{row_start:4d} {''.join(cells)}")
+        return lines
+
+
+def bit_runs(bits):
+    """Découpe un entier en plages de bits à 1 consécutifs"""
+    runs = []
+    while bits:
+        lowest = bits & -bits
+        # L'addition propage la retenue sur toute la plage de 1
+        above = (bits + lowest) & ~bits
+        runs.append((lowest.bit_length() - 1, above.bit_length() - 2))
+        bits &= ~(above - 1)
+    return runs
+
+
+def format_ranges(ranges):
+    """Formate [(1, 9), (11, 11)] en '1-9, 11'"""
+    return ', '.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def domain_key(vlan):
+    """Domaine d'unicité d'un VLAN : son groupe, sinon son site, sinon global"""
+    if vlan.get('group'):
+        return ('group', vlan['group']['id']), f"Groupe {vlan['group']['name']}"
+    if vlan.get('site'):
+        return ('site', vlan['site']['id']), f"Site {vlan['site']['name']}"
+    return ('global', None), 'Global'
+
+
+def build_maps(vlans, groups=()):
+    """Construit les bitmaps de tous les domaines à partir d'un chargement unique
+
+    groups (optionnel) fournit les plages min_vid/max_vid des groupes de VLANs.
+    """
+    ranges = {}
+    for group in groups:
+        ranges[('group', group['id'])] = (group.get('min_vid') or MIN_VID, group.get('max_vid') or MAX_VID)
+
+    maps = {}
+    for vlan in vlans:
+        key, name = domain_key(vlan)
+        if key not in maps:
+            maps[key] = VlanBitmap(name, *ranges.get(key, (MIN_VID, MAX_VID)))
+        maps[key].add(vlan['vid'], vlan.get('name'))
+    return maps